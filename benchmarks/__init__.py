@@ -0,0 +1,13 @@
+"""
+MCP Layout Driver 基准测试
+
+在仓库根目录下通过 ``python -m benchmarks.<模块名>`` 运行。
+未安装本包时自动把 src 目录加入导入路径。
+"""
+
+import sys
+from pathlib import Path
+
+_SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(_SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(_SRC_DIR))
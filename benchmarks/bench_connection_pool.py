@@ -0,0 +1,65 @@
+"""
+共享连接池基准测试
+
+对比 make_api_request 在共享连接池（http_client_lifespan）与
+每次请求新建客户端两种模式下的吞吐量（calls/sec）。
+
+用法：
+    python -m benchmarks.bench_connection_pool --calls 500 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import time
+
+from layout_driver.config import APIConfig
+from layout_driver.driver import make_api_request
+from layout_driver.http_client import http_client_lifespan
+
+from .stub_backend import StubBackend
+
+
+async def _run_calls(calls: int, concurrency: int) -> float:
+    """以给定并发度调用 make_api_request，返回每秒调用次数"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_call() -> None:
+        async with semaphore:
+            result = await make_api_request("WINDOWS_LIST")
+            if not result["success"]:
+                raise RuntimeError(result["error"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(calls)))
+    return calls / (time.perf_counter() - start)
+
+
+async def _bench(calls: int, concurrency: int) -> None:
+    # 不使用连接池：每次调用新建并关闭一个客户端
+    unpooled = await _run_calls(calls, concurrency)
+
+    # 使用共享连接池
+    async with http_client_lifespan():
+        pooled = await _run_calls(calls, concurrency)
+
+    print(f"{'mode':<10}{'calls/sec':>12}")
+    print(f"{'unpooled':<10}{unpooled:>12.1f}")
+    print(f"{'pooled':<10}{pooled:>12.1f}")
+    print(f"speedup: {pooled / unpooled:.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500, help="每种模式的调用次数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发调用数")
+    parser.add_argument("--windows", type=int, default=50, help="桩后端返回的窗口数量")
+    args = parser.parse_args()
+
+    with StubBackend(window_count=args.windows) as backend:
+        APIConfig.BASE_URL = backend.base_url
+        asyncio.run(_bench(args.calls, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
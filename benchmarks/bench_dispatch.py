@@ -0,0 +1,128 @@
+"""
+工具分发微基准测试
+
+不访问后端，只测量call_tool在调用后端之前和之后的驱动自身开销：
+
+- parse: 按工具名查分发表并把参数校验为输入模型（ToolSpec.parse），
+  窗口列表工具另外给出逐个构造WindowInfo（WindowInfo(**window)）的耗时作为对照
+- body: 把校验后的窗口列表序列化为批量请求体（window_list_body / opacity_list_body），
+  另外给出逐个model_dump为字典再以json.dumps序列化（httpx的json=参数）的耗时作为对照
+- dispatch: 完整的dispatch_tool路径（查表、校验、处理函数、序列化、封装TextContent），
+  处理函数替换为直接返回固定结果的空函数
+
+用法：
+    python -m benchmarks.bench_dispatch --windows 1 100 1000 --repeat 2000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from layout_driver.driver import (
+    TOOL_SPECS,
+    DriverTools,
+    ToolSpec,
+    WindowInfo,
+    opacity_list_body,
+    window_list_body,
+)
+
+from .stub_backend import make_windows
+
+# 工具名 -> 由窗口列表生成调用参数的函数
+ARGUMENTS: Dict[str, Callable[[List[Dict[str, Any]]], Dict[str, Any]]] = {
+    DriverTools.GET_WINDOW_LIST.value: lambda windows: {"force_refresh": True},
+    DriverTools.CLOSE_WINDOWS_BATCH.value: lambda windows: {"windows": windows},
+    DriverTools.MINIMIZE_WINDOWS_BATCH.value: lambda windows: {"windows": windows},
+    DriverTools.SET_WINDOW_OPACITY_BATCH.value:
+        lambda windows: {"windows": [{**window, "opacity": 128} for window in windows]},
+    DriverTools.EXECUTE_OPERATIONS.value:
+        lambda windows: {"operations": [{"op": "minimize", "window": window} for window in windows]},
+    DriverTools.APPLY_LAYOUT.value:
+        lambda windows: {"windows": [{"handle": window["handle"], "state": "minimized"} for window in windows]},
+}
+
+# 窗口列表工具：参数中直接是WindowInfo字段列表
+_WINDOW_TOOLS = {DriverTools.CLOSE_WINDOWS_BATCH.value, DriverTools.MINIMIZE_WINDOWS_BATCH.value}
+
+# 批量工具的请求体：工具名 -> (序列化函数, 逐个转换为字典的对照实现)
+BODIES: Dict[str, Any] = {
+    DriverTools.CLOSE_WINDOWS_BATCH.value: (
+        lambda request: window_list_body(request.windows),
+        lambda request: [window.model_dump(exclude={"icon"}) for window in request.windows],
+    ),
+    DriverTools.MINIMIZE_WINDOWS_BATCH.value: (
+        lambda request: window_list_body(request.windows),
+        lambda request: [window.model_dump(exclude={"icon"}) for window in request.windows],
+    ),
+    DriverTools.SET_WINDOW_OPACITY_BATCH.value: (
+        lambda request: opacity_list_body(request.windows),
+        lambda request: [item.model_dump(exclude={"window": {"icon"}}) for item in request.windows],
+    ),
+}
+
+
+def _encode_json(data: Any) -> bytes:
+    """与httpx的json=参数相同的序列化方式"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def _per_call_us(func: Callable[[], Any], repeat: int) -> float:
+    """同步调用func repeat次，返回每次的平均耗时（微秒）"""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+async def _dispatch_per_call_us(spec: ToolSpec, arguments: Dict[str, Any], repeat: int) -> float:
+    await spec.call(arguments)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await spec.call(arguments)
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+def _optional(value: Any, width: int) -> str:
+    return f"{value:>{width}.1f}" if value is not None else f"{'-':>{width}}"
+
+
+async def _noop_handler(request: Any) -> Dict[str, Any]:
+    return {"success": True, "status_code": 200, "content": {"message": "ok"}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 100, 1000], help="窗口数量（可指定多个）")
+    parser.add_argument("--repeat", type=int, default=2000, help="每项测量的调用次数（按窗口数量递减）")
+    args = parser.parse_args()
+
+    print(f"{'tool':<26}{'windows':>8}{'parse us':>12}{'manual us':>12}"
+          f"{'body us':>12}{'dict body us':>14}{'dispatch us':>14}")
+    for count in args.windows:
+        windows = make_windows(count, icon_size=0)
+        repeat = max(20, args.repeat // max(1, count // 10))
+        for name, make_arguments in ARGUMENTS.items():
+            arguments = make_arguments(windows)
+            spec = TOOL_SPECS[name]
+            parse = _per_call_us(lambda: TOOL_SPECS[name].parse(arguments), repeat)
+            manual = (_per_call_us(lambda: [WindowInfo(**window) for window in arguments["windows"]], repeat)
+                      if name in _WINDOW_TOOLS else None)
+            body = dict_body = None
+            if name in BODIES:
+                request = spec.parse(arguments)
+                to_body, to_dicts = BODIES[name]
+                body = _per_call_us(lambda: to_body(request), repeat)
+                dict_body = _per_call_us(lambda: _encode_json(to_dicts(request)), repeat)
+            noop_spec = ToolSpec(spec.description, spec.model, _noop_handler, prepare=spec.prepare)
+            dispatch = asyncio.run(_dispatch_per_call_us(noop_spec, arguments, repeat))
+            print(f"{name:<26}{count:>8}{parse:>12.1f}{_optional(manual, 12)}"
+                  f"{_optional(body, 12)}{_optional(dict_body, 14)}{dispatch:>14.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+启动耗时基准测试
+
+每个MCP客户端会话都会启动一个stdio驱动进程，冷启动耗时直接计入第一次工具调用。
+本基准测试反复冷启动驱动进程，测量：
+
+- interpreter: 空解释器启动耗时（python -c pass），作为参照
+- import: 导入 layout_driver.driver 的耗时（已减去空解释器启动耗时）
+- initialize: 从启动 python -m layout_driver 到收到initialize响应
+- first_list_tools: initialize之后第一次list_tools的耗时
+- 进程内 list_tools 第一次（生成工具定义）与之后（使用缓存）的耗时
+
+不需要后端：initialize和list_tools都不访问后端API。
+
+用法：
+    python -m benchmarks.bench_startup --runs 10 --output startup.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from mcp import ClientSession, StdioServerParameters, types
+from mcp.client.stdio import stdio_client
+
+_SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# 驱动子进程的环境：不订阅窗口事件，后端地址不会被访问
+_ENV = {
+    **os.environ,
+    "PYTHONPATH": str(_SRC_DIR),
+    "LAYOUT_DRIVER_EVENTS": "off",
+}
+
+
+def _time_python(code: str) -> float:
+    """在新的解释器中执行code，返回耗时（毫秒）"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], env=_ENV, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+async def _time_stdio_session() -> Dict[str, float]:
+    """冷启动一个stdio驱动进程，返回initialize和第一次list_tools的耗时（毫秒）"""
+    params = StdioServerParameters(command=sys.executable, args=["-m", "layout_driver"], env=_ENV)
+    start = time.perf_counter()
+    async with stdio_client(params) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            initialized = time.perf_counter()
+            await session.list_tools()
+            listed = time.perf_counter()
+    return {
+        "initialize": (initialized - start) * 1000,
+        "first_list_tools": (listed - initialized) * 1000,
+    }
+
+
+async def _time_list_tools_in_process(calls: int) -> Dict[str, float]:
+    """在当前进程中直接调用list_tools处理函数，返回第一次和之后的平均耗时（毫秒）"""
+    from layout_driver.driver import create_server
+
+    handler = create_server().request_handlers[types.ListToolsRequest]
+    request = types.ListToolsRequest(method="tools/list")
+    start = time.perf_counter()
+    await handler(request)
+    first = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(calls):
+        await handler(request)
+    return {"list_tools_first": first, "list_tools_cached": (time.perf_counter() - start) * 1000 / calls}
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(samples), 3),
+        "min": round(min(samples), 3),
+        "max": round(max(samples), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="冷启动次数")
+    parser.add_argument("--output", help="结果JSON文件（可空）")
+    args = parser.parse_args()
+
+    samples: Dict[str, List[float]] = {
+        "interpreter": [], "import": [], "initialize": [], "first_list_tools": [],
+    }
+    for _ in range(args.runs):
+        interpreter = _time_python("pass")
+        samples["interpreter"].append(interpreter)
+        samples["import"].append(_time_python("import layout_driver.driver") - interpreter)
+        for key, value in asyncio.run(_time_stdio_session()).items():
+            samples[key].append(value)
+
+    results: Dict[str, Any] = {key: _summary(values) for key, values in samples.items()}
+    in_process = asyncio.run(_time_list_tools_in_process(100))
+    results.update({key: round(value, 3) for key, value in in_process.items()})
+
+    print(f"{'phase':<18}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for key in samples:
+        print(f"{key:<18}{results[key]['median']:>12.1f}{results[key]['min']:>10.1f}{results[key]['max']:>10.1f}")
+    print(f"list_tools（进程内）第一次 {in_process['list_tools_first']:.2f} ms，"
+          f"之后平均 {in_process['list_tools_cached']:.3f} ms")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"runs": args.runs, "results": results},
+                                                ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+工具调用基准测试
+
+在独立进程中启动桩后端（benchmarks.stub_backend），通过mcp的内存传输驱动
+create_server() 中真实的工具分发器（call_tool），对每种工具、窗口数量和并发调用数测量：
+
+- 吞吐量（calls/sec）、p50 / p99 / 最大延迟（毫秒）、失败率
+- 内存峰值（MiB）：另外以tracemalloc跟踪少量调用，只统计驱动进程内的分配
+
+测量的工具：
+- list: get_window_list（force_refresh，每次都请求后端）
+- close / minimize / maximize / restore / opacity: 对全部窗口执行一次批量操作
+
+结果写入 --output 指定的JSON文件；给出 --baseline 时与之前的结果逐项比较，
+p99延迟或吞吐量变差超过 --threshold 的项标记为REGRESSION。
+
+用法：
+    python -m benchmarks.bench_tools --windows 10 100 1000 5000 --concurrency 1 16 256
+    python -m benchmarks.bench_tools --tools list minimize --output new.json --baseline old.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from layout_driver.cache import window_list_cache
+from layout_driver.config import APIConfig, CacheConfig
+from layout_driver.driver import DriverTools, create_server
+from layout_driver.http_client import http_client_lifespan
+from layout_driver.resilience import circuit_breaker_lifespan, circuit_breakers
+
+from .stub_backend import make_windows
+
+_REPO_DIR = Path(__file__).resolve().parent.parent
+
+# 工具简称 -> (工具名, 由窗口列表生成调用参数的函数)
+TOOLS: Dict[str, Tuple[str, Callable[[List[Dict[str, Any]]], Dict[str, Any]]]] = {
+    "list": (DriverTools.GET_WINDOW_LIST.value, lambda windows: {"force_refresh": True}),
+    "close": (DriverTools.CLOSE_WINDOWS_BATCH.value, lambda windows: {"windows": windows}),
+    "minimize": (DriverTools.MINIMIZE_WINDOWS_BATCH.value, lambda windows: {"windows": windows}),
+    "maximize": (DriverTools.MAXIMIZE_WINDOWS_BATCH.value, lambda windows: {"windows": windows}),
+    "restore": (DriverTools.RESTORE_WINDOWS_BATCH.value, lambda windows: {"windows": windows}),
+    "opacity": (DriverTools.SET_WINDOW_OPACITY_BATCH.value,
+                lambda windows: {"windows": [{**window, "opacity": 128} for window in windows]}),
+}
+
+# 用tracemalloc跟踪内存时的调用次数（tracemalloc会显著拖慢调用，不与延迟测量混在一起）
+MEMORY_CALLS = 20
+
+
+class StubProcess:
+    """在子进程中运行桩后端，避免桩后端与驱动争用同一个GIL和事件循环"""
+
+    def __init__(self, windows: int, latency: float, failure_rate: float, icon_size: int):
+        self.args = [
+            sys.executable, "-m", "benchmarks.stub_backend",
+            "--windows", str(windows), "--latency", str(latency),
+            "--failure-rate", str(failure_rate), "--icon-size", str(icon_size),
+        ]
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> str:
+        self.process = subprocess.Popen(self.args, cwd=_REPO_DIR, stdout=subprocess.PIPE, text=True)
+        base_url = self.process.stdout.readline().strip()
+        if not base_url:
+            raise RuntimeError("桩后端启动失败")
+        return base_url
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """已排序数据的分位数（最近秩）"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+async def _drive(session: Any, tool: str, arguments: Dict[str, Any],
+                 calls: int, concurrency: int) -> Tuple[List[float], int, float]:
+    """以给定并发度调用工具，返回（每次调用的延迟ms，失败次数，总耗时秒）"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one_call() -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            result = await session.call_tool(tool, arguments)
+            latencies.append((time.perf_counter() - start) * 1000)
+            # compact / standard模式下success都是第一个字段，避免在测量期间解析大响应
+            if result.isError or result.content[0].text.startswith('{"success":false'):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(calls)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def _bench_case(session: Any, name: str, windows: List[Dict[str, Any]],
+                      calls: int, concurrency: int) -> Dict[str, Any]:
+    tool, make_arguments = TOOLS[name]
+    arguments = make_arguments(windows)
+
+    # 每个场景从相同的状态开始
+    window_list_cache.invalidate()
+    for breaker_name in list(circuit_breakers.stats()):
+        circuit_breakers.get(breaker_name).reset()
+
+    # 预热：建立连接、填充缓存
+    await _drive(session, tool, arguments, min(concurrency, 8), min(concurrency, 8))
+
+    latencies, errors, elapsed = await _drive(session, tool, arguments, calls, concurrency)
+    latencies.sort()
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    await _drive(session, tool, arguments, min(calls, MEMORY_CALLS), concurrency)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return {
+        "tool": name,
+        "windows": len(windows),
+        "concurrency": concurrency,
+        "calls": calls,
+        "errors": errors,
+        "error_rate": round(errors / calls, 4),
+        "throughput": round(calls / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "max_ms": round(latencies[-1], 3),
+        "peak_mib": round(peak / (1024 * 1024), 3),
+    }
+
+
+async def _bench_windows(base_url: str, count: int, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """对一个窗口数量运行全部工具和并发度组合"""
+    APIConfig.BASE_URL = base_url
+    # 批量操作的参数与get_window_list返回的窗口一致（不含图标数据）
+    windows = make_windows(count, icon_size=0)
+    results = []
+    async with http_client_lifespan(), circuit_breaker_lifespan():
+        async with create_connected_server_and_client_session(create_server()) as session:
+            for name in args.tools:
+                for concurrency in args.concurrency:
+                    calls = max(args.calls, concurrency)
+                    result = await _bench_case(session, name, windows, calls, concurrency)
+                    results.append(result)
+                    _print_row(result)
+    return results
+
+
+async def _bench_all(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """依次为每个窗口数量启动桩后端并运行全部场景（共用一个事件循环）"""
+    results: List[Dict[str, Any]] = []
+    for count in args.windows:
+        with StubProcess(count, args.latency, args.failure_rate, args.icon_size) as base_url:
+            results.extend(await _bench_windows(base_url, count, args))
+    return results
+
+
+def _print_header() -> None:
+    print(f"{'tool':<10}{'windows':>8}{'conc':>6}{'calls/s':>10}{'p50 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}{'errors':>8}{'peak MiB':>10}")
+
+
+def _print_row(result: Dict[str, Any]) -> None:
+    print(f"{result['tool']:<10}{result['windows']:>8}{result['concurrency']:>6}"
+          f"{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+          f"{result['max_ms']:>10.2f}{result['errors']:>8}{result['peak_mib']:>10.2f}", flush=True)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=_REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> int:
+    """与之前的结果逐项比较并打印变化，返回回退的项数"""
+    previous = {(r["tool"], r["windows"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = 0
+    print(f"\n对比 {baseline['meta'].get('commit') or '基准结果'}（比值 = 本次 / 基准）")
+    print(f"{'tool':<10}{'windows':>8}{'conc':>6}{'calls/s':>10}{'p50':>8}{'p99':>8}  status")
+    for result in results:
+        old = previous.get((result["tool"], result["windows"], result["concurrency"]))
+        if old is None:
+            continue
+        throughput = result["throughput"] / old["throughput"] if old["throughput"] else 1.0
+        p50 = result["p50_ms"] / old["p50_ms"] if old["p50_ms"] else 1.0
+        p99 = result["p99_ms"] / old["p99_ms"] if old["p99_ms"] else 1.0
+        regressed = p99 > 1 + threshold or throughput < 1 / (1 + threshold)
+        regressions += regressed
+        print(f"{result['tool']:<10}{result['windows']:>8}{result['concurrency']:>6}"
+              f"{throughput:>10.2f}{p50:>8.2f}{p99:>8.2f}  {'REGRESSION' if regressed else 'ok'}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tools", nargs="+", choices=list(TOOLS), default=list(TOOLS),
+                        help="要测量的工具")
+    parser.add_argument("--windows", type=int, nargs="+", default=[10, 100, 1000, 5000],
+                        help="窗口数量（可指定多个）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 256],
+                        help="并发调用数（可指定多个）")
+    parser.add_argument("--calls", type=int, default=100,
+                        help="每个场景的调用次数（不少于并发调用数）")
+    parser.add_argument("--latency", type=float, default=0.0, help="桩后端每个请求的模拟延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="桩后端请求以503失败的概率（0-1）")
+    parser.add_argument("--icon-size", type=int, default=512, help="桩后端每个模拟图标的base64长度")
+    parser.add_argument("--no-etag", action="store_true",
+                        help="不使用条件请求，get_window_list每次都传输完整列表")
+    parser.add_argument("--output", default="bench_tools.json", help="结果JSON文件")
+    parser.add_argument("--baseline", help="之前的结果JSON文件，用于比较")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="判定回退的相对变化（默认0.2，即变差20%%）")
+    args = parser.parse_args()
+
+    # 失败率不为0时重试日志很多，只保留错误日志
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.no_etag:
+        CacheConfig.CONDITIONAL_ENDPOINTS = set()
+
+    _print_header()
+    results = asyncio.run(_bench_all(args))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n结果已写入 {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+列式窗口表基准测试
+
+模拟连续刷新窗口列表：每次刷新都从JSON重新解析后端响应，
+对比三种快照表示在保留 --history 个版本时的内存占用，以及每次刷新
+（构建快照 + 计算版本号 + 与上一版本比较）的耗时：
+
+- dicts: 逐窗口字典（去掉icon、加上icon_hash），历史中按句柄保存字典
+- pydantic: 逐窗口 WindowInfo 模型
+- table: 列式 WindowTable（array('q') 数值列 + 驻留字符串 + 图标哈希）
+
+用法：
+    python -m benchmarks.bench_window_table --windows 100 500 2000 --history 32
+"""
+
+import argparse
+import gc
+import hashlib
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from layout_driver.cache import WindowSnapshotHistory
+from layout_driver.driver import WindowInfo
+from layout_driver.window_table import WindowTable
+
+from .stub_backend import make_windows
+
+TRACKED_FIELDS = WindowSnapshotHistory.TRACKED_FIELDS
+
+
+def _icon_hash(icon: str) -> str:
+    return hashlib.sha1(icon.encode("utf-8")).hexdigest()[:16]
+
+
+def _version(rows: List[List[Any]]) -> str:
+    key = sorted(rows)
+    return hashlib.sha1(
+        json.dumps(key, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def build_dicts(windows: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """逐窗口字典表示"""
+    snapshot = {}
+    for window in windows:
+        stripped = {key: value for key, value in window.items() if key != "icon"}
+        stripped["icon_hash"] = _icon_hash(window["icon"]) if window.get("icon") else None
+        snapshot[window["handle"]] = stripped
+    return snapshot
+
+
+def refresh_dicts(windows: List[Dict[str, Any]], previous: Any) -> Tuple[Any, str]:
+    snapshot = build_dicts(windows)
+    version = _version([[handle, *(w.get(f) for f in TRACKED_FIELDS)] for handle, w in snapshot.items()])
+    if previous is not None:
+        [w for handle, w in snapshot.items()
+         if handle in previous and any(w.get(f) != previous[handle].get(f) for f in TRACKED_FIELDS)]
+    return snapshot, version
+
+
+def refresh_pydantic(windows: List[Dict[str, Any]], previous: Any) -> Tuple[Any, str]:
+    snapshot = {window["handle"]: WindowInfo.model_validate(window) for window in windows}
+    version = _version([[handle, *(getattr(w, f) for f in TRACKED_FIELDS)] for handle, w in snapshot.items()])
+    if previous is not None:
+        [w for handle, w in snapshot.items()
+         if handle in previous and any(getattr(w, f) != getattr(previous[handle], f) for f in TRACKED_FIELDS)]
+    return snapshot, version
+
+
+def refresh_table(windows: List[Dict[str, Any]], previous: Any) -> Tuple[Any, str]:
+    hashes = {w["handle"]: _icon_hash(w["icon"]) if w.get("icon") else None for w in windows}
+    table = WindowTable.from_windows(windows, hashes.get)
+    version = WindowSnapshotHistory.compute_version(table)
+    if previous is not None:
+        rows = previous.rows
+        [row for row, handle in enumerate(table.handles)
+         if handle in rows and table.signature(row) != previous.signature(rows[handle])]
+    return table, version
+
+
+REPRESENTATIONS: Dict[str, Callable[[List[Dict[str, Any]], Any], Tuple[Any, str]]] = {
+    "dicts": refresh_dicts,
+    "pydantic": refresh_pydantic,
+    "table": refresh_table,
+}
+
+
+def bench(refresh: Callable, payload: bytes, history: int, rounds: int) -> Tuple[float, float]:
+    """返回（保留history个版本的内存MiB，每次刷新的平均耗时ms）"""
+    # 内存：保留最近history次刷新的快照
+    gc.collect()
+    tracemalloc.start()
+    snapshots = []
+    previous = None
+    for _ in range(history):
+        previous, _ = refresh(json.loads(payload), previous)
+        snapshots.append(previous)
+    memory = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+    tracemalloc.stop()
+    del snapshots
+
+    # 刷新耗时：解析 + 构建快照 + 版本号 + 与上一版本比较
+    previous = None
+    start = time.perf_counter()
+    for _ in range(rounds):
+        previous, _ = refresh(json.loads(payload), previous)
+    latency = (time.perf_counter() - start) / rounds * 1000
+    return memory, latency
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, nargs="+", default=[100, 500, 2000],
+                        help="窗口数量（可指定多个）")
+    parser.add_argument("--history", type=int, default=32, help="保留的快照版本数量")
+    parser.add_argument("--rounds", type=int, default=50, help="测量刷新耗时的次数")
+    parser.add_argument("--icon-size", type=int, default=2048, help="每个模拟图标的base64长度")
+    args = parser.parse_args()
+
+    print(f"{'windows':>8}{'repr':>10}{'memory MiB':>12}{'refresh ms':>12}")
+    for count in args.windows:
+        payload = json.dumps(make_windows(count, args.icon_size)).encode("utf-8")
+        for name, refresh in REPRESENTATIONS.items():
+            memory, latency = bench(refresh, payload, args.history, args.rounds)
+            print(f"{count:>8}{name:>10}{memory:>12.2f}{latency:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+传输编码基准测试
+
+不访问后端，对典型的后端报文比较各种编码的传输大小和序列化耗时：
+
+- list: GET /windows 的响应（带图标的窗口列表），测量后端编码、驱动解码（解压 + 解析）
+- batch: 批量操作请求体（不含图标），测量驱动编码（序列化 + 压缩）
+
+编码为 json / msgpack（需要安装msgpack）与 identity / gzip / deflate / br（需要安装brotli）/
+zstd（需要安装zstandard）的组合，未安装的编码自动跳过。
+
+用法：
+    python -m benchmarks.bench_wire --windows 1 100 1000 --icon-size 2048
+"""
+
+import argparse
+import json
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from layout_driver.driver import WindowInfo, window_list_body
+from layout_driver.wire import COMPRESSORS, msgpack
+
+from .stub_backend import make_windows
+
+Codec = Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+
+def _codecs() -> Dict[str, Codec]:
+    """可用的压缩算法：名称 -> (压缩, 解压)"""
+    codecs: Dict[str, Codec] = {
+        "identity": (lambda data: data, lambda data: data),
+        "gzip": (COMPRESSORS["gzip"], lambda data: zlib.decompress(data, 16 + zlib.MAX_WBITS)),
+        "deflate": (lambda data: zlib.compress(data, 5), zlib.decompress),
+    }
+    if "br" in COMPRESSORS:
+        import brotli
+        codecs["br"] = (COMPRESSORS["br"], brotli.decompress)
+    if "zstd" in COMPRESSORS:
+        import zstandard
+        codecs["zstd"] = (COMPRESSORS["zstd"], zstandard.ZstdDecompressor().decompress)
+    return codecs
+
+
+def _formats() -> Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    """可用的序列化格式：名称 -> (序列化, 解析)"""
+    formats = {
+        "json": (
+            lambda data: json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            json.loads,
+        ),
+    }
+    if msgpack is not None:
+        formats["msgpack"] = (
+            lambda data: msgpack.packb(data, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+        )
+    return formats
+
+
+def _per_call_ms(func: Callable[[], Any], repeat: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def _bench_payload(kind: str, count: int, data: Any, repeat: int,
+                   models: Optional[List[WindowInfo]] = None) -> List[Dict[str, Any]]:
+    """对一个报文测量全部格式与压缩算法的组合"""
+    results = []
+    for format_name, (dumps, loads) in _formats().items():
+        raw = dumps(data)
+        if models is not None and format_name == "json":
+            # 批量请求体的JSON由pydantic直接序列化（与驱动发送的一致）
+            dumps = lambda _: window_list_body(models)  # noqa: E731
+        for codec_name, (compress, decompress) in _codecs().items():
+            wire = compress(raw)
+            results.append({
+                "payload": kind,
+                "windows": count,
+                "format": format_name,
+                "encoding": codec_name,
+                "raw_bytes": len(raw),
+                "wire_bytes": len(wire),
+                "ratio": round(len(wire) / len(raw), 4) if raw else 1.0,
+                "encode_ms": round(_per_call_ms(lambda: compress(dumps(data)), repeat), 4),
+                "decode_ms": round(_per_call_ms(lambda: loads(decompress(wire)), repeat), 4),
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 100, 1000], help="窗口数量（可指定多个）")
+    parser.add_argument("--icon-size", type=int, default=2048, help="窗口列表中每个模拟图标的base64长度")
+    parser.add_argument("--repeat", type=int, default=200, help="每项测量的调用次数（按窗口数量递减）")
+    parser.add_argument("--output", help="结果JSON文件（可空）")
+    args = parser.parse_args()
+
+    print(f"{'payload':<8}{'windows':>8}{'format':>9}{'encoding':>10}{'raw B':>10}{'wire B':>10}"
+          f"{'ratio':>8}{'encode ms':>11}{'decode ms':>11}")
+    results: List[Dict[str, Any]] = []
+    for count in args.windows:
+        repeat = max(5, args.repeat // max(1, count // 50))
+        window_list = make_windows(count, icon_size=args.icon_size)
+        models = [WindowInfo(**window) for window in make_windows(count, icon_size=0)]
+        batch = [window.model_dump(exclude={"icon"}) for window in models]
+        for result in (_bench_payload("list", count, window_list, repeat)
+                       + _bench_payload("batch", count, batch, repeat, models)):
+            results.append(result)
+            print(f"{result['payload']:<8}{result['windows']:>8}{result['format']:>9}{result['encoding']:>10}"
+                  f"{result['raw_bytes']:>10}{result['wire_bytes']:>10}{result['ratio']:>8.3f}"
+                  f"{result['encode_ms']:>11.3f}{result['decode_ms']:>11.3f}", flush=True)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"args": vars(args), "results": results},
+                                                ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
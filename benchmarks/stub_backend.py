@@ -0,0 +1,237 @@
+"""
+本地桩后端（stub backend）
+
+在后台线程中运行一个实现了窗口管理API的starlette应用，供基准测试使用。
+也可以单独运行，在独立进程中提供后端（启动后在标准输出打印一行base URL）：
+
+    python -m benchmarks.stub_backend --windows 1000 --latency 0.005 --failure-rate 0.01
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+
+def make_windows(count: int, icon_size: int = 2048) -> List[Dict[str, Any]]:
+    """生成指定数量的模拟窗口信息
+
+    每个窗口的图标从少量几种中选取（模拟同一应用的多个窗口共享图标），
+    icon_size为0时不生成图标。
+    """
+    icons = [
+        f"data:image/png;base64,{chr(ord('A') + variant) * icon_size}"
+        for variant in range(5)
+    ] if icon_size else [None]
+    return [
+        {
+            "handle": 10000 + i,
+            "title": f"窗口 {i}",
+            "width": 800 + i % 400,
+            "height": 600 + i % 300,
+            "x": (i * 37) % 1920,
+            "y": (i * 23) % 1080,
+            "icon": icons[i % len(icons)],
+            "alias": f"alias-{i}" if i % 3 == 0 else None,
+        }
+        for i in range(count)
+    ]
+
+
+class StubBackend:
+    """运行在后台线程中的桩后端
+
+    入参：
+        window_count: GET /windows 返回的窗口数量
+        icon_size: 每个模拟图标的base64长度，0表示不带图标
+        failure_rate: 请求以503失败的概率（0-1）
+        latency: 每个请求的模拟处理延迟（秒）
+        events: GET /windows/events 支持的订阅方式，"sse"、"long_poll"或None（返回404）
+        host / port: 监听地址，port为0时由系统分配
+    """
+
+    def __init__(self, window_count: int = 50, latency: float = 0.0,
+                 icon_size: int = 2048, failure_rate: float = 0.0,
+                 events: Optional[str] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.windows = make_windows(window_count, icon_size)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.events = events
+        self.host = host
+        self.port = port
+        self.request_count = 0
+        self._event_log: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def _delay(self) -> Optional[Response]:
+        """模拟处理延迟；按failure_rate注入失败时返回503响应"""
+        self.request_count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            return JSONResponse({"error": "stub failure"}, status_code=503)
+        return None
+
+    @property
+    def etag(self) -> str:
+        """当前窗口列表的ETag"""
+        with self._lock:
+            body = json.dumps(self.windows, sort_keys=True).encode("utf-8")
+        return f'"{hashlib.sha1(body).hexdigest()}"'
+
+    async def _list_windows(self, request: Request) -> Response:
+        failure = await self._delay()
+        if failure is not None:
+            return failure
+        etag = self.etag
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        with self._lock:
+            windows = list(self.windows)
+        return JSONResponse(windows, headers={"ETag": etag})
+
+    def emit(self, event_type: str, window: Optional[Dict[str, Any]] = None,
+             handle: Optional[int] = None) -> None:
+        """修改窗口列表并记录一个窗口事件（可在任意线程调用）
+
+        created / changed需给出window（changed可只含handle和变化的字段），removed需给出handle。
+        """
+        with self._lock:
+            if event_type == "removed":
+                self.windows = [w for w in self.windows if w["handle"] != handle]
+                event = {"type": "removed", "handle": handle}
+            else:
+                for existing in self.windows:
+                    if existing["handle"] == window["handle"]:
+                        existing.update(window)
+                        break
+                else:
+                    self.windows.append(dict(window))
+                event = {"type": event_type, "window": window}
+            self._event_log.append(event)
+
+    def _events_since(self, cursor: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._event_log[cursor:]
+
+    async def _window_events(self, request: Request) -> Response:
+        accept = request.headers.get("accept", "")
+        if self.events == "sse" and "text/event-stream" in accept:
+            cursor = int(request.headers.get("last-event-id") or len(self._event_log))
+
+            async def stream():
+                nonlocal cursor
+                # 先发送一个注释行，使客户端立即收到响应头
+                yield ": connected\n\n"
+                while True:
+                    for event in self._events_since(cursor):
+                        cursor += 1
+                        yield f"id: {cursor}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+                    await asyncio.sleep(0.01)
+
+            return StreamingResponse(stream(), media_type="text/event-stream")
+        if self.events == "long_poll" and "text/event-stream" not in accept:
+            cursor = int(request.query_params.get("cursor") or len(self._event_log))
+            deadline = time.monotonic() + float(request.query_params.get("timeout", "25"))
+            while not self._events_since(cursor) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            events = self._events_since(cursor)
+            return JSONResponse({"cursor": str(cursor + len(events)), "events": events})
+        return JSONResponse({"error": "not found"}, status_code=404)
+
+    def _batch_handler(self, count_key: str):
+        async def handler(request: Request) -> Response:
+            failure = await self._delay()
+            if failure is not None:
+                return failure
+            body = await request.json()
+            count = len(body) if isinstance(body, list) else 1
+            return JSONResponse({
+                "message": "操作完成",
+                count_key: count,
+                "failed_windows": [],
+            })
+        return handler
+
+    def build_app(self) -> Starlette:
+        """构建实现全部窗口管理端点的starlette应用"""
+        return Starlette(routes=[
+            Route("/windows", self._list_windows, methods=["GET"]),
+            Route("/windows/events", self._window_events, methods=["GET"]),
+            Route("/windows/close", self._batch_handler("closed_count"), methods=["POST"]),
+            Route("/windows/minimize", self._batch_handler("minimized_count"), methods=["POST"]),
+            Route("/windows/maximize", self._batch_handler("maximized_count"), methods=["POST"]),
+            Route("/windows/restore", self._batch_handler("restored_count"), methods=["POST"]),
+            Route("/windows/opacity", self._batch_handler("updated_count"), methods=["POST"]),
+        ])
+
+    def start(self) -> "StubBackend":
+        """在后台线程中启动服务器，并等待端口就绪"""
+        config = uvicorn.Config(self.build_app(), host=self.host, port=self.port,
+                                log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        # 端口为0时读取系统实际分配的端口
+        sockets = self._server.servers[0].sockets
+        self.port = sockets[0].getsockname()[1]
+        return self
+
+    def stop(self) -> None:
+        """停止服务器并等待后台线程退出"""
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StubBackend":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, default=50, help="GET /windows 返回的窗口数量")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的模拟处理延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="请求以503失败的概率（0-1）")
+    parser.add_argument("--icon-size", type=int, default=2048, help="每个模拟图标的base64长度，0表示不带图标")
+    parser.add_argument("--events", choices=("sse", "long_poll"), default=None, help="支持的窗口事件订阅方式")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=0, help="监听端口，0表示由系统分配")
+    args = parser.parse_args()
+
+    backend = StubBackend(window_count=args.windows, latency=args.latency,
+                          icon_size=args.icon_size, failure_rate=args.failure_rate,
+                          events=args.events, host=args.host, port=args.port)
+    with backend:
+        print(backend.base_url, flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import logging
 import sys
 from .driver import serve
@@ -5,9 +6,33 @@ from .driver import serve
 def main() -> None:
     """MCP Window Layout Driver - Driver functionality for MCP"""
     import asyncio
+    from .config import ServerConfig
+    from .transport import TRANSPORTS
+
+    parser = argparse.ArgumentParser(prog="layout_driver", description=main.__doc__)
+    parser.add_argument("--transport", choices=TRANSPORTS, default=ServerConfig.TRANSPORT,
+                        help="传输方式：stdio（默认）、http（Streamable HTTP）或 sse")
+    parser.add_argument("--host", default=ServerConfig.HOST, help="HTTP / SSE 模式的监听地址")
+    parser.add_argument("--port", type=int, default=ServerConfig.PORT, help="HTTP / SSE 模式的监听端口")
+    parser.add_argument("--max-concurrency", type=int, default=ServerConfig.MAX_CONCURRENCY,
+                        help="HTTP / SSE 模式下同时处理的最大连接/请求数，0表示不限制")
+    parser.add_argument("--write-schemas", action="store_true",
+                        help="按当前工具模型重新生成tool_schemas.json后退出")
+    args = parser.parse_args()
+
+    if args.write_schemas:
+        from .schemas import write_tool_schemas
+        print(f"已写入 {write_tool_schemas()}")
+        return
+
     logging_level = logging.WARN
     logging.basicConfig(level=logging_level, stream=sys.stderr)
-    asyncio.run(serve())
+    asyncio.run(serve(
+        transport=args.transport,
+        host=args.host,
+        port=args.port,
+        max_concurrency=args.max_concurrency,
+    ))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,113 @@
+"""
+MCP Layout Driver 批量请求分片
+
+窗口数量很多时，一个批量POST请求可能超过后端的处理时限，且一次失败会使整批窗口失败。
+这里把批量操作按窗口数和请求体大小拆分为多个分片，分片结果再合并为一个结果，
+每个窗口仍有各自的操作结果（window_results）。
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+
+# 分片：（窗口列表，已序列化的请求体）
+Chunk = Tuple[List[Any], bytes]
+
+
+def split_batch(items: List[Any], encode: Callable[[List[Any]], bytes],
+                max_items: int, max_bytes: int) -> List[Chunk]:
+    """把批量操作的窗口拆分为若干分片
+
+    先按max_items等分，再把请求体超过max_bytes的分片对半拆分，直到不超过上限；
+    单个窗口的请求体超过上限时无法再拆分，仍单独发送。没有超过上限时只有一个分片，
+    请求体只序列化一次。
+
+    入参：
+        items: 窗口列表（按请求顺序）
+        encode: 把窗口列表序列化为请求体的函数
+        max_items: 每个分片最多包含的窗口数，0表示不限制
+        max_bytes: 每个分片请求体的最大字节数，0表示不限制
+
+    出参：
+        List[Chunk]: 按原顺序排列的分片
+    """
+    if max_items > 0 and len(items) > max_items:
+        # 等分而不是按上限切分，避免最后一个分片很小
+        count = -(-len(items) // max_items)
+        size = -(-len(items) // count)
+        pending = [items[start:start + size] for start in range(0, len(items), size)]
+    else:
+        pending = [items]
+
+    chunks: List[Chunk] = []
+    while pending:
+        part = pending.pop(0)
+        body = encode(part)
+        if max_bytes > 0 and len(body) > max_bytes and len(part) > 1:
+            middle = len(part) // 2
+            pending[:0] = [part[:middle], part[middle:]]
+            continue
+        chunks.append((part, body))
+    return chunks
+
+
+def _merge_contents(contents: List[Any]) -> Any:
+    """合并各分片的后端响应内容：数值字段相加，列表字段拼接，其余字段取第一个分片的值"""
+    if not contents:
+        return None
+    if not all(isinstance(content, dict) for content in contents):
+        return contents
+    merged: Dict[str, Any] = {}
+    for content in contents:
+        for key, value in content.items():
+            if key not in merged:
+                merged[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list) and isinstance(merged[key], list):
+                merged[key].extend(value)
+            elif (isinstance(value, (int, float)) and not isinstance(value, bool)
+                  and isinstance(merged[key], (int, float)) and not isinstance(merged[key], bool)):
+                merged[key] += value
+    return merged
+
+
+def merge_batch_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """把各分片的请求结果合并为一个结果
+
+    入参：
+        results: 按分片顺序排列、已附带window_results的make_api_request结果
+
+    出参：
+        Dict[str, Any]: 合并后的结果：
+        - success: 全部分片都成功时为True
+        - content: 成功分片的响应内容合并（计数相加、failed_windows等列表拼接）
+        - window_results: 按原顺序拼接的逐窗口结果，失败分片中的窗口带有该分片的错误信息
+        - error: 有分片失败时的错误信息
+        - chunks: 每个分片的窗口数、是否成功、状态码和尝试次数
+    """
+    if len(results) == 1:
+        return results[0]
+
+    failed = [result for result in results if not result.get("success")]
+    first = failed[0] if failed else results[0]
+    merged: Dict[str, Any] = {
+        "success": not failed,
+        "status_code": first.get("status_code"),
+        "content": _merge_contents([result.get("content") for result in results if result.get("success")]),
+        "url": first.get("url"),
+        "window_results": [item for result in results for item in result["window_results"]],
+        "chunks": [
+            {
+                "windows": len(result["window_results"]),
+                "success": bool(result.get("success")),
+                "status_code": result.get("status_code"),
+                "attempts": result.get("attempts"),
+            }
+            for result in results
+        ],
+    }
+    if failed:
+        merged["error"] = f"{len(failed)}/{len(results)} 个分片请求失败: {first.get('error')}"
+        # 熔断信息原样保留，调用方据此决定何时重试
+        for key in ("circuit_open", "retry_after"):
+            if key in first:
+                merged[key] = first[key]
+    return merged
+
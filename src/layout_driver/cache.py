@@ -0,0 +1,300 @@
+"""
+MCP Layout Driver 缓存
+
+为窗口列表等读多写少的数据提供进程内缓存。
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import CacheConfig
+from .window_table import WindowTable
+
+
+class WindowListCache:
+    """窗口列表快照缓存
+
+    缓存最近一次成功的GET /windows结果，在TTL内直接返回；
+    任何修改窗口状态的操作都应调用invalidate()使缓存失效。
+
+    入参：
+        ttl: 缓存有效期（秒），0表示禁用缓存
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._result: Optional[Dict[str, Any]] = None
+        self._expires_at = 0.0
+        # 每次失效递增，用于丢弃失效前发出、失效后才返回的请求结果
+        self._generation = 0
+        # 窗口事件订阅在线时缓存由事件增量更新，不按TTL过期
+        self.live = False
+
+    @property
+    def generation(self) -> int:
+        """当前缓存代数"""
+        return self._generation
+
+    def _fresh(self) -> bool:
+        return self._result is not None and (self.live or time.monotonic() < self._expires_at)
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """读取缓存，命中时返回结果副本，未命中或已过期返回None"""
+        if self._fresh():
+            self.hits += 1
+            return dict(self._result)
+        self.misses += 1
+        return None
+
+    def set(self, result: Dict[str, Any], generation: int) -> None:
+        """写入缓存
+
+        入参：
+            result: make_api_request返回的成功结果
+            generation: 发起请求前读取的缓存代数；若期间缓存已失效则丢弃本次结果
+        """
+        if self.ttl <= 0 or generation != self._generation:
+            return
+        self._result = dict(result)
+        self._expires_at = time.monotonic() + self.ttl
+
+    def apply(self, update: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """用窗口事件增量更新缓存
+
+        递增缓存代数（事件之前发出的请求结果不再写入缓存），
+        缓存有效时用update(结果副本)的返回值替换缓存内容。
+
+        出参：
+            Optional[Dict[str, Any]]: 更新后的结果；缓存为空或已过期时返回None
+        """
+        self._generation += 1
+        if not self._fresh():
+            return None
+        self._result = update(dict(self._result))
+        self._expires_at = time.monotonic() + self.ttl
+        return dict(self._result)
+
+    def peek(self) -> Optional[Dict[str, Any]]:
+        """读取仍有效的缓存内容（不计入命中统计）"""
+        return dict(self._result) if self._fresh() else None
+
+    def invalidate(self) -> None:
+        """使缓存失效"""
+        self._generation += 1
+        self._result = None
+        self._expires_at = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "ttl": self.ttl,
+            "live": self.live,
+        }
+
+
+class ConditionalGetCache:
+    """条件GET验证器缓存
+
+    记录每个URL最近一次响应的ETag / Last-Modified及其内容，
+    下次请求时发送If-None-Match / If-Modified-Since，
+    后端返回304 Not Modified时直接复用缓存的内容。
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    def request_headers(self, key: str) -> Dict[str, str]:
+        """生成条件请求头，没有可用验证器时返回空字典"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key: str, response_headers: Any, content: Any) -> None:
+        """保存响应的验证器和内容；响应未携带任何验证器时不缓存"""
+        etag = response_headers.get("etag")
+        last_modified = response_headers.get("last-modified")
+        if not etag and not last_modified:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "content": content,
+        }
+
+    def validators(self, key: str) -> Dict[str, Optional[str]]:
+        """返回保存的验证器（etag、last_modified），没有时均为None"""
+        entry = self._entries.get(key) or {}
+        return {"etag": entry.get("etag"), "last_modified": entry.get("last_modified")}
+
+    def get_content(self, key: str) -> Any:
+        """读取缓存的响应内容，不存在时返回None"""
+        entry = self._entries.get(key)
+        return entry["content"] if entry is not None else None
+
+
+class WindowSnapshotHistory:
+    """窗口列表版本历史
+
+    为每个不同的窗口列表生成版本号（内容哈希），并以列式窗口表保留最近的若干个版本，
+    用于计算自某个版本以来新增、移除和变化的窗口。
+
+    入参：
+        max_versions: 最多保留的版本数量
+    """
+
+    # 参与变化比较的窗口字段（与WindowTable.signature的顺序一致）
+    TRACKED_FIELDS = ("title", "width", "height", "x", "y", "alias")
+
+    def __init__(self, max_versions: int):
+        self.max_versions = max_versions
+        self._snapshots: "OrderedDict[str, WindowTable]" = OrderedDict()
+
+    @staticmethod
+    def compute_version(table: WindowTable) -> str:
+        """根据窗口的句柄和跟踪字段计算版本号"""
+        key = sorted(
+            [table.handles[row], *table.signature(row)] for row in range(len(table))
+        )
+        digest = hashlib.sha1(
+            json.dumps(key, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        )
+        return digest.hexdigest()[:16]
+
+    def record(self, table: WindowTable) -> str:
+        """记录一个窗口列表快照并返回其版本号"""
+        version = self.compute_version(table)
+        if version in self._snapshots:
+            self._snapshots.move_to_end(version)
+            return version
+        self._snapshots[version] = table
+        while len(self._snapshots) > self.max_versions:
+            self._snapshots.popitem(last=False)
+        return version
+
+    def diff(self, since_version: str, table: WindowTable) -> Optional[Dict[str, Any]]:
+        """计算自since_version以来的窗口变化
+
+        出参：
+            Optional[Dict[str, Any]]: 包含added（新增窗口）、removed（移除的句柄）、
+            changed（标题/位置/尺寸/别名变化的窗口）；since_version未知或已过期时返回None
+        """
+        previous = self._snapshots.get(since_version)
+        if previous is None:
+            return None
+        previous_rows = previous.rows
+        current_rows = table.rows
+        added = []
+        changed = []
+        for row, handle in enumerate(table.handles):
+            previous_row = previous_rows.get(handle)
+            if previous_row is None:
+                added.append(table.row(row))
+            elif table.signature(row) != previous.signature(previous_row):
+                changed.append(table.row(row))
+        return {
+            "added": added,
+            "removed": [handle for handle in previous.handles if handle not in current_rows],
+            "changed": changed,
+        }
+
+
+class IconCache:
+    """按内容哈希去重的窗口图标LRU缓存
+
+    窗口列表中的base64图标按内容哈希保存一份，并记录每个窗口句柄对应的图标哈希。
+    窗口表只保存icon_hash，图标数据通过get_window_icons按需获取。
+
+    入参：
+        max_icons: 最多保存的不同图标数量
+    """
+
+    def __init__(self, max_icons: int):
+        self.max_icons = max_icons
+        self._icons: "OrderedDict[str, str]" = OrderedDict()
+        self._handle_hashes: Dict[int, Optional[str]] = {}
+
+    @staticmethod
+    def compute_hash(icon: str) -> str:
+        """计算图标内容哈希"""
+        return hashlib.sha1(icon.encode("utf-8")).hexdigest()[:16]
+
+    def ingest(self, windows: List[Dict[str, Any]]) -> None:
+        """从完整窗口列表中收集图标，并更新句柄到图标哈希的映射"""
+        handle_hashes: Dict[int, Optional[str]] = {}
+        for window in windows:
+            icon = window.get("icon")
+            if not icon:
+                handle_hashes[window["handle"]] = None
+                continue
+            icon_hash = self.compute_hash(icon)
+            handle_hashes[window["handle"]] = icon_hash
+            self._icons[icon_hash] = icon
+            self._icons.move_to_end(icon_hash)
+        self._handle_hashes = handle_hashes
+        while len(self._icons) > self.max_icons:
+            self._icons.popitem(last=False)
+
+    def update(self, windows: List[Dict[str, Any]], removed: List[int]) -> None:
+        """按窗口事件增量更新：收集事件中携带的图标，并移除已关闭窗口的映射"""
+        for window in windows:
+            if "icon" not in window:
+                continue
+            icon = window["icon"]
+            if not icon:
+                self._handle_hashes[window["handle"]] = None
+                continue
+            icon_hash = self.compute_hash(icon)
+            self._handle_hashes[window["handle"]] = icon_hash
+            self._icons[icon_hash] = icon
+            self._icons.move_to_end(icon_hash)
+        for handle in removed:
+            self._handle_hashes.pop(handle, None)
+        while len(self._icons) > self.max_icons:
+            self._icons.popitem(last=False)
+
+    def knows(self, handle: int) -> bool:
+        """句柄是否已知，且其图标（如有）仍在缓存中"""
+        if handle not in self._handle_hashes:
+            return False
+        icon_hash = self._handle_hashes[handle]
+        return icon_hash is None or icon_hash in self._icons
+
+    def lookup(self, handle: int) -> Optional[str]:
+        """返回句柄对应的图标哈希，没有图标时返回None"""
+        return self._handle_hashes.get(handle)
+
+    def get(self, icon_hash: str) -> Optional[str]:
+        """按哈希读取图标数据"""
+        icon = self._icons.get(icon_hash)
+        if icon is not None:
+            self._icons.move_to_end(icon_hash)
+        return icon
+
+
+# 进程内共享的窗口列表缓存
+window_list_cache = WindowListCache(CacheConfig.WINDOW_LIST_TTL)
+
+# 进程内共享的条件GET验证器缓存
+conditional_get_cache = ConditionalGetCache()
+
+# 进程内共享的窗口列表版本历史
+window_snapshot_history = WindowSnapshotHistory(CacheConfig.WINDOW_HISTORY_SIZE)
+
+# 进程内共享的窗口图标缓存
+icon_cache = IconCache(CacheConfig.ICON_CACHE_SIZE)
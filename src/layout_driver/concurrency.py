@@ -0,0 +1,168 @@
+"""
+MCP Layout Driver 并发控制
+
+提供相同在途请求的合并（single-flight），以及限制发往后端的并发请求数的限流器。
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional
+
+from .config import ConcurrencyConfig
+
+
+class _Flight:
+    """一个在途的合并请求：独立运行的任务及其等待者数量"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """相同在途请求合并
+
+    同一个键的请求在途时，后续调用不再发起新请求，而是等待并共享第一个请求的结果。
+    每个等待者拿到结果字典的浅拷贝，互不影响。
+
+    请求在独立的任务中执行，不属于任何一个调用方：某个调用方被取消（例如客户端断开或超时）
+    只影响它自己，其他等待者照常拿到结果；所有等待者都取消后才取消请求本身。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable,
+                 func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """执行func，若相同key的请求已在途则复用其结果"""
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            flight = _Flight(asyncio.get_running_loop().create_task(func()))
+            flight.task.add_done_callback(lambda task: self._finish(key, task))
+            self._inflight[key] = flight
+            self.leaders += 1
+
+        flight.waiters += 1
+        try:
+            return dict(await asyncio.shield(flight.task))
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 所有等待者都已取消，不再需要结果
+                flight.task.cancel()
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is not None and self._inflight[key].task is task:
+            del self._inflight[key]
+        # 没有等待者时也标记异常已读取，避免"exception was never retrieved"警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """返回合并统计"""
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+class _Slot:
+    """一组并发上限及其排队统计"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit) if limit > 0 else None
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+        }
+
+
+class ConcurrencyLimiter:
+    """全局与按端点的后端并发限流器
+
+    先获取端点配额再获取全局配额，避免排队中的端点占用全局配额。
+    统计每个配额当前在途、排队和历史最大排队数量。
+
+    入参：
+        global_limit: 全局最大并发数，0表示不限制
+        endpoint_limit: 每个端点最大并发数，0表示不限制
+    """
+
+    def __init__(self, global_limit: int, endpoint_limit: int):
+        self.global_limit = global_limit
+        self.endpoint_limit = endpoint_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._global = _Slot(self.global_limit)
+        self._endpoints: Dict[str, _Slot] = {}
+
+    def _check_loop(self) -> None:
+        # 信号量绑定到事件循环，事件循环变化（例如多次asyncio.run）时重建
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._reset()
+
+    @asynccontextmanager
+    async def acquire(self, endpoint_key: str) -> AsyncIterator[None]:
+        """获取端点和全局并发配额"""
+        self._check_loop()
+        endpoint = self._endpoints.get(endpoint_key)
+        if endpoint is None:
+            endpoint = self._endpoints[endpoint_key] = _Slot(self.endpoint_limit)
+        slots = (endpoint, self._global)
+
+        acquired = []
+        try:
+            for slot in slots:
+                if slot.semaphore is not None and slot.semaphore.locked():
+                    # 配额已满，进入排队
+                    slot.queued += 1
+                    slot.max_queued = max(slot.max_queued, slot.queued)
+                    try:
+                        await slot.semaphore.acquire()
+                    finally:
+                        slot.queued -= 1
+                elif slot.semaphore is not None:
+                    await slot.semaphore.acquire()
+                acquired.append(slot)
+                slot.in_flight += 1
+            yield
+        finally:
+            for slot in acquired:
+                slot.in_flight -= 1
+                if slot.semaphore is not None:
+                    slot.semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回全局和各端点的并发与排队统计"""
+        return {
+            "global": self._global.stats(),
+            "endpoints": {key: slot.stats() for key, slot in self._endpoints.items()},
+        }
+
+
+# 进程内共享的请求合并器
+request_coalescer = SingleFlight()
+
+# 进程内共享的后端并发限流器
+backend_limiter = ConcurrencyLimiter(
+    ConcurrencyConfig.MAX_IN_FLIGHT, ConcurrencyConfig.MAX_IN_FLIGHT_PER_ENDPOINT
+)
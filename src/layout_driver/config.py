@@ -26,6 +26,7 @@ class APIConfig:
         "WINDOWS_MAXIMIZE_BATCH": "/windows/maximize", # POST - 批量最大化窗口
         "WINDOWS_RESTORE_BATCH": "/windows/restore", # POST - 批量还原窗口
         "WINDOWS_OPACITY_BATCH": "/windows/opacity", # POST - 批量设置窗口透明度
+        "WINDOWS_EVENTS": "/windows/events",     # GET - 窗口事件流（SSE或长轮询）
     }
     
     # 默认请求头
@@ -98,4 +99,227 @@ class SecurityConfig:
     AUTH_TOKEN = os.getenv("LAYOUT_DRIVER_AUTH_TOKEN", "")
     
     # 允许的最大重试次数
-    MAX_RETRIES = int(os.getenv("LAYOUT_DRIVER_MAX_RETRIES", "3")) 
\ No newline at end of file
+    MAX_RETRIES = int(os.getenv("LAYOUT_DRIVER_MAX_RETRIES", "3")) 
+
+
+# HTTP连接池配置
+class HTTPClientConfig:
+    """HTTP连接池配置类"""
+    
+    # 连接池最大连接数
+    MAX_CONNECTIONS = int(os.getenv("LAYOUT_DRIVER_MAX_CONNECTIONS", "100"))
+    
+    # 连接池最大保活连接数
+    MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LAYOUT_DRIVER_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    
+    # 保活连接的空闲过期时间（秒）
+    KEEPALIVE_EXPIRY = float(os.getenv("LAYOUT_DRIVER_KEEPALIVE_EXPIRY", "30"))
+    
+    # 是否启用HTTP/2（需要安装h2依赖）
+    HTTP2 = os.getenv("LAYOUT_DRIVER_HTTP2", "false").lower() == "true"
+
+
+# 传输编码配置
+class WireConfig:
+    """传输编码配置类"""
+    
+    # 请求头Accept-Encoding：auto（列出本机能解码的gzip、deflate、br、zstd）、off或自定义值
+    ACCEPT_ENCODING = os.getenv("LAYOUT_DRIVER_ACCEPT_ENCODING", "auto")
+    
+    # 请求体压缩方式：off（默认）、gzip、br、zstd；后端返回415时自动关闭
+    REQUEST_COMPRESSION = os.getenv("LAYOUT_DRIVER_REQUEST_COMPRESSION", "off").lower()
+    
+    # 请求体不小于该字节数时才压缩
+    COMPRESS_MIN_BYTES = int(os.getenv("LAYOUT_DRIVER_COMPRESS_MIN_BYTES", "4096"))
+    
+    # 编码格式：json（默认）或msgpack（需要安装msgpack，后端不支持时回退为JSON）
+    FORMAT = os.getenv("LAYOUT_DRIVER_WIRE_FORMAT", "json").lower()
+
+
+# 缓存配置
+class CacheConfig:
+    """缓存配置类"""
+    
+    # 窗口列表快照的缓存有效期（秒），0表示禁用缓存
+    WINDOW_LIST_TTL = float(os.getenv("LAYOUT_DRIVER_WINDOW_LIST_TTL", "2"))
+    
+    # 支持条件GET（ETag / Last-Modified）的端点
+    CONDITIONAL_ENDPOINTS = {"WINDOWS_LIST"}
+    
+    # get_window_changes可追溯的窗口列表版本数量
+    WINDOW_HISTORY_SIZE = int(os.getenv("LAYOUT_DRIVER_WINDOW_HISTORY_SIZE", "32"))
+    
+    # 图标缓存最多保存的不同图标数量（按内容哈希去重）
+    ICON_CACHE_SIZE = int(os.getenv("LAYOUT_DRIVER_ICON_CACHE_SIZE", "256"))
+
+
+# 窗口状态存储配置
+class StateStoreConfig:
+    """窗口状态存储配置类"""
+    
+    # SQLite数据库文件路径；为空（默认）表示不启用，:memory:表示只在进程内保存（可撤销，但不用于热启动）
+    PATH = os.path.expanduser(os.getenv("LAYOUT_DRIVER_STATE_DB", ""))
+    
+    # 保存的窗口操作历史条数（每次改变窗口状态的工具调用为一条），超出时删除最早的记录
+    HISTORY_SIZE = int(os.getenv("LAYOUT_DRIVER_STATE_HISTORY_SIZE", "50"))
+    
+    # 启动时用于热启动的窗口快照的最长保存时间（秒），更早的快照不使用；0表示不热启动
+    WARM_START_MAX_AGE = float(os.getenv("LAYOUT_DRIVER_STATE_WARM_START_MAX_AGE", "300"))
+
+
+# 工具响应配置
+class ResponseConfig:
+    """工具响应配置类"""
+    
+    # 响应模式：
+    # - compact: 不缩进，只保留success/content/error及批量结果、版本号等业务字段
+    # - standard: 不缩进，去掉HTTP响应头
+    # - debug: 缩进2格，保留完整的请求结果（含headers、url等）
+    MODE = os.getenv("LAYOUT_DRIVER_RESPONSE_MODE", "compact").lower()
+
+
+# 重试配置（最大重试次数见SecurityConfig.MAX_RETRIES）
+class RetryConfig:
+    """重试配置类"""
+    
+    # 指数退避的基础延迟和最大延迟（秒），实际延迟在[0, 退避上限]内随机抖动
+    BACKOFF_BASE = float(os.getenv("LAYOUT_DRIVER_RETRY_BACKOFF_BASE", "0.2"))
+    BACKOFF_MAX = float(os.getenv("LAYOUT_DRIVER_RETRY_BACKOFF_MAX", "5"))
+    
+    # 单次调用（含所有重试）的总时限（秒）
+    DEADLINE = float(os.getenv("LAYOUT_DRIVER_RETRY_DEADLINE", "60"))
+    
+    # 可安全自动重试的端点（关闭窗口不可重试）
+    IDEMPOTENT_ENDPOINTS = {
+        "WINDOWS_LIST",
+        "WINDOWS_MINIMIZE_BATCH",
+        "WINDOWS_MAXIMIZE_BATCH",
+        "WINDOWS_RESTORE_BATCH",
+        "WINDOWS_OPACITY_BATCH",
+    }
+    
+    # 视为暂时性故障、可以重试的HTTP状态码
+    RETRY_STATUS_CODES = {502, 503, 504}
+
+
+# 熔断器配置
+class CircuitBreakerConfig:
+    """熔断器配置类"""
+    
+    # 是否启用熔断器
+    ENABLED = os.getenv("LAYOUT_DRIVER_CIRCUIT_BREAKER", "true").lower() == "true"
+    
+    # 连续失败多少次后打开熔断器
+    FAILURE_THRESHOLD = int(os.getenv("LAYOUT_DRIVER_BREAKER_FAILURE_THRESHOLD", "5"))
+    
+    # 熔断器打开后多久进入半开状态，放行试探请求（秒）
+    RECOVERY_TIMEOUT = float(os.getenv("LAYOUT_DRIVER_BREAKER_RECOVERY_TIMEOUT", "15"))
+    
+    # 半开状态下允许同时进行的试探请求数量
+    HALF_OPEN_MAX_CALLS = int(os.getenv("LAYOUT_DRIVER_BREAKER_HALF_OPEN_MAX_CALLS", "1"))
+    
+    # 后台健康探测的间隔和超时（秒）
+    HEALTH_PROBE_INTERVAL = float(os.getenv("LAYOUT_DRIVER_HEALTH_PROBE_INTERVAL", "5"))
+    HEALTH_PROBE_TIMEOUT = float(os.getenv("LAYOUT_DRIVER_HEALTH_PROBE_TIMEOUT", "2"))
+    
+    # 健康探测使用的端点
+    HEALTH_ENDPOINT = os.getenv("LAYOUT_DRIVER_HEALTH_ENDPOINT", "WINDOWS_LIST")
+
+
+# 服务器传输配置
+class ServerConfig:
+    """服务器传输配置类"""
+    
+    # 传输方式：stdio（每个客户端一个进程）、http（Streamable HTTP）、sse
+    TRANSPORT = os.getenv("LAYOUT_DRIVER_TRANSPORT", "stdio").lower()
+    
+    # HTTP / SSE 模式的监听地址和端口
+    HOST = os.getenv("LAYOUT_DRIVER_HOST", "127.0.0.1")
+    PORT = int(os.getenv("LAYOUT_DRIVER_PORT", "8765"))
+    
+    # HTTP / SSE 模式下同时处理的最大连接/请求数（超出时返回503），0表示不限制
+    MAX_CONCURRENCY = int(os.getenv("LAYOUT_DRIVER_MAX_CONCURRENCY", "256"))
+    
+    # Streamable HTTP 模式下是否使用JSON响应代替SSE流
+    JSON_RESPONSE = os.getenv("LAYOUT_DRIVER_JSON_RESPONSE", "false").lower() == "true"
+
+
+# 并发控制配置
+class ConcurrencyConfig:
+    """并发控制配置类"""
+    
+    # 同时发往后端的最大请求数（全局），0表示不限制
+    MAX_IN_FLIGHT = int(os.getenv("LAYOUT_DRIVER_MAX_IN_FLIGHT", "64"))
+    
+    # 每个端点同时发往后端的最大请求数，0表示不限制
+    MAX_IN_FLIGHT_PER_ENDPOINT = int(os.getenv("LAYOUT_DRIVER_MAX_IN_FLIGHT_PER_ENDPOINT", "16"))
+    
+    # 是否合并相同的在途GET请求
+    COALESCE = os.getenv("LAYOUT_DRIVER_COALESCE", "true").lower() == "true"
+    
+    # execute_operations / apply_layout中同时执行的批量请求组数，0表示不限制
+    MAX_PARALLEL_GROUPS = int(os.getenv("LAYOUT_DRIVER_MAX_PARALLEL_GROUPS", "4"))
+
+
+# 批量请求分片配置
+class BatchConfig:
+    """批量请求分片配置类"""
+    
+    # 单个批量请求最多包含的窗口数，超过时拆分为多个请求；0表示不限制
+    MAX_ITEMS = int(os.getenv("LAYOUT_DRIVER_BATCH_MAX_ITEMS", "250"))
+    
+    # 单个批量请求体的最大字节数，0表示不限制（单个窗口超过上限时仍单独发送）
+    MAX_BYTES = int(os.getenv("LAYOUT_DRIVER_BATCH_MAX_BYTES", "262144"))
+    
+    # 同一批量操作同时发送的分片数，0表示不限制（仍受ConcurrencyConfig的并发上限约束）
+    MAX_PARALLEL_CHUNKS = int(os.getenv("LAYOUT_DRIVER_BATCH_MAX_PARALLEL_CHUNKS", "4"))
+
+
+# 窗口索引配置
+class RegistryConfig:
+    """窗口索引配置类"""
+    
+    # 空间索引网格的边长（像素）
+    CELL_SIZE = int(os.getenv("LAYOUT_DRIVER_REGISTRY_CELL_SIZE", "256"))
+
+
+# 窗口事件订阅配置
+class EventsConfig:
+    """窗口事件订阅配置类"""
+    
+    # 订阅方式：auto（先SSE，不支持时回退到长轮询）、sse、long_poll或off（不订阅，按TTL刷新）
+    MODE = os.getenv("LAYOUT_DRIVER_EVENTS", "auto").lower()
+    
+    # 长轮询每次请求的最长等待时间（秒）
+    LONG_POLL_TIMEOUT = float(os.getenv("LAYOUT_DRIVER_EVENTS_LONG_POLL_TIMEOUT", "25"))
+    
+    # SSE连接的读取超时（秒），超过该时间没有收到任何数据（含心跳）时重连
+    SSE_READ_TIMEOUT = float(os.getenv("LAYOUT_DRIVER_EVENTS_READ_TIMEOUT", "300"))
+
+
+# 窗口资源配置
+class ResourceConfig:
+    """窗口资源配置类"""
+    
+    # 有资源订阅者且窗口事件订阅不在线时，后台刷新窗口列表的间隔（秒），0表示不刷新
+    POLL_INTERVAL = float(os.getenv("LAYOUT_DRIVER_RESOURCE_POLL_INTERVAL", "2"))
+
+
+# 运行指标配置
+class MetricsConfig:
+    """运行指标配置类"""
+    
+    # 是否记录工具调用、后端请求和序列化的耗时等指标（get_metrics工具和HTTP模式下的/metrics）
+    ENABLED = os.getenv("LAYOUT_DRIVER_METRICS", "true").lower() == "true"
+
+
+# 链路追踪配置
+class TracingConfig:
+    """链路追踪配置类"""
+    
+    # 导出方式：off（默认，不追踪）、console（输出到标准错误）、otlp（OTLP导出，需要安装OpenTelemetry SDK）
+    # otlp的目标地址等由OpenTelemetry标准环境变量（如OTEL_EXPORTER_OTLP_ENDPOINT）配置
+    EXPORTER = os.getenv("LAYOUT_DRIVER_TRACING", "off").lower()
+    
+    # 上报的服务名称
+    SERVICE_NAME = os.getenv("LAYOUT_DRIVER_TRACING_SERVICE_NAME", "layout_driver")
@@ -1,24 +1,75 @@
 import logging
 import json
-from mcp.server.stdio import stdio_server
+import re
 from mcp.server import Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from mcp import types
+from mcp.shared.exceptions import McpError
 from mcp.types import (
+    Resource,
+    ResourceTemplate,
+    ServerCapabilities,
     TextContent,
     Tool,
 )
 from enum import Enum
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from pydantic import AnyUrl, BaseModel, TypeAdapter, model_validator
+from typing import Optional, List, Dict, Any, Literal, Awaitable, Callable, Tuple
 import httpx
 import asyncio
+import time
 
 # 导入配置
-from .config import APIConfig, SecurityConfig, LogConfig
+from .config import (
+    APIConfig,
+    SecurityConfig,
+    LogConfig,
+    CacheConfig,
+    RetryConfig,
+    CircuitBreakerConfig,
+    ServerConfig,
+    ConcurrencyConfig,
+    BatchConfig,
+)
+from . import metrics, tracing
+from .batching import merge_batch_results, split_batch
+from .concurrency import backend_limiter, request_coalescer
+from .layout import OPERATION_ENDPOINTS, plan_layout, schedule_operations, window_state_tracker
+from .registry import window_registry
+from .window_table import WindowTable
+from .events import EVENT_CREATED, EVENT_CHANGED, EVENT_REMOVED, EVENT_RESET, window_event_lifespan
+from .notifications import (
+    WINDOW_URI_TEMPLATE,
+    WINDOWS_LIST_URI,
+    render_resource,
+    resource_notifier,
+    resource_poll_lifespan,
+)
+from .transport import TRANSPORTS, metrics_route, run_http, run_stdio
+from .http_client import create_http_client, get_http_client, http_client_lifespan
+from .schemas import load_tool_schemas
+from .serialization import format_tool_result
+from .state_store import state_store, state_store_lifespan, undo_targets
+from .wire import describe_body, wire_negotiator
+from .resilience import (
+    circuit_breaker_lifespan,
+    circuit_breakers,
+    is_idempotent,
+    next_retry_delay,
+)
+from .cache import (
+    conditional_get_cache,
+    icon_cache,
+    window_list_cache,
+    window_snapshot_history,
+)
 
 class GetWindowList(BaseModel):
     """获取当前桌面已打开窗口列表
     
-    入参：无需参数
+    入参：
+    - force_refresh: 是否跳过缓存强制从后端获取（可空，默认False）
+    - include_icons: 是否返回base64图标数据（可空，默认False，只返回icon_hash）
     出参：窗口信息列表，每个窗口包含以下字段：
     - handle: 窗口句柄
     - title: 窗口标题
@@ -26,10 +77,12 @@ class GetWindowList(BaseModel):
     - height: 窗口高度
     - x: 窗口X坐标
     - y: 窗口Y坐标
-    - icon: 窗口图标数据（可空）
+    - icon: 窗口图标数据（仅include_icons为True时）
+    - icon_hash: 窗口图标内容哈希（可空）
     - alias: 窗口别名（可空）
     """
-    pass
+    force_refresh: bool = False
+    include_icons: bool = False
 
 class WindowInfo(BaseModel):
     """窗口信息模型"""
@@ -46,109 +99,89 @@ class CloseWindowRequest(BaseModel):
     """批量关闭窗口请求模型
     
     入参：
-    - handle: 窗口句柄（必填）
-    - title: 窗口标题（必填）
-    - width: 窗口宽度（必填）
-    - height: 窗口高度（必填）
-    - x: 窗口X坐标（必填）
-    - y: 窗口Y坐标（必填）
-    - icon: 窗口图标数据，base64编码（可空）
-    - alias: 窗口别名（可空）
+    - windows: 窗口列表，每个窗口包含：
+      - handle: 窗口句柄（必填）
+      - title: 窗口标题（必填）
+      - width: 窗口宽度（必填）
+      - height: 窗口高度（必填）
+      - x: 窗口X坐标（必填）
+      - y: 窗口Y坐标（必填）
+      - icon: 窗口图标数据，base64编码（可空，不会发送给后端）
+      - alias: 窗口别名（可空）
     
     出参：
     - success: 操作是否成功
     - message: 操作结果消息
     - closed_count: 成功关闭的窗口数量
+    - window_results: 每个窗口的操作结果（handle、success、error）
     """
-    handle: int
-    title: str
-    width: int
-    height: int
-    x: int
-    y: int
-    icon: Optional[str] = None
-    alias: Optional[str] = None
+    windows: List[WindowInfo]
 
 class MinimizeWindowRequest(BaseModel):
     """批量最小化窗口请求模型
     
     入参：
-    - handle: 窗口句柄（必填）
-    - title: 窗口标题（必填）
-    - width: 窗口宽度（必填）
-    - height: 窗口高度（必填）
-    - x: 窗口X坐标（必填）
-    - y: 窗口Y坐标（必填）
-    - icon: 窗口图标数据，base64编码（可空）
-    - alias: 窗口别名（可空）
+    - windows: 窗口列表，每个窗口包含：
+      - handle: 窗口句柄（必填）
+      - title: 窗口标题（必填）
+      - width: 窗口宽度（必填）
+      - height: 窗口高度（必填）
+      - x: 窗口X坐标（必填）
+      - y: 窗口Y坐标（必填）
+      - icon: 窗口图标数据，base64编码（可空，不会发送给后端）
+      - alias: 窗口别名（可空）
     
     出参：
     - success: 操作是否成功
     - message: 操作结果消息
     - minimized_count: 成功最小化的窗口数量
+    - window_results: 每个窗口的操作结果（handle、success、error）
     """
-    handle: int
-    title: str
-    width: int
-    height: int
-    x: int
-    y: int
-    icon: Optional[str] = None
-    alias: Optional[str] = None
+    windows: List[WindowInfo]
 
 class MaximizeWindowRequest(BaseModel):
     """批量最大化窗口请求模型
     
     入参：
-    - handle: 窗口句柄（必填）
-    - title: 窗口标题（必填）
-    - width: 窗口宽度（必填）
-    - height: 窗口高度（必填）
-    - x: 窗口X坐标（必填）
-    - y: 窗口Y坐标（必填）
-    - icon: 窗口图标数据，base64编码（可空）
-    - alias: 窗口别名（可空）
+    - windows: 窗口列表，每个窗口包含：
+      - handle: 窗口句柄（必填）
+      - title: 窗口标题（必填）
+      - width: 窗口宽度（必填）
+      - height: 窗口高度（必填）
+      - x: 窗口X坐标（必填）
+      - y: 窗口Y坐标（必填）
+      - icon: 窗口图标数据，base64编码（可空，不会发送给后端）
+      - alias: 窗口别名（可空）
     
     出参：
     - success: 操作是否成功
     - message: 操作结果消息
     - maximized_count: 成功最大化的窗口数量
+    - window_results: 每个窗口的操作结果（handle、success、error）
     """
-    handle: int
-    title: str
-    width: int
-    height: int
-    x: int
-    y: int
-    icon: Optional[str] = None
-    alias: Optional[str] = None
+    windows: List[WindowInfo]
 
 class RestoreWindowRequest(BaseModel):
     """批量还原窗口请求模型
     
     入参：
-    - handle: 窗口句柄（必填）
-    - title: 窗口标题（必填）
-    - width: 窗口宽度（必填）
-    - height: 窗口高度（必填）
-    - x: 窗口X坐标（必填）
-    - y: 窗口Y坐标（必填）
-    - icon: 窗口图标数据，base64编码（可空）
-    - alias: 窗口别名（可空）
+    - windows: 窗口列表，每个窗口包含：
+      - handle: 窗口句柄（必填）
+      - title: 窗口标题（必填）
+      - width: 窗口宽度（必填）
+      - height: 窗口高度（必填）
+      - x: 窗口X坐标（必填）
+      - y: 窗口Y坐标（必填）
+      - icon: 窗口图标数据，base64编码（可空，不会发送给后端）
+      - alias: 窗口别名（可空）
     
     出参：
     - success: 操作是否成功
     - message: 操作结果消息
     - restored_count: 成功还原的窗口数量
+    - window_results: 每个窗口的操作结果（handle、success、error）
     """
-    handle: int
-    title: str
-    width: int
-    height: int
-    x: int
-    y: int
-    icon: Optional[str] = None
-    alias: Optional[str] = None
+    windows: List[WindowInfo]
 
 class WindowOpacityItem(BaseModel):
     """窗口透明度设置项模型"""
@@ -167,7 +200,7 @@ class SetWindowOpacityRequest(BaseModel):
         - height: 窗口高度（必填）
         - x: 窗口X坐标（必填）
         - y: 窗口Y坐标（必填）
-        - icon: 窗口图标数据，base64编码（可空）
+        - icon: 窗口图标数据，base64编码（可空，不会发送给后端）
         - alias: 窗口别名（可空）
       - opacity: 透明度值（0-255，0为完全透明，255为完全不透明）
         
@@ -175,10 +208,205 @@ class SetWindowOpacityRequest(BaseModel):
     - success: 操作是否成功
     - message: 操作结果消息
     - updated_count: 成功设置透明度的窗口数量
+    - window_results: 每个窗口的操作结果（handle、success、error）
     """
     windows: List[WindowOpacityItem]
 
 
+# 批量请求体序列化器：校验后的窗口列表由pydantic-core直接序列化为JSON字节，
+# 不再逐个窗口转换为字典后再由json.dumps序列化；后端按handle识别窗口，不上传图标
+_WINDOW_LIST_BODY = TypeAdapter(List[WindowInfo])
+_OPACITY_LIST_BODY = TypeAdapter(List[WindowOpacityItem])
+
+
+def window_list_body(windows: List[WindowInfo]) -> bytes:
+    """关闭/最小化/最大化/还原请求体：[{handle, title, width, height, x, y, alias}, ...]
+    
+    按与后端协商的格式序列化（JSON，或后端支持时的MessagePack，见wire模块）。
+    """
+    return wire_negotiator.encode_models(_WINDOW_LIST_BODY, windows, {"__all__": {"icon"}})
+
+
+def opacity_list_body(windows: List[WindowOpacityItem]) -> bytes:
+    """透明度请求体：[{"window": {handle, title, width, height, x, y, alias}, "opacity": 128}, ...]"""
+    return wire_negotiator.encode_models(_OPACITY_LIST_BODY, windows, {"__all__": {"window": {"icon"}}})
+
+
+class GetWindowChangesRequest(BaseModel):
+    """获取窗口列表增量变化请求模型
+    
+    入参：
+    - since_version: 上次获取到的窗口列表版本号（可空，为空时返回完整列表）
+    - force_refresh: 是否跳过缓存强制从后端获取（可空，默认False）
+    
+    出参：
+    - version: 当前窗口列表版本号
+    - full: 是否返回了完整列表（since_version为空、未知或已过期）
+    - added: 新增的窗口
+    - removed: 已移除窗口的句柄
+    - changed: 标题、位置、尺寸或别名发生变化的窗口
+    """
+    since_version: Optional[str] = None
+    force_refresh: bool = False
+
+
+class GetWindowIconsRequest(BaseModel):
+    """按需获取窗口图标请求模型
+    
+    入参：
+    - handles: 窗口句柄列表（必填）
+    - known_hashes: 客户端已持有的图标哈希列表，这些图标不再重复返回（可空）
+    
+    出参：
+    - windows: 每个窗口的handle和icon_hash
+    - icons: 图标哈希到base64图标数据的映射（去重，不含known_hashes）
+    - missing: 未找到的窗口句柄
+    """
+    handles: List[int]
+    known_hashes: List[str] = []
+
+
+class WindowRegion(BaseModel):
+    """屏幕矩形区域模型"""
+    x: int
+    y: int
+    width: int
+    height: int
+
+
+class FindWindowsRequest(BaseModel):
+    """按条件查找窗口请求模型
+    
+    入参（均可空，给出的条件需同时满足）：
+    - title: 标题子串（忽略大小写与多余空白）
+    - title_prefix: 标题前缀（忽略大小写与多余空白）
+    - title_regex: 标题正则表达式
+    - alias: 窗口别名（精确匹配）
+    - region: 屏幕区域（x、y、width、height），返回与之重叠的窗口
+    - min_width / max_width / min_height / max_height: 窗口尺寸范围
+    - limit: 最多返回的窗口数量
+    - force_refresh: 是否跳过缓存强制从后端获取（默认False）
+    
+    出参：
+    - windows: 匹配的窗口列表（不含图标数据）
+    - total: 当前窗口总数
+    - version: 窗口列表版本号
+    """
+    title: Optional[str] = None
+    title_prefix: Optional[str] = None
+    title_regex: Optional[str] = None
+    alias: Optional[str] = None
+    region: Optional[WindowRegion] = None
+    min_width: Optional[int] = None
+    max_width: Optional[int] = None
+    min_height: Optional[int] = None
+    max_height: Optional[int] = None
+    limit: Optional[int] = None
+    force_refresh: bool = False
+
+
+class WindowTarget(BaseModel):
+    """声明式布局中单个窗口的目标状态
+    
+    选择器（至少填写一个，同时填写时需全部满足）：
+    - handle: 窗口句柄（精确匹配）
+    - alias: 窗口别名（精确匹配）
+    - title_pattern: 窗口标题正则表达式（搜索匹配）
+    
+    目标状态（不填写的字段保持不变）：
+    - state: 窗口状态，normal / minimized / maximized
+    - opacity: 透明度值（0-255）
+    - closed: 是否关闭窗口（为True时忽略其他目标状态）
+    """
+    handle: Optional[int] = None
+    alias: Optional[str] = None
+    title_pattern: Optional[str] = None
+    state: Optional[Literal["normal", "minimized", "maximized"]] = None
+    opacity: Optional[int] = None
+    closed: bool = False
+    
+    @model_validator(mode="after")
+    def _require_selector(self) -> "WindowTarget":
+        # 没有选择器的目标会匹配全部窗口（例如{"closed": true}会关闭整个桌面），直接拒绝
+        if self.handle is None and self.alias is None and not self.title_pattern:
+            raise ValueError("目标至少需要一个选择器：handle、alias或title_pattern")
+        return self
+
+
+class ApplyLayoutRequest(BaseModel):
+    """声明式应用窗口布局请求模型
+    
+    入参：
+    - windows: 目标列表（WindowTarget），多个目标匹配同一窗口时后面的覆盖前面的
+    - dry_run: 只返回操作计划而不执行（可空，默认False）
+    - force_refresh: 计算差异前是否强制刷新窗口列表（可空，默认False）
+    
+    出参：
+    - plan: 每个端点需要操作的窗口句柄
+    - skipped: 已处于目标状态而跳过的窗口句柄
+    - unmatched: 没有匹配到任何窗口的目标下标
+    - stages / requests / wall_time_ms: 执行阶段数、批量请求数和总耗时（dry_run为True时没有）
+    - window_results: 每个操作的结果
+    """
+    windows: List[WindowTarget]
+    dry_run: bool = False
+    force_refresh: bool = False
+
+
+class WindowOperation(BaseModel):
+    """单个窗口操作模型
+    
+    - op: 操作类型，close / minimize / maximize / restore / opacity
+    - window: 窗口信息对象
+    - opacity: 透明度值（0-255，仅opacity操作需要）
+    """
+    op: Literal["close", "minimize", "maximize", "restore", "opacity"]
+    window: WindowInfo
+    opacity: Optional[int] = None
+
+
+class ExecuteOperationsRequest(BaseModel):
+    """批量执行异构窗口操作请求模型
+    
+    入参：
+    - operations: 操作列表（WindowOperation），同一窗口的多个操作按提交顺序执行
+    
+    出参：
+    - results: 每个操作的结果（index、op、handle、endpoint、stage、success、error），与operations顺序一致
+    - stages: 执行阶段数
+    - requests: 实际发出的批量请求数
+    - wall_time_ms: 总耗时（毫秒）
+    """
+    operations: List[WindowOperation]
+
+
+class GetMetrics(BaseModel):
+    """获取运行指标
+    
+    入参：无
+    出参：Prometheus文本格式的指标，包括每个工具和后端端点的耗时直方图、
+    请求/响应大小、重试次数、在途数量、缓存命中率和熔断器状态
+    """
+
+
+class RestorePreviousLayoutRequest(BaseModel):
+    """撤销最近窗口操作请求模型（需要启用窗口状态存储，见StateStoreConfig）
+    
+    入参：
+    - steps: 撤销最近几次改变窗口状态的工具调用（可空，默认1）
+    - dry_run: 只返回撤销计划而不执行（可空，默认False）
+    
+    出参：
+    - changes: 本次撤销的操作历史（id、tool、applied_at、windows）
+    - plan / skipped / stages / requests / wall_time_ms: 同apply_layout
+    - unmatched: 已不存在的窗口句柄
+    - irreversible: 已被关闭、无法恢复的窗口句柄
+    - window_results: 每个恢复操作的结果
+    """
+    steps: int = 1
+    dry_run: bool = False
+
+
 class DriverTools(str, Enum):
     GET_WINDOW_LIST = "get_window_list"
     CLOSE_WINDOWS_BATCH = "close_windows_batch"
@@ -186,13 +414,152 @@ class DriverTools(str, Enum):
     MAXIMIZE_WINDOWS_BATCH = "maximize_windows_batch"
     RESTORE_WINDOWS_BATCH = "restore_windows_batch"
     SET_WINDOW_OPACITY_BATCH = "set_window_opacity_batch"
+    GET_WINDOW_CHANGES = "get_window_changes"
+    GET_WINDOW_ICONS = "get_window_icons"
+    APPLY_LAYOUT = "apply_layout"
+    FIND_WINDOWS = "find_windows"
+    EXECUTE_OPERATIONS = "execute_operations"
+    GET_METRICS = "get_metrics"
+    RESTORE_PREVIOUS_LAYOUT = "restore_previous_layout"
+
+
+async def _send_request(client: httpx.AsyncClient, method: str, url: str,
+                        data: Optional[Any], params: Optional[Dict],
+                        headers: Dict[str, str], timeout: int,
+                        extensions: Optional[Dict[str, Any]] = None) -> httpx.Response:
+    """使用给定的HTTP客户端发送一次请求
+
+    入参：
+        client: 共享或一次性的httpx.AsyncClient
+        method: HTTP请求方法（GET/POST/PUT/DELETE）
+        extensions: httpx请求扩展（如链路追踪使用的trace回调），可空
+        其余参数与make_api_request相同
+
+    出参：
+        httpx.Response: 原始HTTP响应
+    """
+    # 请求体：已序列化的JSON字节直接发送，其余数据由httpx序列化为JSON
+    body = {"content": data} if isinstance(data, bytes) else {"json": data}
+    
+    # 根据HTTP方法分别处理不同类型的请求
+    if method.upper() == "GET":
+        # GET请求：主要用于获取数据，参数通过URL查询参数传递
+        response = await client.get(
+            url=url,
+            params=params,
+            headers=headers,
+            timeout=timeout,
+            extensions=extensions
+        )
+    elif method.upper() == "POST":
+        # POST请求：主要用于创建或操作数据，数据通过请求体传递
+        response = await client.post(
+            url=url,
+            **body,
+            params=params,
+            headers=headers,
+            timeout=timeout,
+            extensions=extensions
+        )
+    elif method.upper() == "PUT":
+        # PUT请求：主要用于更新数据
+        response = await client.put(
+            url=url,
+            **body,
+            params=params,
+            headers=headers,
+            timeout=timeout,
+            extensions=extensions
+        )
+    elif method.upper() == "DELETE":
+        # DELETE请求：主要用于删除数据
+        response = await client.delete(
+            url=url,
+            params=params,
+            headers=headers,
+            timeout=timeout,
+            extensions=extensions
+        )
+    else:
+        # 不支持的HTTP方法，抛出异常
+        raise ValueError(f"不支持的HTTP方法: {method}")
+    
+    return response
+
+
+async def _dispatch_request(method: str, url: str, data: Optional[Any],
+                            params: Optional[Dict], headers: Dict[str, str],
+                            timeout: float, extensions: Optional[Dict[str, Any]] = None) -> httpx.Response:
+    """选择HTTP客户端并发送一次请求
+    
+    优先复用serve()生命周期内的共享连接池（keep-alive / HTTP/2），
+    在服务器之外直接调用时回退为一次性客户端。
+    """
+    client = get_http_client()
+    if client is not None:
+        return await _send_request(client, method, url, data, params, headers, timeout, extensions)
+    async with create_http_client() as oneshot_client:
+        return await _send_request(oneshot_client, method, url, data, params, headers, timeout, extensions)
+
+
+async def _dispatch_attempt(endpoint_key: str, method: str, url: str, data: Optional[Any],
+                            params: Optional[Dict], headers: Dict[str, str],
+                            timeout: float) -> httpx.Response:
+    """发送一次请求；启用链路追踪时在http_request子span中发送
+    
+    子span记录状态码以及连接、TLS、发送、等待和接收各阶段的耗时，
+    并把traceparent请求头传递给后端。
+    """
+    if not tracing.enabled():
+        return await _dispatch_request(method, url, data, params, headers, timeout)
+    timings = tracing.HTTPTimings()
+    with tracing.span("http_request", **{
+        "http.request.method": method.upper(),
+        "url.full": url,
+        "layout_driver.endpoint": endpoint_key,
+    }):
+        # 每次尝试都是新的span，traceparent写入副本，不影响重试时复用的请求头
+        headers = dict(headers)
+        tracing.inject_headers(headers)
+        try:
+            response = await _dispatch_request(method, url, data, params, headers, timeout,
+                                               extensions={"trace": timings})
+        finally:
+            tracing.set_attributes(**timings.attributes())
+        tracing.set_attributes(**{"http.response.status_code": response.status_code})
+        return response
+
+
+async def _timed_dispatch(endpoint_key: str, method: str, url: str, data: Optional[Any],
+                          params: Optional[Dict], headers: Dict[str, str],
+                          timeout: float) -> httpx.Response:
+    """发送一次请求并记录耗时、状态码、请求/响应大小和在途数量（MetricsConfig.ENABLED时）"""
+    if not metrics.enabled():
+        return await _dispatch_attempt(endpoint_key, method, url, data, params, headers, timeout)
+    metrics.HTTP_IN_FLIGHT.inc(endpoint_key)
+    start = time.perf_counter()
+    try:
+        response = await _dispatch_attempt(endpoint_key, method, url, data, params, headers, timeout)
+    except httpx.RequestError:
+        metrics.HTTP_ERRORS.inc(endpoint_key)
+        raise
+    finally:
+        metrics.HTTP_DURATION.observe(endpoint_key, method.upper(), value=time.perf_counter() - start)
+        metrics.HTTP_IN_FLIGHT.dec(endpoint_key)
+    metrics.HTTP_RESPONSES.inc(endpoint_key, response.status_code)
+    metrics.HTTP_REQUEST_BYTES.observe(
+        endpoint_key, value=int(response.request.headers.get("content-length") or 0))
+    metrics.HTTP_RESPONSE_BYTES.observe(endpoint_key, value=len(response.content))
+    metrics.HTTP_RESPONSE_WIRE_BYTES.observe(endpoint_key, value=response.num_bytes_downloaded)
+    return response
 
 
 async def make_api_request(endpoint_key: str, method: str = "GET", 
-                          data: Optional[Dict] = None,
+                          data: Optional[Any] = None,
                           params: Optional[Dict] = None,
                           additional_headers: Optional[Dict] = None,
                           timeout: Optional[int] = None,
+                          retry: Optional[bool] = None,
                           **url_kwargs) -> Dict[str, Any]:
     """通用API请求函数
     
@@ -224,10 +591,11 @@ async def make_api_request(endpoint_key: str, method: str = "GET",
             - "PUT": 用于更新数据
             - "DELETE": 用于删除数据
             
-        data (Optional[Dict], optional): 请求体数据，默认为None
+        data (Optional[Any], optional): 请求体数据，默认为None
             - 对于GET请求通常为None
             - 对于POST/PUT请求包含要发送的JSON数据
-            - 数据会自动序列化为JSON格式
+            - 字典、列表等数据会自动序列化为JSON格式
+            - bytes视为已序列化的JSON（如window_list_body的结果），原样发送
             
         params (Optional[Dict], optional): URL查询参数，默认为None
             - 会被添加到URL后面作为?key=value&key2=value2格式
@@ -241,6 +609,11 @@ async def make_api_request(endpoint_key: str, method: str = "GET",
             - 如果为None，使用APIConfig.DEFAULT_TIMEOUT
             - 超时会触发httpx.TimeoutException异常
             
+        retry (Optional[bool], optional): 是否允许自动重试，默认为None
+            - 为None时按端点决定：RetryConfig.IDEMPOTENT_ENDPOINTS中的端点自动重试，
+              关闭窗口等非幂等操作不重试
+            - 最多重试SecurityConfig.MAX_RETRIES次，总耗时不超过RetryConfig.DEADLINE
+            
         **url_kwargs: 用于格式化URL的关键字参数
             - 用于替换URL模板中的占位符，如{handle}、{pid}等
             - 例如：handle=12345会将/windows/{handle}格式化为/windows/12345
@@ -253,6 +626,7 @@ async def make_api_request(endpoint_key: str, method: str = "GET",
             "success": True,                    # 请求是否成功的布尔标志
             "status_code": 200,                 # HTTP状态码（200表示成功）
             "content": {...},                   # API返回的实际数据内容
+            "attempts": 1,                      # 实际尝试次数（含重试）
             "headers": {...},                   # HTTP响应头字典
             "url": "http://..."                 # 实际请求的完整URL
         }
@@ -296,6 +670,29 @@ async def make_api_request(endpoint_key: str, method: str = "GET",
     2. **认证Token**：自动添加Bearer Token（如果配置了AUTH_TOKEN）
     3. **请求头安全**：设置标准的安全请求头
     
+    ## 重试机制：
+    1. 网络错误、超时以及502/503/504状态码视为暂时性故障
+    2. 仅对幂等端点自动重试（获取列表、最小化、最大化、还原、透明度），关闭窗口从不自动重试
+    3. 重试间隔为指数退避加全抖动：uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2^(n-1)))
+    4. 结果中的attempts字段记录实际尝试次数
+    
+    ## 熔断机制：
+    1. 每个端点有独立的熔断器（见resilience.CircuitBreaker），网络错误、超时和5xx计为失败
+    2. 连续失败达到CircuitBreakerConfig.FAILURE_THRESHOLD次后熔断器打开，
+       之后的请求立即返回"circuit_open": True的错误，不再等待超时
+    3. 打开RECOVERY_TIMEOUT秒后进入半开状态放行试探请求；后台健康探测发现后端恢复时也会关闭熔断器
+    
+    ## 条件请求：
+    对CacheConfig.CONDITIONAL_ENDPOINTS中的GET端点（默认WINDOWS_LIST），
+    会保存响应的ETag / Last-Modified并在下次请求时发送If-None-Match / If-Modified-Since。
+    后端返回304时，结果的content为上次缓存的内容，并附带"not_modified": True。
+    
+    ## 连接复用：
+    1. 在serve()内调用时复用共享连接池（见http_client.http_client_lifespan），
+       避免每次请求重新建立TCP连接和TLS握手
+    2. 连接池上限、保活过期时间和HTTP/2开关由HTTPClientConfig配置
+    3. 在服务器之外直接调用时回退为一次性客户端，行为与旧版本一致
+    
     ## 使用示例：
         >>> # 基础GET请求
         >>> result = await make_api_request("WINDOWS_LIST")
@@ -335,12 +732,89 @@ async def make_api_request(endpoint_key: str, method: str = "GET",
     3. 启用verbose日志时会记录详细的请求和响应信息
     4. 函数会自动处理JSON序列化和反序列化
     5. 认证Token会自动添加，无需手动设置
+    6. 相同的在途GET请求会被合并为一次后端调用，发往后端的并发数受ConcurrencyConfig限制
+    7. 启用MetricsConfig.ENABLED时记录每个端点的总耗时、每次尝试的耗时、状态码、
+       请求/响应大小、重试次数和在途数量（见metrics模块）
+    8. 启用链路追踪（TracingConfig.EXPORTER）时整个调用为make_api_request子span，
+       每次HTTP尝试为http_request子span，并向后端发送W3C traceparent请求头
     """
+    if tracing.enabled():
+        with tracing.span("make_api_request", **{
+            "layout_driver.endpoint": endpoint_key,
+            "http.request.method": method.upper(),
+        }):
+            return await _timed_api_request(endpoint_key, method, data, params,
+                                            additional_headers, timeout, retry, **url_kwargs)
+    return await _timed_api_request(endpoint_key, method, data, params,
+                                    additional_headers, timeout, retry, **url_kwargs)
+
+
+async def _timed_api_request(endpoint_key: str, method: str, data: Optional[Any],
+                             params: Optional[Dict], additional_headers: Optional[Dict],
+                             timeout: Optional[int], retry: Optional[bool],
+                             **url_kwargs) -> Dict[str, Any]:
+    """记录总耗时后执行API调用，参数与返回值同make_api_request"""
+    if metrics.enabled():
+        with metrics.API_REQUEST_DURATION.time(endpoint_key):
+            return await _coalesced_api_request(endpoint_key, method, data, params,
+                                                additional_headers, timeout, retry, **url_kwargs)
+    return await _coalesced_api_request(endpoint_key, method, data, params,
+                                        additional_headers, timeout, retry, **url_kwargs)
+
+
+async def _coalesced_api_request(endpoint_key: str, method: str, data: Optional[Any],
+                                 params: Optional[Dict], additional_headers: Optional[Dict],
+                                 timeout: Optional[int], retry: Optional[bool],
+                                 **url_kwargs) -> Dict[str, Any]:
+    """合并相同的在途GET请求后执行API调用，参数与返回值同make_api_request"""
+    # 相同的在途GET请求合并为一次后端调用（single-flight）
+    if ConcurrencyConfig.COALESCE and method.upper() == "GET":
+        coalesce_key = (
+            endpoint_key,
+            json.dumps(params, sort_keys=True, default=str),
+            json.dumps(additional_headers, sort_keys=True, default=str),
+            timeout,
+            retry,
+            tuple(sorted(url_kwargs.items())),
+        )
+        return await request_coalescer.do(
+            coalesce_key,
+            lambda: _perform_api_request(endpoint_key, method, data, params,
+                                         additional_headers, timeout, retry, **url_kwargs),
+        )
+    return await _perform_api_request(endpoint_key, method, data, params,
+                                      additional_headers, timeout, retry, **url_kwargs)
+
+
+def _conditional_key(url: str, params: Optional[Dict] = None) -> str:
+    """条件GET验证器缓存的键（URL和查询参数）"""
+    return f"{url}?{sorted((params or {}).items())}"
+
+async def _perform_api_request(endpoint_key: str, method: str, data: Optional[Any],
+                               params: Optional[Dict], additional_headers: Optional[Dict],
+                               timeout: Optional[int], retry: Optional[bool],
+                               **url_kwargs) -> Dict[str, Any]:
+    """执行一次API调用（含熔断、重试和条件请求），参数与返回值同make_api_request"""
+    attempts = 0
+    breaker = circuit_breakers.get(endpoint_key) if CircuitBreakerConfig.ENABLED else None
     try:
         # 步骤1: 构建完整的API URL
         # 从配置中获取端点模板，并使用url_kwargs进行格式化
         url = APIConfig.get_endpoint_url(endpoint_key, **url_kwargs)
         
+        # 熔断器打开时快速失败，不再等待超时
+        if breaker is not None and not breaker.allow_request():
+            retry_after = breaker.retry_after()
+            return {
+                "success": False,
+                "error": f"后端服务不可用（熔断器已打开），请在 {retry_after:.1f} 秒后重试",
+                "status_code": 0,
+                "circuit_open": True,
+                "retry_after": retry_after,
+                "attempts": attempts,
+                "url": url
+            }
+        
         # 步骤2: 设置HTTP请求头
         # 获取默认请求头并合并额外的请求头
         headers = APIConfig.get_headers(additional_headers)
@@ -350,6 +824,15 @@ async def make_api_request(endpoint_key: str, method: str = "GET",
         if SecurityConfig.AUTH_TOKEN:
             headers["Authorization"] = f"Bearer {SecurityConfig.AUTH_TOKEN}"
         
+        # 传输编码协商：Accept-Encoding，启用MessagePack时优先接受MessagePack响应
+        headers.update(wire_negotiator.request_headers())
+        
+        # 条件GET：对支持的端点附加If-None-Match / If-Modified-Since
+        conditional_key = None
+        if method.upper() == "GET" and endpoint_key in CacheConfig.CONDITIONAL_ENDPOINTS:
+            conditional_key = _conditional_key(url, params)
+            headers.update(conditional_get_cache.request_headers(conditional_key))
+        
         # 步骤4: 设置请求超时时间
         # 如果未指定，使用配置文件中的默认值
         if timeout is None:
@@ -360,103 +843,145 @@ async def make_api_request(endpoint_key: str, method: str = "GET",
         if LogConfig.VERBOSE:
             logging.info(f"API请求: {method} {url}")
             if data:
-                logging.debug(f"请求数据: {json.dumps(data, ensure_ascii=False)}")
-        
-        # 步骤6: 创建HTTP客户端并发送请求
-        # 使用httpx异步客户端，支持SSL验证配置
-        async with httpx.AsyncClient(verify=SecurityConfig.VERIFY_SSL) as client:
-            # 根据HTTP方法分别处理不同类型的请求
-            if method.upper() == "GET":
-                # GET请求：主要用于获取数据，参数通过URL查询参数传递
-                response = await client.get(
-                    url=url,
-                    params=params,
-                    headers=headers,
-                    timeout=timeout
-                )
-            elif method.upper() == "POST":
-                # POST请求：主要用于创建或操作数据，数据通过请求体传递
-                response = await client.post(
-                    url=url,
-                    json=data,  # 自动序列化为JSON
-                    params=params,
-                    headers=headers,
-                    timeout=timeout
-                )
-            elif method.upper() == "PUT":
-                # PUT请求：主要用于更新数据
-                response = await client.put(
-                    url=url,
-                    json=data,
-                    params=params,
-                    headers=headers,
-                    timeout=timeout
-                )
-            elif method.upper() == "DELETE":
-                # DELETE请求：主要用于删除数据
-                response = await client.delete(
-                    url=url,
-                    params=params,
-                    headers=headers,
-                    timeout=timeout
-                )
+                logging.debug(f"请求数据: {describe_body(data)}")
+        
+        # 请求体按协商的格式序列化，较大时压缩（Content-Type / Content-Encoding随之设置）
+        body = None
+        payload = None
+        request_headers = headers
+        if data is not None and method.upper() in ("POST", "PUT"):
+            body = wire_negotiator.encode(data)
+            payload, body_headers = wire_negotiator.prepare(body)
+            request_headers = {**headers, **body_headers}
+        
+        # 步骤6: 发送请求
+        # 幂等端点遇到网络错误、超时或暂时性状态码（502/503/504）时，
+        # 按指数退避加随机抖动自动重试，直到次数用尽或超过总时限
+        if retry is None:
+            retry = is_idempotent(endpoint_key)
+        max_retries = SecurityConfig.MAX_RETRIES if retry else 0
+        deadline = time.monotonic() + RetryConfig.DEADLINE
+        attempt_timeout = timeout
+        while True:
+            attempts += 1
+            try:
+                # 每次尝试都占用一个全局和端点并发配额，退避等待期间不占用
+                async with backend_limiter.acquire(endpoint_key):
+                    response = await _timed_dispatch(
+                        endpoint_key, method, url, payload, params, request_headers, attempt_timeout
+                    )
+            except httpx.RequestError as e:
+                delay = next_retry_delay(attempts, max_retries, deadline)
+                if delay is None:
+                    raise
+                logging.warning(f"API请求错误，{delay:.2f}秒后第{attempts}次重试: {e!r}")
             else:
-                # 不支持的HTTP方法，抛出异常
-                raise ValueError(f"不支持的HTTP方法: {method}")
-            
-            # 步骤7: 记录响应日志
-            if LogConfig.VERBOSE:
-                logging.info(f"API响应: {response.status_code}")
-            
-            # 步骤8: 检查HTTP状态码
-            # 4xx和5xx状态码表示请求失败
-            if response.status_code >= 400:
-                error_msg = f"API请求失败，状态码: {response.status_code}"
-                if LogConfig.VERBOSE:
-                    logging.error(f"{error_msg}, 响应内容: {response.text}")
+                # 后端不支持压缩或MessagePack请求体（415）时关闭对应编码后立即重发
+                if response.status_code == 415 and body is not None:
+                    fallback = wire_negotiator.fallback(body, request_headers)
+                    if fallback is not None:
+                        body = fallback
+                        payload, body_headers = wire_negotiator.prepare(body)
+                        request_headers = {**headers, **body_headers}
+                        continue
+                if response.status_code not in RetryConfig.RETRY_STATUS_CODES:
+                    break
+                delay = next_retry_delay(attempts, max_retries, deadline)
+                if delay is None:
+                    break
+                logging.warning(f"API返回状态码{response.status_code}，{delay:.2f}秒后第{attempts}次重试")
+            if metrics.enabled():
+                metrics.HTTP_RETRIES.inc(endpoint_key)
+            await asyncio.sleep(delay)
+            # 重试时单次超时不超过剩余总时限
+            attempt_timeout = min(timeout, max(deadline - time.monotonic(), 0.001))
+        
+        # 记录熔断器结果：5xx视为后端故障，其余状态码说明后端可用
+        if breaker is not None:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        
+        # 步骤7: 记录响应日志
+        if LogConfig.VERBOSE:
+            logging.info(f"API响应: {response.status_code}")
+        
+        # 304 Not Modified：内容未变化，直接复用上次缓存的内容
+        if response.status_code == 304 and conditional_key is not None:
+            cached_content = conditional_get_cache.get_content(conditional_key)
+            if cached_content is not None:
                 return {
-                    "success": False,
-                    "error": error_msg,
+                    "success": True,
                     "status_code": response.status_code,
-                    "content": response.text,
+                    "content": cached_content,
+                    "not_modified": True,
+                    "attempts": attempts,
+                    "headers": dict(response.headers),
                     "url": url
                 }
-            
-            # 步骤9: 解析响应内容
-            # 尝试解析JSON，如果失败则使用原始文本
-            try:
-                content = response.json()
-            except:
-                # JSON解析失败，可能是非JSON响应
-                content = response.text
-                
-            # 步骤10: 返回成功响应
+        
+        # 步骤8: 检查HTTP状态码
+        # 4xx和5xx状态码表示请求失败
+        if response.status_code >= 400:
+            error_msg = f"API请求失败，状态码: {response.status_code}"
+            if LogConfig.VERBOSE:
+                logging.error(f"{error_msg}, 响应内容: {response.text}")
             return {
-                "success": True,
+                "success": False,
+                "error": error_msg,
                 "status_code": response.status_code,
-                "content": content,
-                "headers": dict(response.headers),
+                "content": response.text,
+                "attempts": attempts,
                 "url": url
             }
+        
+        # 步骤9: 解析响应内容
+        # 按Content-Type解析JSON或MessagePack，如果失败则使用原始文本
+        try:
+            content = wire_negotiator.decode(response)
+        except:
+            # JSON解析失败，可能是非JSON响应
+            content = response.text
+        
+        # 保存条件GET的验证器（ETag / Last-Modified），供下次请求使用
+        if conditional_key is not None:
+            conditional_get_cache.store(conditional_key, response.headers, content)
             
+        # 步骤10: 返回成功响应
+        return {
+            "success": True,
+            "status_code": response.status_code,
+            "content": content,
+            "attempts": attempts,
+            "headers": dict(response.headers),
+            "url": url
+        }
+        
     except httpx.TimeoutException:
         # 处理请求超时异常
-        error_msg = f"API请求超时，超过 {timeout} 秒"
+        if breaker is not None:
+            breaker.record_failure()
+        error_msg = f"API请求超时，超过 {timeout} 秒（共尝试 {attempts} 次）"
         logging.error(error_msg)
         return {
             "success": False,
             "error": error_msg,
             "status_code": 0,
+            "attempts": attempts,
             "url": APIConfig.get_endpoint_url(endpoint_key, **url_kwargs)
         }
     except httpx.RequestError as e:
         # 处理网络连接异常（DNS解析失败、连接拒绝等）
-        error_msg = f"API请求错误: {str(e)}"
+        if breaker is not None:
+            breaker.record_failure()
+        error_msg = f"API请求错误: {str(e)}（共尝试 {attempts} 次）"
         logging.error(error_msg)
         return {
             "success": False,
             "error": error_msg,
             "status_code": 0,
+            "attempts": attempts,
             "url": APIConfig.get_endpoint_url(endpoint_key, **url_kwargs)
         }
     except Exception as e:
@@ -467,17 +992,148 @@ async def make_api_request(endpoint_key: str, method: str = "GET",
             "success": False,
             "error": error_msg,
             "status_code": 0,
+            "attempts": attempts,
             "url": APIConfig.get_endpoint_url(endpoint_key, **url_kwargs) if endpoint_key in APIConfig.ENDPOINTS else "unknown"
         }
 
 
-async def get_window_list() -> Dict[str, Any]:
+def _attach_window_results(result: Dict[str, Any], handles: List[int]) -> Dict[str, Any]:
+    """根据后端返回的failed_windows为每个窗口生成操作结果
+    
+    后端在content.failed_windows中返回失败的窗口（窗口对象或句柄，
+    可附带error/reason字段）；未出现在其中的窗口视为成功。
+    请求整体失败时，所有窗口都标记为失败并带上整体错误信息。
+    
+    入参：
+        result: make_api_request返回的结果
+        handles: 本次请求涉及的窗口句柄列表（按请求顺序）
+        
+    出参：
+        Dict[str, Any]: 添加了window_results字段的原结果
+    """
+    if not result.get("success"):
+        result["window_results"] = [
+            {"handle": handle, "success": False, "error": result.get("error")}
+            for handle in handles
+        ]
+        return result
+    
+    content = result.get("content")
+    failed = content.get("failed_windows") if isinstance(content, dict) else None
+    failures: Dict[int, Optional[str]] = {}
+    for item in failed or []:
+        if isinstance(item, dict):
+            window = item.get("window", item)
+            failures[window.get("handle")] = item.get("error") or item.get("reason")
+        else:
+            failures[item] = None
+    
+    result["window_results"] = [
+        {
+            "handle": handle,
+            "success": handle not in failures,
+            "error": failures.get(handle),
+        }
+        for handle in handles
+    ]
+    return result
+
+async def batch_api_request(endpoint_key: str, items: List[Any],
+                            encode: Callable[[List[Any]], bytes],
+                            handle_of: Callable[[Any], int]) -> Dict[str, Any]:
+    """发送批量窗口操作请求（窗口很多时自动分片）
+    
+    按BatchConfig.MAX_ITEMS和MAX_BYTES把窗口拆分为多个POST请求，通过共享连接池
+    最多同时发送BatchConfig.MAX_PARALLEL_CHUNKS个分片，每个分片各自重试；
+    一个分片失败只影响该分片中的窗口。各分片结果合并为一个结果（见merge_batch_results）。
+    
+    入参：
+        endpoint_key: 批量操作端点键名
+        items: 窗口或透明度设置项列表（按请求顺序）
+        encode: 把items的一部分序列化为请求体的函数（如window_list_body）
+        handle_of: 取得每一项窗口句柄的函数
+        
+    出参：
+        Dict[str, Any]: 附带window_results的请求结果；分片时另有chunks字段
+    """
+    chunks = split_batch(items, encode, BatchConfig.MAX_ITEMS, BatchConfig.MAX_BYTES)
+    limit = BatchConfig.MAX_PARALLEL_CHUNKS
+    semaphore = asyncio.Semaphore(limit) if limit > 0 and len(chunks) > 1 else None
+    
+    async def send_chunk(part: List[Any], body: bytes) -> Dict[str, Any]:
+        if semaphore is None:
+            result = await make_api_request(endpoint_key, method="POST", data=body)
+        else:
+            async with semaphore:
+                result = await make_api_request(endpoint_key, method="POST", data=body)
+        return _attach_window_results(result, [handle_of(item) for item in part])
+    
+    if len(chunks) == 1:
+        return await send_chunk(*chunks[0])
+    if LogConfig.VERBOSE:
+        logging.info(f"{endpoint_key}: {len(items)} 个窗口拆分为 {len(chunks)} 个请求")
+    return merge_batch_results(await asyncio.gather(*(send_chunk(part, body) for part, body in chunks)))
+
+def _known_window_state(handle: int) -> Dict[str, Any]:
+    """窗口当前已知的state / opacity：快照缓存中后端提供的字段优先，其次为驱动记录的状态（同plan_layout）"""
+    known = dict(window_state_tracker.get(handle))
+    cached = window_list_cache.peek()
+    if cached is not None and isinstance(cached["content"], WindowTable):
+        table = cached["content"]
+        row = table.rows.get(handle)
+        extra = table.extras[row] if row is not None else None
+        if extra:
+            known.update({key: extra[key] for key in ("state", "opacity") if extra.get(key) is not None})
+    return known
+
+def _record_window_states(result: Dict[str, Any], op: str, windows: List[WindowInfo],
+                          state: Optional[str] = None,
+                          opacities: Optional[Dict[int, int]] = None) -> None:
+    """根据逐窗口结果记录操作成功的窗口状态，供apply_layout跳过无需变化的窗口
+    
+    启用了窗口状态存储时，同时把每个窗口操作前后的状态写入操作历史，供restore_previous_layout撤销。
+    需要在使窗口列表缓存失效之前调用（操作前的状态可能来自快照缓存）。
+    
+    入参：
+        result: batch_api_request的结果（含window_results）
+        op: 操作类型（close / minimize / maximize / restore / opacity）
+        windows: 本次操作的窗口
+        state: 状态操作成功后的窗口状态
+        opacities: 透明度操作中句柄到透明度的映射
+    """
+    by_handle = {window.handle: window for window in windows} if state_store.enabled else None
+    entries = []
+    for item in result["window_results"]:
+        if not item["success"]:
+            continue
+        handle = item["handle"]
+        before = _known_window_state(handle) if by_handle is not None else None
+        if op == "close":
+            window_state_tracker.forget(handle)
+        elif opacities is not None:
+            window_state_tracker.record(handle, opacity=opacities[handle])
+        else:
+            window_state_tracker.record(handle, state=state)
+        if by_handle is not None:
+            entries.append({
+                "op": op,
+                "window": by_handle[handle].model_dump(exclude={"icon"}),
+                "before": before,
+                "after": None if op == "close" else dict(window_state_tracker.get(handle)),
+            })
+    state_store.record_operations(entries)
+
+async def get_window_list(force_refresh: bool = False,
+                          include_icons: bool = False) -> Dict[str, Any]:
     """获取当前桌面已打开窗口列表
     
     通过调用后端API接口获取窗口信息。
+    结果会在CacheConfig.WINDOW_LIST_TTL秒内缓存，修改窗口状态的工具会自动使缓存失效。
+    默认不返回base64图标，每个窗口改为携带icon_hash，图标数据可通过get_window_icons按需获取。
     
     入参：
-        无需参数
+        force_refresh (bool, optional): 是否跳过缓存强制从后端获取，默认False
+        include_icons (bool, optional): 是否在结果中包含图标数据，默认False
         
     出参：
         Dict[str, Any]: API响应结果，包含：
@@ -489,8 +1145,11 @@ async def get_window_list() -> Dict[str, Any]:
           - height (int): 窗口高度（像素）
           - x (int): 窗口左上角X坐标
           - y (int): 窗口左上角Y坐标
-          - icon (str, optional): 窗口图标，base64编码的PNG数据，可为空
+          - icon (str, optional): 窗口图标，base64编码的PNG数据（仅include_icons为True时）
+          - icon_hash (str, optional): 窗口图标内容哈希，没有图标时为空（仅include_icons为False时）
           - alias (str, optional): 窗口别名，可为空
+        - version (str): 窗口列表版本号，可传给get_window_changes获取增量
+        - cache (dict): 缓存信息，包含hit（本次是否命中）、hits、misses、hit_ratio、ttl
         - error (str, optional): 错误信息（如果有）
         
     API端点: GET /windows
@@ -505,154 +1164,495 @@ async def get_window_list() -> Dict[str, Any]:
         >>> else:
         ...     print(f"获取窗口列表失败: {result['error']}")
     """
-    return await make_api_request("WINDOWS_LIST", method="GET")
+    result = await _get_window_table(force_refresh)
+    if result["success"] and isinstance(result["content"], WindowTable):
+        windows = _window_table_to_list(result["content"], include_icons)
+        if windows is None:
+            # 部分图标已被图标缓存淘汰，强制刷新一次以重新收集
+            result = await _get_window_table(force_refresh=True)
+            if result["success"] and isinstance(result["content"], WindowTable):
+                windows = _window_table_to_list(result["content"], include_icons)
+                if windows is None:
+                    # 不同图标数量超过图标缓存容量，只能返回icon_hash
+                    logging.warning("图标数量超过LAYOUT_DRIVER_ICON_CACHE_SIZE，返回icon_hash代替图标数据")
+                    windows = _window_table_to_list(result["content"], False)
+        if isinstance(result["content"], WindowTable):
+            result["content"] = windows
+    return result
 
-async def close_windows_batch(handle: int, title: str, width: int, height: int, 
-                             x: int, y: int, icon: Optional[str] = None, 
-                             alias: Optional[str] = None) -> Dict[str, Any]:
-    """批量关闭窗口
+def _build_window_table(windows: List[Dict[str, Any]]) -> Tuple[WindowTable, str]:
+    """由后端返回的窗口列表构建窗口表
     
-    通过调用后端API接口批量关闭指定的窗口。
+    收集图标到图标缓存（窗口表只保存图标哈希），记录窗口列表版本供get_window_changes计算增量，
+    并重建窗口索引（版本未变化时跳过）供find_windows查询。
+    
+    出参：
+        Tuple[WindowTable, str]: 窗口表和版本号
+    """
+    icon_cache.ingest(windows)
+    table = WindowTable.from_windows(windows, icon_cache.lookup)
+    version = window_snapshot_history.record(table)
+    if window_registry.version != version:
+        window_registry.rebuild(version, table.to_dicts())
+    return table, version
+
+def _warm_start(snapshot: Dict[str, Any]) -> None:
+    """用状态存储中保存的窗口快照热启动（见state_store.state_store_lifespan）
+    
+    快照写入窗口列表缓存（一个TTL内直接使用，结果带warm_start标记）、版本历史、窗口索引和图标缓存，
+    并恢复条件GET验证器：快照过期后的第一次刷新是条件请求，窗口没有变化时后端只需返回304。
+    驱动已知的窗口状态同时恢复，供apply_layout和restore_previous_layout使用。
+    """
+    windows = snapshot["windows"]
+    for handle, fields in snapshot["states"].items():
+        window_state_tracker.record(handle, **fields)
+    if snapshot["conditional_key"] and (snapshot["etag"] or snapshot["last_modified"]):
+        conditional_get_cache.store(
+            snapshot["conditional_key"],
+            {"etag": snapshot["etag"], "last-modified": snapshot["last_modified"]},
+            windows,
+        )
+    table, version = _build_window_table(windows)
+    window_list_cache.set(
+        {"success": True, "status_code": 200, "content": table, "version": version,
+         "warm_start": True, "saved_at": snapshot["saved_at"]},
+        window_list_cache.generation,
+    )
+    if LogConfig.VERBOSE:
+        logging.info(f"从窗口状态存储热启动: {len(windows)} 个窗口，版本 {version}")
+
+async def _get_window_table(force_refresh: bool = False) -> Dict[str, Any]:
+    """获取窗口列表快照，成功时content为列式窗口表（WindowTable）
+    
+    缓存命中时直接返回缓存的窗口表；未命中时请求后端，收集图标到图标缓存，
+    构建窗口表并记录版本历史、重建窗口索引，再写入快照缓存（启用状态存储时同时保存到本地）。
+    """
+    # 优先读取快照缓存
+    cached = None if force_refresh else window_list_cache.get()
+    if cached is not None:
+        cached["cache"] = {"hit": True, **window_list_cache.stats()}
+        return cached
+    
+    generation = window_list_cache.generation
+    result = await make_api_request("WINDOWS_LIST", method="GET")
+    if result["success"] and isinstance(result["content"], list):
+        windows = result["content"]
+        result["content"], result["version"] = _build_window_table(windows)
+        # 保存窗口快照，供下次启动时热启动（版本号和验证器都未变化时不写入）
+        if state_store.persistent:
+            key = _conditional_key(result["url"])
+            state_store.save_snapshot(windows, result["version"], key, **conditional_get_cache.validators(key))
+    if result["success"]:
+        window_list_cache.set(result, generation)
+    result["cache"] = {"hit": False, **window_list_cache.stats()}
+    if isinstance(result["content"], WindowTable):
+        # 订阅的窗口资源内容变化时通知客户端
+        await resource_notifier.publish(result["content"])
+    return result
+
+def _is_window_handle(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+async def _apply_window_events(events: List[Dict[str, Any]]) -> None:
+    """把后端推送的窗口事件增量应用到缓存的窗口列表，并通知MCP客户端
+    
+    created / changed事件更新或新增窗口（changed可以只携带变化的字段），
+    removed事件移除窗口，reset事件（以及缺少句柄、新窗口缺少必需字段等无法应用的事件）使缓存失效，
+    下次读取时重新获取完整列表；类型无法识别的事件忽略。
+    只有订阅的窗口资源内容确实变化时才发送资源更新通知。
+    """
+    upserts: Dict[int, Dict[str, Any]] = {}
+    removed: List[int] = []
+    reset = False
+    for event in events:
+        event_type = event.get("type") if isinstance(event, dict) else None
+        if event_type in (EVENT_CREATED, EVENT_CHANGED):
+            window = event.get("window")
+            if not isinstance(window, dict) or not _is_window_handle(window.get("handle")):
+                logging.warning(f"窗口事件缺少窗口句柄，丢弃窗口列表缓存: {event}")
+                reset = True
+                continue
+            upserts[window["handle"]] = {**upserts.get(window["handle"], {}), **window}
+            if window["handle"] in removed:
+                removed.remove(window["handle"])
+        elif event_type == EVENT_REMOVED:
+            if not _is_window_handle(event.get("handle")):
+                logging.warning(f"窗口事件缺少窗口句柄，丢弃窗口列表缓存: {event}")
+                reset = True
+                continue
+            upserts.pop(event["handle"], None)
+            removed.append(event["handle"])
+        elif event_type == EVENT_RESET:
+            reset = True
+        elif not isinstance(event, dict):
+            logging.warning(f"窗口事件格式错误，丢弃窗口列表缓存: {event!r}")
+            reset = True
+        else:
+            logging.warning(f"忽略无法识别的窗口事件: {event}")
+    
+    if reset:
+        window_list_cache.invalidate()
+        if resource_notifier.has_subscribers():
+            # 有资源订阅者时立即重新获取，以便判断并通知变化
+            await _get_window_table(force_refresh=True)
+        return
+    if not upserts and not removed:
+        return
+    
+    icon_cache.update(list(upserts.values()), removed)
+    changed = False
+    
+    def update(result: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal changed
+        table = result["content"]
+        new_table = table.apply_changes(upserts, removed, icon_cache.lookup)
+        # 只比较事件涉及的窗口
+        changed = any(handle in table.rows for handle in removed) or any(
+            handle not in table.rows
+            or new_table.row(new_table.rows[handle]) != table.row(table.rows[handle])
+            for handle in upserts
+        )
+        if not changed:
+            return result
+        result["content"] = new_table
+        result["version"] = window_snapshot_history.record(new_table)
+        window_registry.rebuild(result["version"], new_table.to_dicts())
+        return result
+    
+    try:
+        updated = window_list_cache.apply(update)
+    except (KeyError, TypeError) as e:
+        # 新窗口缺少必需字段等无法增量应用的情况，丢弃缓存
+        logging.warning(f"无法应用窗口事件，丢弃窗口列表缓存: {e}")
+        window_list_cache.invalidate()
+        updated, changed = None, True
+    
+    if updated is not None:
+        if changed:
+            await resource_notifier.publish(updated["content"])
+    elif resource_notifier.has_subscribers():
+        # 缓存为空时无法增量应用，重新获取完整列表以判断并通知变化
+        await _get_window_table(force_refresh=True)
+
+def _window_table_to_list(table: WindowTable,
+                          include_icons: bool) -> Optional[List[Dict[str, Any]]]:
+    """把窗口表还原为返回给客户端的窗口字典列表
+    
+    默认只携带icon_hash；include_icons为True时改为携带图标数据，
+    有图标已被图标缓存淘汰时返回None。
+    """
+    windows = table.to_dicts()
+    if include_icons:
+        for window in windows:
+            icon_hash = window.pop("icon_hash")
+            icon = icon_cache.get(icon_hash) if icon_hash is not None else None
+            if icon_hash is not None and icon is None:
+                return None
+            window["icon"] = icon
+    return windows
+
+async def get_window_changes(since_version: Optional[str] = None,
+                             force_refresh: bool = False) -> Dict[str, Any]:
+    """获取自指定版本以来的窗口列表变化
+    
+    基于get_window_list（含快照缓存和条件GET）获取当前窗口列表，
+    与since_version对应的历史版本比较，只返回新增、移除和变化的窗口。
+    桌面基本不变时，可显著减少返回给模型的数据量。
     
     入参：
-        handle (int): 窗口句柄，用于唯一标识窗口
-        title (str): 窗口标题
-        width (int): 窗口宽度（像素）
-        height (int): 窗口高度（像素）
-        x (int): 窗口左上角X坐标
-        y (int): 窗口左上角Y坐标
-        icon (str, optional): 窗口图标，base64编码的PNG数据，默认None
-        alias (str, optional): 窗口别名，默认None
+        since_version (str, optional): 上次获取到的版本号（来自get_window_list
+            或get_window_changes的version字段）；为空时返回完整列表
+        force_refresh (bool, optional): 是否跳过缓存强制从后端获取，默认False
         
     出参：
-        Dict[str, Any]: API响应结果，包含：
+        Dict[str, Any]: 结果，包含：
         - success (bool): 请求是否成功
-        - content (dict): 关闭操作结果，包含：
-          - message (str): 操作结果消息
-          - closed_count (int): 成功关闭的窗口数量
-          - failed_windows (list, optional): 关闭失败的窗口列表
+        - content (dict): 增量内容，包含：
+          - version (str): 当前版本号
+          - since_version (str): 请求中的版本号
+          - full (bool): 是否返回了完整列表
+          - windows (list): 完整窗口列表（仅full为True时）
+          - added (list): 新增的窗口（仅full为False时）
+          - removed (list): 已移除窗口的句柄（仅full为False时）
+          - changed (list): 发生变化的窗口（仅full为False时）
         - status_code (int): HTTP状态码
         - error (str, optional): 错误信息（如果有）
         
-    API端点: POST /windows/close
-        
     Example:
-        >>> # 关闭特定窗口
-        >>> result = await close_windows_batch(
-        ...     handle=12345,
-        ...     title="Google Chrome - 新标签页",
-        ...     width=1200,
-        ...     height=800,
-        ...     x=100,
-        ...     y=100,
-        ...     alias="浏览器"
-        ... )
-        >>> if result["success"]:
-        ...     content = result["content"]
-        ...     print(f"关闭操作完成: {content['message']}")
-        ...     print(f"成功关闭 {content['closed_count']} 个窗口")
-        >>> else:
-        ...     print(f"关闭窗口失败: {result['error']}")
+        >>> first = await get_window_changes()
+        >>> version = first["content"]["version"]
+        >>> # 一段时间后只获取变化部分
+        >>> result = await get_window_changes(since_version=version)
+        >>> changes = result["content"]
+        >>> print(len(changes["added"]), len(changes["removed"]), len(changes["changed"]))
     """
-    # 构建请求数据
-    window_data = {
-        "handle": handle,
-        "title": title,
-        "width": width,
-        "height": height,
-        "x": x,
-        "y": y,
-        "icon": icon,
-        "alias": alias
-    }
+    result = await _get_window_table(force_refresh)
+    if not result["success"] or not isinstance(result["content"], WindowTable):
+        return result
     
-    # 记录操作日志
-    if LogConfig.VERBOSE:
-        logging.info(f"准备关闭窗口: {title} (句柄: {handle})")
+    table = result["content"]
+    version = result["version"]
+    changes = window_snapshot_history.diff(since_version, table) if since_version else None
     
-    return await make_api_request("WINDOWS_CLOSE_BATCH", method="POST", data=window_data)
+    if changes is None:
+        # 版本号为空、未知或已过期，返回完整列表
+        content = {"version": version, "since_version": since_version,
+                   "full": True, "windows": table.to_dicts()}
+    else:
+        content = {"version": version, "since_version": since_version,
+                   "full": False, **changes}
+    
+    return {
+        "success": True,
+        "status_code": result["status_code"],
+        "content": content,
+    }
 
-async def minimize_windows_batch(handle: int, title: str, width: int, height: int, 
-                                x: int, y: int, icon: Optional[str] = None, 
-                                alias: Optional[str] = None) -> Dict[str, Any]:
-    """批量最小化窗口
+async def get_window_icons(handles: List[int],
+                           known_hashes: Optional[List[str]] = None) -> Dict[str, Any]:
+    """按需获取窗口图标
     
-    通过调用后端API接口批量最小化指定的窗口。
+    图标按内容哈希缓存在IconCache中，相同图标只返回一份；
+    客户端通过known_hashes声明已持有的图标，使每个图标最多传输一次。
+    有句柄不在图标缓存中时，会强制刷新一次窗口列表。
     
     入参：
-        handle (int): 窗口句柄，用于唯一标识窗口
-        title (str): 窗口标题
-        width (int): 窗口宽度（像素）
-        height (int): 窗口高度（像素）
-        x (int): 窗口左上角X坐标
-        y (int): 窗口左上角Y坐标
-        icon (str, optional): 窗口图标，base64编码的PNG数据，默认None
-        alias (str, optional): 窗口别名，默认None
+        handles (List[int]): 需要图标的窗口句柄列表
+        known_hashes (List[str], optional): 客户端已持有的图标哈希，默认None
         
     出参：
-        Dict[str, Any]: API响应结果，包含：
+        Dict[str, Any]: 结果，包含：
         - success (bool): 请求是否成功
-        - content (dict): 最小化操作结果，包含：
-          - message (str): 操作结果消息
-          - minimized_count (int): 成功最小化的窗口数量
+        - content (dict): 图标内容，包含：
+          - windows (list): 每个窗口的handle和icon_hash（没有图标时为None）
+          - icons (dict): 图标哈希到base64图标数据的映射
+          - missing (list): 当前窗口列表中不存在的句柄
+        - error (str, optional): 错误信息（如果有）
+        
+    Example:
+        >>> result = await get_window_icons([12345, 67890])
+        >>> icons = result["content"]["icons"]
+        >>> for window in result["content"]["windows"]:
+        ...     print(window["handle"], window["icon_hash"] in icons)
+    """
+    # 有未知句柄时刷新一次窗口列表以收集图标
+    if any(not icon_cache.knows(handle) for handle in handles):
+        result = await _get_window_table(force_refresh=True)
+        if not result["success"]:
+            return result
+    
+    known = set(known_hashes or [])
+    windows = []
+    icons = {}
+    missing = []
+    for handle in handles:
+        if not icon_cache.knows(handle):
+            missing.append(handle)
+            continue
+        icon_hash = icon_cache.lookup(handle)
+        windows.append({"handle": handle, "icon_hash": icon_hash})
+        if icon_hash is not None and icon_hash not in known and icon_hash not in icons:
+            icons[icon_hash] = icon_cache.get(icon_hash)
+    
+    return {
+        "success": True,
+        "status_code": 200,
+        "content": {"windows": windows, "icons": icons, "missing": missing},
+    }
+
+async def find_windows(query: FindWindowsRequest) -> Dict[str, Any]:
+    """按条件查找窗口
+    
+    基于get_window_list（含快照缓存）维护的内存窗口索引查询，
+    只返回匹配的窗口，避免模型在上下文中逐个扫描完整窗口列表。
+    
+    入参：
+        query (FindWindowsRequest): 查询条件，给出的条件需同时满足：
+          - title / title_prefix / title_regex: 标题子串 / 前缀 / 正则
+          - alias: 窗口别名
+          - region: 与之重叠的屏幕区域
+          - min_width / max_width / min_height / max_height: 尺寸范围
+          - limit: 最多返回数量
+          - force_refresh: 是否强制刷新窗口列表
+        
+    出参：
+        Dict[str, Any]: 结果，包含：
+        - success (bool): 请求是否成功
+        - content (dict): 查询结果，包含：
+          - windows (list): 匹配的窗口（不含图标数据，携带icon_hash）
+          - total (int): 当前窗口总数
+          - version (str): 窗口列表版本号
+        - error (str, optional): 错误信息（如果有）
+        
+    Example:
+        >>> result = await find_windows(FindWindowsRequest(title="chrome", min_width=800))
+        >>> for window in result["content"]["windows"]:
+        ...     print(window["handle"], window["title"])
+    """
+    snapshot = await _get_window_table(force_refresh=query.force_refresh)
+    if not snapshot["success"] or not isinstance(snapshot["content"], WindowTable):
+        return snapshot
+    
+    # 索引通常已在获取窗口列表时重建，这里只处理版本不一致的情况
+    if window_registry.version != snapshot["version"]:
+        window_registry.rebuild(snapshot["version"], snapshot["content"].to_dicts())
+    try:
+        windows = window_registry.find(
+            title=query.title,
+            title_prefix=query.title_prefix,
+            title_regex=query.title_regex,
+            alias=query.alias,
+            region=query.region.model_dump() if query.region is not None else None,
+            min_width=query.min_width,
+            max_width=query.max_width,
+            min_height=query.min_height,
+            max_height=query.max_height,
+            limit=query.limit,
+        )
+    except re.error as e:
+        return {"success": False, "error": f"无效的标题正则表达式: {e}", "status_code": 0}
+    
+    return {
+        "success": True,
+        "status_code": snapshot["status_code"],
+        "content": {
+            "windows": windows,
+            "total": len(window_registry),
+            "version": snapshot["version"],
+        },
+    }
+
+async def close_windows_batch(windows: List[WindowInfo]) -> Dict[str, Any]:
+    """批量关闭窗口
+    
+    通过调用后端API接口批量关闭指定的窗口。
+    所有窗口在一次POST请求中发送给后端（窗口很多时自动分片，见batch_api_request），
+    并按窗口返回操作结果。
+    
+    入参：
+        windows (List[WindowInfo]): 要关闭的窗口列表，每个窗口包含：
+            - handle (int): 窗口句柄，用于唯一标识窗口
+            - title (str): 窗口标题
+            - width (int): 窗口宽度（像素）
+            - height (int): 窗口高度（像素）
+            - x (int): 窗口左上角X坐标
+            - y (int): 窗口左上角Y坐标
+            - icon (str, optional): 窗口图标，base64编码的PNG数据
+            - alias (str, optional): 窗口别名
+        
+    出参：
+        Dict[str, Any]: API响应结果，包含：
+        - success (bool): 请求是否成功
+        - content (dict): 关闭操作结果，包含：
+          - message (str): 操作结果消息
+          - closed_count (int): 成功关闭的窗口数量
+          - failed_windows (list, optional): 关闭失败的窗口列表
+        - window_results (list): 每个窗口的操作结果（handle、success、error）
+        - status_code (int): HTTP状态码
+        - error (str, optional): 错误信息（如果有）
+        
+    API端点: POST /windows/close
+        
+    Example:
+        >>> result = await close_windows_batch([
+        ...     WindowInfo(handle=12345, title="Google Chrome - 新标签页",
+        ...                width=1200, height=800, x=100, y=100, alias="浏览器"),
+        ...     WindowInfo(handle=67890, title="记事本",
+        ...                width=600, height=400, x=200, y=200),
+        ... ])
+        >>> if result["success"]:
+        ...     print(f"成功关闭 {result['content']['closed_count']} 个窗口")
+        ...     for item in result["window_results"]:
+        ...         print(item["handle"], item["success"])
+        >>> else:
+        ...     print(f"关闭窗口失败: {result['error']}")
+    """
+    # 记录操作日志
+    if LogConfig.VERBOSE:
+        logging.info(f"准备关闭 {len(windows)} 个窗口: {[window.title for window in windows]}")
+    
+    # 所有窗口合并为一个请求体（窗口很多时拆分为多个请求）；后端按handle识别窗口，不再上传图标
+    result = await batch_api_request("WINDOWS_CLOSE_BATCH", windows, window_list_body,
+                                     lambda window: window.handle)
+    _record_window_states(result, "close", windows)
+    # 窗口状态可能已改变，使窗口列表缓存失效
+    window_list_cache.invalidate()
+    return result
+
+async def minimize_windows_batch(windows: List[WindowInfo]) -> Dict[str, Any]:
+    """批量最小化窗口
+    
+    通过调用后端API接口批量最小化指定的窗口。
+    所有窗口在一次POST请求中发送给后端（窗口很多时自动分片，见batch_api_request），
+    并按窗口返回操作结果。
+    
+    入参：
+        windows (List[WindowInfo]): 要最小化的窗口列表，每个窗口包含：
+            - handle (int): 窗口句柄，用于唯一标识窗口
+            - title (str): 窗口标题
+            - width (int): 窗口宽度（像素）
+            - height (int): 窗口高度（像素）
+            - x (int): 窗口左上角X坐标
+            - y (int): 窗口左上角Y坐标
+            - icon (str, optional): 窗口图标，base64编码的PNG数据
+            - alias (str, optional): 窗口别名
+        
+    出参：
+        Dict[str, Any]: API响应结果，包含：
+        - success (bool): 请求是否成功
+        - content (dict): 最小化操作结果，包含：
+          - message (str): 操作结果消息
+          - minimized_count (int): 成功最小化的窗口数量
           - failed_windows (list, optional): 最小化失败的窗口列表
+        - window_results (list): 每个窗口的操作结果（handle、success、error）
         - status_code (int): HTTP状态码
         - error (str, optional): 错误信息（如果有）
         
     API端点: POST /windows/minimize
         
     Example:
-        >>> # 最小化特定窗口
-        >>> result = await minimize_windows_batch(
-        ...     handle=12345,
-        ...     title="Google Chrome - 新标签页",
-        ...     width=1200,
-        ...     height=800,
-        ...     x=100,
-        ...     y=100,
-        ...     alias="浏览器"
-        ... )
+        >>> result = await minimize_windows_batch([
+        ...     WindowInfo(handle=12345, title="Google Chrome - 新标签页",
+        ...                width=1200, height=800, x=100, y=100, alias="浏览器"),
+        ...     WindowInfo(handle=67890, title="记事本",
+        ...                width=600, height=400, x=200, y=200),
+        ... ])
         >>> if result["success"]:
-        ...     content = result["content"]
-        ...     print(f"最小化操作完成: {content['message']}")
-        ...     print(f"成功最小化 {content['minimized_count']} 个窗口")
+        ...     print(f"成功最小化 {result['content']['minimized_count']} 个窗口")
+        ...     for item in result["window_results"]:
+        ...         print(item["handle"], item["success"])
         >>> else:
         ...     print(f"最小化窗口失败: {result['error']}")
     """
-    # 构建请求数据
-    window_data = {
-        "handle": handle,
-        "title": title,
-        "width": width,
-        "height": height,
-        "x": x,
-        "y": y,
-        "icon": icon,
-        "alias": alias
-    }
-    
     # 记录操作日志
     if LogConfig.VERBOSE:
-        logging.info(f"准备最小化窗口: {title} (句柄: {handle})")
+        logging.info(f"准备最小化 {len(windows)} 个窗口: {[window.title for window in windows]}")
     
-    return await make_api_request("WINDOWS_MINIMIZE_BATCH", method="POST", data=window_data)
+    # 所有窗口合并为一个请求体（窗口很多时拆分为多个请求）；后端按handle识别窗口，不再上传图标
+    result = await batch_api_request("WINDOWS_MINIMIZE_BATCH", windows, window_list_body,
+                                     lambda window: window.handle)
+    _record_window_states(result, "minimize", windows, state="minimized")
+    # 窗口状态可能已改变，使窗口列表缓存失效
+    window_list_cache.invalidate()
+    return result
 
-async def maximize_windows_batch(handle: int, title: str, width: int, height: int, 
-                                x: int, y: int, icon: Optional[str] = None, 
-                                alias: Optional[str] = None) -> Dict[str, Any]:
+async def maximize_windows_batch(windows: List[WindowInfo]) -> Dict[str, Any]:
     """批量最大化窗口
     
     通过调用后端API接口批量最大化指定的窗口。
+    所有窗口在一次POST请求中发送给后端（窗口很多时自动分片，见batch_api_request），
+    并按窗口返回操作结果。
     
     入参：
-        handle (int): 窗口句柄，用于唯一标识窗口
-        title (str): 窗口标题
-        width (int): 窗口宽度（像素）
-        height (int): 窗口高度（像素）
-        x (int): 窗口左上角X坐标
-        y (int): 窗口左上角Y坐标
-        icon (str, optional): 窗口图标，base64编码的PNG数据，默认None
-        alias (str, optional): 窗口别名，默认None
+        windows (List[WindowInfo]): 要最大化的窗口列表，每个窗口包含：
+            - handle (int): 窗口句柄，用于唯一标识窗口
+            - title (str): 窗口标题
+            - width (int): 窗口宽度（像素）
+            - height (int): 窗口高度（像素）
+            - x (int): 窗口左上角X坐标
+            - y (int): 窗口左上角Y坐标
+            - icon (str, optional): 窗口图标，base64编码的PNG数据
+            - alias (str, optional): 窗口别名
         
     出参：
         Dict[str, Any]: API响应结果，包含：
@@ -661,64 +1661,56 @@ async def maximize_windows_batch(handle: int, title: str, width: int, height: in
           - message (str): 操作结果消息
           - maximized_count (int): 成功最大化的窗口数量
           - failed_windows (list, optional): 最大化失败的窗口列表
+        - window_results (list): 每个窗口的操作结果（handle、success、error）
         - status_code (int): HTTP状态码
         - error (str, optional): 错误信息（如果有）
         
     API端点: POST /windows/maximize
         
     Example:
-        >>> # 最大化特定窗口
-        >>> result = await maximize_windows_batch(
-        ...     handle=12345,
-        ...     title="Google Chrome - 新标签页",
-        ...     width=1200,
-        ...     height=800,
-        ...     x=100,
-        ...     y=100,
-        ...     alias="浏览器"
-        ... )
+        >>> result = await maximize_windows_batch([
+        ...     WindowInfo(handle=12345, title="Google Chrome - 新标签页",
+        ...                width=1200, height=800, x=100, y=100, alias="浏览器"),
+        ...     WindowInfo(handle=67890, title="记事本",
+        ...                width=600, height=400, x=200, y=200),
+        ... ])
         >>> if result["success"]:
-        ...     content = result["content"]
-        ...     print(f"最大化操作完成: {content['message']}")
-        ...     print(f"成功最大化 {content['maximized_count']} 个窗口")
+        ...     print(f"成功最大化 {result['content']['maximized_count']} 个窗口")
+        ...     for item in result["window_results"]:
+        ...         print(item["handle"], item["success"])
         >>> else:
         ...     print(f"最大化窗口失败: {result['error']}")
     """
-    # 构建请求数据
-    window_data = {
-        "handle": handle,
-        "title": title,
-        "width": width,
-        "height": height,
-        "x": x,
-        "y": y,
-        "icon": icon,
-        "alias": alias
-    }
-    
     # 记录操作日志
     if LogConfig.VERBOSE:
-        logging.info(f"准备最大化窗口: {title} (句柄: {handle})")
+        logging.info(f"准备最大化 {len(windows)} 个窗口: {[window.title for window in windows]}")
     
-    return await make_api_request("WINDOWS_MAXIMIZE_BATCH", method="POST", data=window_data)
+    # 所有窗口合并为一个请求体（窗口很多时拆分为多个请求）；后端按handle识别窗口，不再上传图标
+    result = await batch_api_request("WINDOWS_MAXIMIZE_BATCH", windows, window_list_body,
+                                     lambda window: window.handle)
+    _record_window_states(result, "maximize", windows, state="maximized")
+    # 窗口状态可能已改变，使窗口列表缓存失效
+    window_list_cache.invalidate()
+    return result
 
-async def restore_windows_batch(handle: int, title: str, width: int, height: int, 
-                               x: int, y: int, icon: Optional[str] = None, 
-                               alias: Optional[str] = None) -> Dict[str, Any]:
+async def restore_windows_batch(windows: List[WindowInfo]) -> Dict[str, Any]:
     """批量还原窗口
     
     通过调用后端API接口批量还原指定的窗口到正常状态。
     还原操作会将最小化或最大化的窗口恢复到其原始大小和位置。
+    所有窗口在一次POST请求中发送给后端（窗口很多时自动分片，见batch_api_request），
+    并按窗口返回操作结果。
     
     入参：
-        handle (int): 窗口句柄，用于唯一标识窗口
-        title (str): 窗口标题
-        width (int): 窗口宽度（像素）
-        height (int): 窗口高度（像素）
-        x (int): 窗口左上角X坐标
-        y (int): 窗口左上角Y坐标
-        icon (str, optional): 窗口图标，base64编码的PNG数据，默认None
-        alias (str, optional): 窗口别名，默认None
+        windows (List[WindowInfo]): 要还原的窗口列表，每个窗口包含：
+            - handle (int): 窗口句柄，用于唯一标识窗口
+            - title (str): 窗口标题
+            - width (int): 窗口宽度（像素）
+            - height (int): 窗口高度（像素）
+            - x (int): 窗口左上角X坐标
+            - y (int): 窗口左上角Y坐标
+            - icon (str, optional): 窗口图标，base64编码的PNG数据
+            - alias (str, optional): 窗口别名
         
     出参：
         Dict[str, Any]: API响应结果，包含：
@@ -727,46 +1719,37 @@ async def restore_windows_batch(handle: int, title: str, width: int, height: int
           - message (str): 操作结果消息
           - restored_count (int): 成功还原的窗口数量
           - failed_windows (list, optional): 还原失败的窗口列表
+        - window_results (list): 每个窗口的操作结果（handle、success、error）
         - status_code (int): HTTP状态码
         - error (str, optional): 错误信息（如果有）
         
     API端点: POST /windows/restore
         
     Example:
-        >>> # 还原特定窗口
-        >>> result = await restore_windows_batch(
-        ...     handle=12345,
-        ...     title="Google Chrome - 新标签页",
-        ...     width=1200,
-        ...     height=800,
-        ...     x=100,
-        ...     y=100,
-        ...     alias="浏览器"
-        ... )
+        >>> result = await restore_windows_batch([
+        ...     WindowInfo(handle=12345, title="Google Chrome - 新标签页",
+        ...                width=1200, height=800, x=100, y=100, alias="浏览器"),
+        ...     WindowInfo(handle=67890, title="记事本",
+        ...                width=600, height=400, x=200, y=200),
+        ... ])
         >>> if result["success"]:
-        ...     content = result["content"]
-        ...     print(f"还原操作完成: {content['message']}")
-        ...     print(f"成功还原 {content['restored_count']} 个窗口")
+        ...     print(f"成功还原 {result['content']['restored_count']} 个窗口")
+        ...     for item in result["window_results"]:
+        ...         print(item["handle"], item["success"])
         >>> else:
         ...     print(f"还原窗口失败: {result['error']}")
     """
-    # 构建请求数据
-    window_data = {
-        "handle": handle,
-        "title": title,
-        "width": width,
-        "height": height,
-        "x": x,
-        "y": y,
-        "icon": icon,
-        "alias": alias
-    }
-    
     # 记录操作日志
     if LogConfig.VERBOSE:
-        logging.info(f"准备还原窗口: {title} (句柄: {handle})")
+        logging.info(f"准备还原 {len(windows)} 个窗口: {[window.title for window in windows]}")
     
-    return await make_api_request("WINDOWS_RESTORE_BATCH", method="POST", data=window_data)
+    # 所有窗口合并为一个请求体（窗口很多时拆分为多个请求）；后端按handle识别窗口，不再上传图标
+    result = await batch_api_request("WINDOWS_RESTORE_BATCH", windows, window_list_body,
+                                     lambda window: window.handle)
+    _record_window_states(result, "restore", windows, state="normal")
+    # 窗口状态可能已改变，使窗口列表缓存失效
+    window_list_cache.invalidate()
+    return result
 
 async def set_window_opacity_batch(windows: List[WindowOpacityItem]) -> Dict[str, Any]:
     """批量设置窗口透明度
@@ -797,6 +1780,7 @@ async def set_window_opacity_batch(windows: List[WindowOpacityItem]) -> Dict[str
           - message (str): 操作结果消息
           - updated_count (int): 成功设置透明度的窗口数量
           - failed_windows (list, optional): 设置失败的窗口列表
+        - window_results (list): 每个窗口的操作结果（handle、success、error）
         - status_code (int): HTTP状态码
         - error (str, optional): 错误信息（如果有）
         
@@ -837,24 +1821,6 @@ async def set_window_opacity_batch(windows: List[WindowOpacityItem]) -> Dict[str
         >>> else:
         ...     print(f"设置窗口透明度失败: {result['error']}")
     """
-    # 构建请求数据 - 转换为API期望的格式
-    request_data = []
-    for item in windows:
-        window_data = {
-            "window": {
-                "handle": item.window.handle,
-                "title": item.window.title,
-                "width": item.window.width,
-                "height": item.window.height,
-                "x": item.window.x,
-                "y": item.window.y,
-                "icon": item.window.icon,
-                "alias": item.window.alias
-            },
-            "opacity": item.opacity
-        }
-        request_data.append(window_data)
-    
     # 记录操作日志
     if LogConfig.VERBOSE:
         window_titles = [item.window.title for item in windows]
@@ -863,119 +1829,554 @@ async def set_window_opacity_batch(windows: List[WindowOpacityItem]) -> Dict[str
         logging.info(f"窗口标题: {window_titles}")
         logging.info(f"透明度值: {opacity_values}")
     
-    return await make_api_request("WINDOWS_OPACITY_BATCH", method="POST", data=request_data)
+    # 构建请求数据 - 转换为API期望的格式（窗口很多时拆分为多个请求）；后端按handle识别窗口，不再上传图标
+    result = await batch_api_request("WINDOWS_OPACITY_BATCH", windows, opacity_list_body,
+                                     lambda item: item.window.handle)
+    _record_window_states(result, "opacity", [item.window for item in windows],
+                          opacities={item.window.handle: item.opacity for item in windows})
+    # 窗口状态可能已改变，使窗口列表缓存失效
+    window_list_cache.invalidate()
+    return result
 
-async def serve() -> None:
-    """MCP Layout Driver服务器主函数
+# 窗口状态端点键名到批量函数的映射（透明度需要单独构造请求）
+_ENDPOINT_BATCH_FUNCTIONS = {
+    "WINDOWS_CLOSE_BATCH": close_windows_batch,
+    "WINDOWS_MINIMIZE_BATCH": minimize_windows_batch,
+    "WINDOWS_MAXIMIZE_BATCH": maximize_windows_batch,
+    "WINDOWS_RESTORE_BATCH": restore_windows_batch,
+}
+
+async def apply_layout(targets: List[WindowTarget], dry_run: bool = False,
+                       force_refresh: bool = False) -> Dict[str, Any]:
+    """声明式应用窗口布局
     
-    这是整个MCP Layout Driver系统的入口函数，负责启动和运行MCP服务器。
-    该函数创建了一个完整的MCP服务器实例，注册所有可用的工具，并处理客户端的请求。
+    根据目标布局与当前窗口快照的差异生成最少的操作计划：
+    已处于目标状态的窗口会被跳过，需要同一操作的窗口合并为一次批量请求，
+    不同端点的批量请求并发执行。
     
-    ## 功能概述：
-    该函数实现了一个基于MCP（Model Context Protocol）的窗口管理服务器，提供以下核心功能：
-    1. 窗口发现：获取当前桌面所有打开的窗口列表
-    2. 窗口操作：批量关闭、最小化、最大化、还原窗口
-    3. 视觉效果：批量设置窗口透明度
-    4. API集成：所有操作都通过后端API实现真实的窗口管理
+    计划通过execute_operations执行，同一窗口先改变状态再设置透明度。
+    窗口的state / opacity优先使用后端窗口列表中的字段，
+    后端不提供时使用驱动记录的、本进程成功执行过的操作结果。
     
-    ## 业务逻辑流程：
-    1. **服务器初始化**：
-       - 创建名为"layout_driver"的MCP服务器实例
-       - 配置日志系统
-       - 设置服务器基础参数
+    入参：
+        targets (List[WindowTarget]): 目标列表
+        dry_run (bool, optional): 只返回计划而不执行，默认False
+        force_refresh (bool, optional): 是否强制刷新窗口列表，默认False
+        
+    出参：
+        Dict[str, Any]: 结果，包含：
+        - success (bool): 所有批量请求是否都成功（dry_run时为获取窗口列表是否成功）
+        - content (dict): 执行内容，包含：
+          - dry_run (bool): 是否只生成了计划
+          - plan (dict): 端点键名到窗口句柄列表的映射
+          - skipped (list): 已处于目标状态而跳过的窗口句柄
+          - unmatched (list): 没有匹配到任何窗口的目标下标
+          - stages / requests / wall_time_ms: 执行阶段数、批量请求数和总耗时（dry_run时没有）
+        - window_results (list): 每个操作的结果（见execute_operations）
+        - error (str, optional): 错误信息（如果有）
+        
+    Example:
+        >>> result = await apply_layout([
+        ...     WindowTarget(title_pattern="Chrome", state="maximized"),
+        ...     WindowTarget(alias="terminal", opacity=200),
+        ... ])
+        >>> print(result["content"]["plan"], result["content"]["skipped"])
+    """
+    snapshot = await get_window_list(force_refresh=force_refresh)
+    if not snapshot["success"] or not isinstance(snapshot["content"], list):
+        return snapshot
     
-    2. **工具注册阶段**：
-       - 通过@server.list_tools()装饰器注册工具发现端点
-       - 为每个窗口管理功能创建Tool对象
-       - 定义工具的名称、描述和输入模式
+    try:
+        plan = plan_layout(
+            [target.model_dump() for target in targets],
+            snapshot["content"],
+            window_state_tracker,
+        )
+    except re.error as e:
+        return {"success": False, "error": f"无效的标题正则表达式: {e}", "status_code": 0}
+    operations = plan["operations"]
+    content = {
+        "dry_run": dry_run,
+        "plan": {
+            endpoint_key: [item["window"]["handle"] for item in items]
+            for endpoint_key, items in operations.items()
+        },
+        "skipped": plan["skipped"],
+        "unmatched": plan["unmatched"],
+    }
+    if dry_run or not operations:
+        return {"success": True, "status_code": 200, "content": content, "window_results": []}
     
-    3. **请求处理阶段**：
-       - 通过@server.call_tool()装饰器注册工具调用端点
-       - 根据工具名称路由到相应的处理函数
-       - 参数验证和类型转换
-       - 调用后端API执行实际操作
+    # 转换为窗口操作交给execute_operations执行：透明度操作放在最后，
+    # 同一窗口先改变状态再设置透明度
+    endpoint_operations = {endpoint_key: op for op, endpoint_key in OPERATION_ENDPOINTS.items()}
+    window_operations = [
+        WindowOperation(op=endpoint_operations[endpoint_key], window=WindowInfo(**item["window"]),
+                        opacity=item.get("opacity"))
+        for endpoint_key, items in sorted(operations.items(),
+                                          key=lambda entry: entry[0] == "WINDOWS_OPACITY_BATCH")
+        for item in items
+    ]
+    result = await execute_operations(window_operations)
+    content.update({key: value for key, value in result["content"].items() if key != "results"})
+    return {
+        "success": result["success"],
+        "status_code": 200,
+        "content": content,
+        "window_results": result["content"]["results"],
+    }
+
+async def execute_operations(operations: List[WindowOperation]) -> Dict[str, Any]:
+    """批量执行异构窗口操作
     
-    4. **通信管理**：
-       - 建立stdio通信通道（标准输入/输出）
-       - 处理MCP协议消息
-       - 管理客户端连接生命周期
+    把操作按端点分组为批量请求：同一窗口的多个操作按提交顺序分到先后阶段
+    （例如先restore再设置opacity），阶段之间顺序执行；
+    同一阶段内不同端点的批量请求并发执行，同时执行的组数受
+    ConcurrencyConfig.MAX_PARALLEL_GROUPS限制。
     
-    ## 服务器架构：
-    ```
-    MCP客户端 <---> MCP协议 <---> Layout Driver Server <---> 后端API <---> 系统窗口管理
-         ^                           ^                       ^                    ^
-         |                           |                       |                    |
-      AI模型                    本函数serve()            HTTP请求             实际窗口操作
-    ```
+    入参：
+        operations (List[WindowOperation]): 操作列表
+        
+    出参：
+        Dict[str, Any]: 结果，包含：
+        - success (bool): 所有操作是否都成功
+        - content (dict): 执行内容，包含：
+          - results (list): 每个操作的结果，与operations顺序一致，每项包含
+            index、op、handle、endpoint、stage、success、error
+          - stages (int): 执行阶段数
+          - requests (int): 实际发出的批量请求数
+          - wall_time_ms (float): 总耗时（毫秒）
+        
+    Example:
+        >>> result = await execute_operations([
+        ...     WindowOperation(op="minimize", window=window_a),
+        ...     WindowOperation(op="restore", window=window_b),
+        ...     WindowOperation(op="opacity", window=window_b, opacity=200),
+        ... ])
+        >>> print(result["content"]["stages"], result["content"]["wall_time_ms"])
+    """
+    start = time.perf_counter()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+    valid = []
+    for index, operation in enumerate(operations):
+        if operation.op == "opacity" and operation.opacity is None:
+            results[index] = {"index": index, "op": operation.op, "handle": operation.window.handle,
+                              "endpoint": None, "stage": None, "success": False,
+                              "error": "opacity操作缺少opacity字段"}
+        else:
+            valid.append(index)
     
-    ## 注册的工具列表：
-    1. **get_window_list**: 获取桌面窗口列表
-       - 端点：GET /windows
-       - 返回：所有打开窗口的详细信息
+    stages = schedule_operations(
+        [{"op": operations[index].op, "handle": operations[index].window.handle} for index in valid]
+    )
+    limit = ConcurrencyConfig.MAX_PARALLEL_GROUPS
+    semaphore = asyncio.Semaphore(limit) if limit > 0 else None
     
-    2. **close_windows_batch**: 批量关闭窗口
-       - 端点：POST /windows/close
-       - 功能：永久关闭指定窗口
+    async def run_group(endpoint_key: str, indexes: List[int]) -> Dict[str, Any]:
+        items = [operations[index] for index in indexes]
+        if endpoint_key == "WINDOWS_OPACITY_BATCH":
+            call = set_window_opacity_batch(
+                [WindowOpacityItem(window=item.window, opacity=item.opacity) for item in items]
+            )
+        else:
+            call = _ENDPOINT_BATCH_FUNCTIONS[endpoint_key]([item.window for item in items])
+        if semaphore is None:
+            return await call
+        async with semaphore:
+            return await call
     
-    3. **minimize_windows_batch**: 批量最小化窗口
-       - 端点：POST /windows/minimize
-       - 功能：隐藏窗口但保持进程运行
+    requests = 0
+    for stage_number, stage in enumerate(stages):
+        groups = [
+            (endpoint_key, [valid[position] for position in positions])
+            for endpoint_key, positions in stage.items()
+        ]
+        requests += len(groups)
+        group_results = await asyncio.gather(
+            *(run_group(endpoint_key, indexes) for endpoint_key, indexes in groups)
+        )
+        for (endpoint_key, indexes), group_result in zip(groups, group_results):
+            for index, window_result in zip(indexes, group_result["window_results"]):
+                results[index] = {
+                    "index": index,
+                    "op": operations[index].op,
+                    "handle": window_result["handle"],
+                    "endpoint": endpoint_key,
+                    "stage": stage_number,
+                    "success": window_result["success"],
+                    "error": window_result["error"],
+                }
     
-    4. **maximize_windows_batch**: 批量最大化窗口
-       - 端点：POST /windows/maximize
-       - 功能：全屏显示窗口
+    return {
+        "success": all(result["success"] for result in results),
+        "status_code": 200,
+        "content": {
+            "results": results,
+            "stages": len(stages),
+            "requests": requests,
+            "wall_time_ms": round((time.perf_counter() - start) * 1000, 3),
+        },
+    }
+
+async def restore_previous_layout(steps: int = 1, dry_run: bool = False) -> Dict[str, Any]:
+    """撤销最近的窗口操作，恢复之前的窗口布局
     
-    5. **restore_windows_batch**: 批量还原窗口
-       - 端点：POST /windows/restore
-       - 功能：恢复窗口到正常状态
+    需要启用窗口状态存储（LAYOUT_DRIVER_STATE_DB）。每次改变窗口状态的工具调用在操作历史中
+    记为一条，其中每个窗口保存了操作前的state / opacity；撤销时计算这些窗口应恢复到的状态，
+    交给apply_layout执行（已处于该状态的窗口跳过）。撤销操作本身不计入历史，
+    再次调用会继续撤销更早的操作。
     
-    6. **set_window_opacity_batch**: 批量设置窗口透明度
-       - 端点：POST /windows/opacity
-       - 功能：调整窗口的透明度效果
+    操作前的状态未知（驱动和后端都没有记录）时，state按normal、opacity按255恢复；
+    已关闭的窗口无法恢复，列在irreversible中。
     
-    ## 错误处理机制：
-    - 所有工具调用都有完整的异常处理
-    - 网络错误和API错误会被优雅处理
-    - 错误信息会以JSON格式返回给客户端
-    - 支持详细的调试日志（如果启用verbose模式）
+    入参：
+        steps (int, optional): 撤销最近几次工具调用，默认1
+        dry_run (bool, optional): 只返回撤销计划而不执行，默认False
+        
+    出参：
+        Dict[str, Any]: 结果，包含：
+        - success (bool): 恢复操作是否都成功
+        - content (dict): 执行内容，包含：
+          - changes (list): 本次撤销的操作历史，每项包含id、tool、applied_at和windows（窗口数）
+          - plan / skipped / stages / requests / wall_time_ms: 同apply_layout
+          - unmatched (list): 已不存在的窗口句柄
+          - irreversible (list): 已被关闭、无法恢复的窗口句柄
+        - window_results (list): 每个恢复操作的结果（见execute_operations）
+        - error (str, optional): 错误信息（如果有）
+        
+    Example:
+        >>> await minimize_windows_batch([window_a, window_b])
+        >>> result = await restore_previous_layout()
+        >>> print(result["content"]["plan"])  # {"WINDOWS_RESTORE_BATCH": [...]}
+    """
+    if not state_store.enabled:
+        return {
+            "success": False,
+            "status_code": 0,
+            "error": "未启用窗口状态存储，请设置LAYOUT_DRIVER_STATE_DB",
+        }
     
-    ## 入参：
-        无参数 - 该函数不接受任何参数
+    changes = state_store.history(max(steps, 1))
+    undo = undo_targets(changes)
+    targets = [WindowTarget(handle=handle, **fields) for handle, fields in undo["targets"].items()]
+    if targets:
+        # 恢复操作不写入操作历史
+        with state_store.paused():
+            result = await apply_layout(targets, dry_run=dry_run)
+        if not isinstance(result.get("content"), dict):
+            # 获取窗口列表失败
+            return result
+    else:
+        result = {
+            "success": True,
+            "status_code": 200,
+            "content": {"dry_run": dry_run, "plan": {}, "skipped": [], "unmatched": []},
+            "window_results": [],
+        }
     
-    ## 出参：
-        无返回值 (None) - 该函数运行直到服务器关闭
-        
-    ## 异常处理：
-        - 如果服务器启动失败，会抛出相应异常
-        - 如果通信通道建立失败，会抛出异常
-        - 运行时异常会被记录但不会导致服务器崩溃
+    content = result["content"]
+    content["unmatched"] = [targets[index].handle for index in content["unmatched"]]
+    content["irreversible"] = undo["irreversible"]
+    content["changes"] = [
+        {"id": change["id"], "tool": change["tool"], "applied_at": change["applied_at"],
+         "windows": len(change["entries"])}
+        for change in changes
+    ]
+    if result["success"] and not dry_run:
+        state_store.mark_undone([change["id"] for change in changes])
+    return result
+
+def _collect_component_metrics() -> List[metrics.Gauge]:
+    """把窗口列表缓存、请求合并器、并发限流器和熔断器的统计转换为仪表"""
+    cache_stats = window_list_cache.stats()
+    coalescer_stats = request_coalescer.stats()
+    limiter_stats = backend_limiter.stats()
+    slots = [(("global",), limiter_stats["global"])]
+    slots += [((key,), slot) for key, slot in limiter_stats["endpoints"].items()]
+    breaker_states = {"closed": 0, "half_open": 1, "open": 2}
+    breakers = circuit_breakers.stats()
+    return [
+        metrics.gauge_from("layout_driver_window_cache_requests", "窗口列表快照缓存的命中/未命中次数",
+                           ("result",), [(("hit",), cache_stats["hits"]), (("miss",), cache_stats["misses"])]),
+        metrics.gauge_from("layout_driver_window_cache_hit_ratio", "窗口列表快照缓存命中率",
+                           (), [((), cache_stats["hit_ratio"])]),
+        metrics.gauge_from("layout_driver_window_cache_live", "窗口列表缓存是否由事件订阅保持最新（1为是）",
+                           (), [((), int(cache_stats["live"]))]),
+        metrics.gauge_from("layout_driver_coalesced_requests", "GET请求合并统计（leader为实际发出，coalesced为被合并）",
+                           ("role",), [(("leader",), coalescer_stats["leaders"]),
+                                       (("coalesced",), coalescer_stats["coalesced"])]),
+        metrics.gauge_from("layout_driver_backend_in_flight", "并发限流器中正在进行的后端请求数",
+                           ("scope",), [(labels, slot["in_flight"]) for labels, slot in slots]),
+        metrics.gauge_from("layout_driver_backend_queued", "并发限流器中排队等待配额的请求数",
+                           ("scope",), [(labels, slot["queued"]) for labels, slot in slots]),
+        metrics.gauge_from("layout_driver_circuit_breaker_state", "熔断器状态（0关闭，1半开，2打开）",
+                           ("endpoint",), [((name,), breaker_states.get(info["state"]))
+                                           for name, info in breakers.items()]),
+    ]
+
+
+metrics.registry.register_collector(_collect_component_metrics)
+
+
+def get_metrics() -> str:
+    """以Prometheus文本格式返回运行指标
     
-    ## 使用示例：
-        >>> # 启动MCP服务器
-        >>> await serve()
+    包含每个工具的处理耗时、序列化耗时和响应大小，每个后端端点的请求耗时、
+    状态码、请求/响应大小、重试次数和在途数量，以及缓存命中率、限流排队和熔断器状态。
+    MetricsConfig.ENABLED为False时只有组件统计，没有耗时直方图。
+    """
+    return metrics.registry.render()
+
+def _windows_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """窗口状态操作工具的参数：标准格式为{"windows": [...]}，同时兼容旧版直接传入单个窗口字段的格式"""
+    if "windows" in arguments:
+        return arguments
+    return {"windows": [arguments]}
+
+def _opacity_arguments(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """透明度工具的参数：每个窗口项可以是{"window": {...}, "opacity": 128}，
+    也可以把窗口字段与opacity平铺在一起（WindowInfo忽略多余的opacity字段，无需复制）"""
+    return {"windows": [
+        item if "window" in item else {"window": item, "opacity": item.get("opacity")}
+        for item in arguments.get("windows", [])
+    ]}
+
+async def _get_metrics_text(request: GetMetrics) -> str:
+    return get_metrics()
+
+class ToolSpec:
+    """工具分发表中的一项
+    
+    每个工具由一项描述：输入模型同时用于生成inputSchema和校验参数，
+    处理函数接收校验后的模型实例。新增工具只需在TOOL_SPECS中增加一项。
+    
+    入参：
+        description: 工具描述（list_tools返回）
+        model: 输入参数模型
+        handler: 处理函数，返回结果字典（经format_tool_result序列化）或直接返回给客户端的文本
+        endpoint: 工具使用的后端端点（APIConfig.ENDPOINTS的键），
+            涉及多个端点或不访问后端时为None
+        prepare: 校验前转换参数格式的函数（兼容旧参数格式），可空
+    """
+    
+    __slots__ = ("description", "model", "handler", "endpoint", "prepare")
+    
+    def __init__(self, description: str, model: type, handler: Callable[[Any], Awaitable[Any]],
+                 endpoint: Optional[str] = None,
+                 prepare: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.description = description
+        self.model = model
+        self.handler = handler
+        self.endpoint = endpoint
+        self.prepare = prepare
+    
+    def parse(self, arguments: Dict[str, Any]) -> Any:
+        """把工具调用参数校验为输入模型实例
         
-        # 服务器将持续运行，直到收到停止信号
-        # 客户端可以通过MCP协议调用注册的工具
+        整个参数字典一次交给模型预编译的校验器（pydantic-core），
+        嵌套的窗口列表不再逐个在Python中构造模型；参数不合法时抛出ValidationError。
+        """
+        if self.prepare is not None:
+            arguments = self.prepare(arguments)
+        with tracing.span("validate_arguments"):
+            return self.model.model_validate(arguments)
     
-    ## 配置依赖：
-    - APIConfig: API端点和超时配置
-    - SecurityConfig: SSL和认证配置  
-    - LogConfig: 日志级别和格式配置
+    async def call(self, arguments: Dict[str, Any]) -> list[TextContent]:
+        """校验参数、执行处理函数并封装为TextContent"""
+        if self.endpoint is not None:
+            tracing.set_attributes(**{"layout_driver.endpoint": self.endpoint})
+        result = await self.handler(self.parse(arguments))
+        text = result if isinstance(result, str) else format_tool_result(result)
+        return [TextContent(type="text", text=text)]
+
+# 工具分发表：工具名 -> ToolSpec（list_tools按此顺序返回工具）
+TOOL_SPECS: Dict[str, ToolSpec] = {
+    # 窗口发现工具：获取桌面窗口列表
+    # 参数：force_refresh（可选，跳过快照缓存）、include_icons（可选，返回图标数据）
+    DriverTools.GET_WINDOW_LIST: ToolSpec(
+        "获取当前桌面已打开窗口列表 - Get list of currently open windows on desktop via API",
+        GetWindowList,
+        lambda request: get_window_list(
+            force_refresh=request.force_refresh,
+            include_icons=request.include_icons,
+        ),
+        endpoint="WINDOWS_LIST",
+    ),
+    # 窗口关闭工具：永久关闭指定窗口（危险操作，不可逆）
+    DriverTools.CLOSE_WINDOWS_BATCH: ToolSpec(
+        "批量关闭窗口 - Batch close multiple windows in a single request",
+        CloseWindowRequest,
+        lambda request: close_windows_batch(windows=request.windows),
+        endpoint="WINDOWS_CLOSE_BATCH",
+        prepare=_windows_arguments,
+    ),
+    # 窗口最小化工具：隐藏窗口但保持进程运行
+    DriverTools.MINIMIZE_WINDOWS_BATCH: ToolSpec(
+        "批量最小化窗口 - Batch minimize multiple windows in a single request",
+        MinimizeWindowRequest,
+        lambda request: minimize_windows_batch(windows=request.windows),
+        endpoint="WINDOWS_MINIMIZE_BATCH",
+        prepare=_windows_arguments,
+    ),
+    # 窗口最大化工具：全屏显示窗口
+    DriverTools.MAXIMIZE_WINDOWS_BATCH: ToolSpec(
+        "批量最大化窗口 - Batch maximize multiple windows in a single request",
+        MaximizeWindowRequest,
+        lambda request: maximize_windows_batch(windows=request.windows),
+        endpoint="WINDOWS_MAXIMIZE_BATCH",
+        prepare=_windows_arguments,
+    ),
+    # 窗口还原工具：恢复窗口到正常状态
+    DriverTools.RESTORE_WINDOWS_BATCH: ToolSpec(
+        "批量还原窗口 - Batch restore multiple windows to normal state in a single request",
+        RestoreWindowRequest,
+        lambda request: restore_windows_batch(windows=request.windows),
+        endpoint="WINDOWS_RESTORE_BATCH",
+        prepare=_windows_arguments,
+    ),
+    # 透明度设置工具：每个窗口可以设置不同的透明度（0完全透明 - 255完全不透明）
+    DriverTools.SET_WINDOW_OPACITY_BATCH: ToolSpec(
+        "批量设置窗口透明度 - Batch set window opacity/transparency for multiple windows",
+        SetWindowOpacityRequest,
+        lambda request: set_window_opacity_batch(windows=request.windows),
+        endpoint="WINDOWS_OPACITY_BATCH",
+        prepare=_opacity_arguments,
+    ),
+    # 窗口增量工具：只返回自since_version以来新增、移除和变化的窗口
+    DriverTools.GET_WINDOW_CHANGES: ToolSpec(
+        "获取窗口列表增量变化 - Get windows added, removed or changed since a version token",
+        GetWindowChangesRequest,
+        lambda request: get_window_changes(
+            since_version=request.since_version,
+            force_refresh=request.force_refresh,
+        ),
+        endpoint="WINDOWS_LIST",
+    ),
+    # 窗口图标工具：按需获取图标数据，按内容哈希去重
+    DriverTools.GET_WINDOW_ICONS: ToolSpec(
+        "获取窗口图标 - Get window icons by handle, deduplicated by content hash",
+        GetWindowIconsRequest,
+        lambda request: get_window_icons(
+            handles=request.handles,
+            known_hashes=request.known_hashes,
+        ),
+        endpoint="WINDOWS_LIST",
+    ),
+    # 窗口查找工具：按标题、别名、区域和尺寸查询内存窗口索引
+    DriverTools.FIND_WINDOWS: ToolSpec(
+        "按条件查找窗口 - Find windows by title, alias, screen region or size using an in-memory index",
+        FindWindowsRequest,
+        find_windows,
+        endpoint="WINDOWS_LIST",
+    ),
+    # 混合操作工具：按端点合并为批量请求，同一窗口的操作保持提交顺序
+    DriverTools.EXECUTE_OPERATIONS: ToolSpec(
+        "批量执行异构窗口操作 - Execute mixed window operations, grouped per endpoint and run concurrently",
+        ExecuteOperationsRequest,
+        lambda request: execute_operations(request.operations),
+    ),
+    # 声明式布局工具：计算目标布局与当前状态的差异，只执行必要的批量操作
+    DriverTools.APPLY_LAYOUT: ToolSpec(
+        "声明式应用窗口布局 - Apply a desired window layout with a minimal diff-based action plan",
+        ApplyLayoutRequest,
+        lambda request: apply_layout(
+            targets=request.windows,
+            dry_run=request.dry_run,
+            force_refresh=request.force_refresh,
+        ),
+    ),
+    # 运行指标工具：直接返回Prometheus文本格式，不经过JSON序列化
+    DriverTools.GET_METRICS: ToolSpec(
+        "获取运行指标 - Get latency/throughput metrics in Prometheus text format",
+        GetMetrics,
+        _get_metrics_text,
+    ),
+    # 撤销工具：按窗口状态存储中的操作历史恢复之前的窗口状态
+    DriverTools.RESTORE_PREVIOUS_LAYOUT: ToolSpec(
+        "撤销最近的窗口操作 - Restore the window layout from before the most recent window operations",
+        RestorePreviousLayoutRequest,
+        lambda request: restore_previous_layout(steps=request.steps, dry_run=request.dry_run),
+    ),
+}
+
+async def dispatch_tool(name: str, arguments: Dict[str, Any]) -> list[TextContent]:
+    """按工具名查分发表执行工具调用（未知工具抛出ValueError）
     
-    ## 注意事项：
-    1. 该函数是异步函数，需要在异步上下文中运行
-    2. 服务器会持续运行直到进程终止
-    3. 所有的窗口操作都需要后端API服务正常运行
-    4. 建议在生产环境中配置适当的错误监控
-    5. 服务器使用stdio通信，适合与MCP客户端集成
+    启用窗口状态存储时，一次工具调用中的全部窗口操作记为一条操作历史。
+    """
+    spec = TOOL_SPECS.get(name)
+    if spec is None:
+        raise ValueError(f"Unknown tool: {name}")
+    with state_store.recording(name):
+        return await spec.call(arguments or {})
+
+class LayoutDriverServer(Server):
+    """声明资源订阅能力的MCP服务器
+    
+    mcp的Server在注册了资源处理器时固定声明subscribe=False，
+    这里在注册了订阅处理器时改为声明subscribe=True。
+    """
+    
+    def get_capabilities(self, notification_options, experimental_capabilities) -> ServerCapabilities:
+        capabilities = super().get_capabilities(notification_options, experimental_capabilities)
+        if capabilities.resources is not None and types.SubscribeRequest in self.request_handlers:
+            capabilities.resources.subscribe = True
+        return capabilities
+
+def build_tool_definitions(schemas: Optional[Dict[str, Any]] = None) -> List[Tool]:
+    """按工具分发表生成全部工具的Tool定义
+    
+    入参：
+        schemas: 工具名到inputSchema的映射（通常来自tool_schemas.json），
+            其中没有的工具调用model_json_schema()生成
+    """
+    schemas = schemas or {}
+    return [
+        Tool(
+            name=name,
+            description=spec.description,
+            inputSchema=schemas.get(name) or spec.model.model_json_schema(),
+        )
+        for name, spec in TOOL_SPECS.items()
+    ]
+
+
+# 工具定义缓存（第一次调用tool_definitions时生成）
+_tool_definitions: Optional[List[Tool]] = None
+
+
+def tool_definitions() -> List[Tool]:
+    """返回全部工具的Tool定义
+    
+    每个stdio客户端会话都会启动新的驱动进程并调用一次list_tools，而为全部工具调用
+    model_json_schema()约需20ms。因此优先使用随包发布的tool_schemas.json（见schemas模块），
+    其指纹与当前模型不一致时才在运行时生成；生成结果在进程内缓存。
+    """
+    global _tool_definitions
+    if _tool_definitions is None:
+        _tool_definitions = build_tool_definitions(load_tool_schemas())
+    return list(_tool_definitions)
+
+
+def create_server() -> LayoutDriverServer:
+    """创建注册了全部工具和资源处理器的MCP服务器（不启动传输）
+    
+    serve()通过它创建服务器后再选择传输方式运行；基准测试等场景可以配合mcp的内存传输
+    （mcp.shared.memory）在进程内驱动同一个工具分发器。
+    
+    出参：
+        LayoutDriverServer: 已注册list_tools / call_tool及窗口资源处理器的服务器
     """
     # 步骤1: 初始化日志记录器
     # 为当前模块创建专用的日志记录器，用于记录服务器运行状态
     logger = logging.getLogger(__name__)
     
+    # 按TracingConfig初始化链路追踪，需在注册工具处理函数之前完成
+    tracing.configure()
+    
     # 步骤2: 创建MCP服务器实例
     # 使用"layout_driver"作为服务器标识符，这个名称会在MCP协议中使用
-    server = Server("layout_driver")
+    server = LayoutDriverServer("layout_driver")
 
     @server.list_tools()
     async def list_tools() -> list[Tool]:
@@ -995,9 +2396,40 @@ async def serve() -> None:
         ### 🔍 窗口发现类工具：
         - **get_window_list**: 获取当前桌面已打开窗口列表
           - 用途：让AI模型了解当前桌面状态
-          - 无需输入参数
+          - 可选参数force_refresh跳过快照缓存
           - 返回完整的窗口信息列表
         
+        - **get_window_changes**: 获取窗口列表增量变化
+          - 用途：只获取自某个版本以来新增、移除和变化的窗口
+          - 可选参数since_version、force_refresh
+        
+        - **get_window_icons**: 获取窗口图标
+          - 用途：按需获取get_window_list中省略的图标数据
+          - 图标按内容哈希去重，可通过known_hashes跳过已持有的图标
+        
+        - **find_windows**: 按条件查找窗口
+          - 用途：窗口很多时只获取匹配的窗口，而不是扫描完整列表
+          - 支持标题子串/前缀/正则、别名、区域重叠和尺寸范围
+        
+        ### 🧩 声明式布局工具：
+        - **apply_layout**: 声明式应用窗口布局
+          - 用途：描述期望的窗口状态，由驱动计算并执行最少的操作
+          - 支持按handle、alias、title_pattern选择窗口，dry_run只返回计划
+        
+        - **execute_operations**: 批量执行异构窗口操作
+          - 用途：一次提交最小化、最大化、还原、关闭和透明度等混合操作
+          - 按端点合并为批量请求并发执行，返回每个操作的结果和总耗时
+        
+        ### 📈 运行指标工具：
+        - **get_metrics**: 获取运行指标
+          - 用途：定位工具调用、后端请求和序列化的耗时分布（含尾延迟）
+          - 返回Prometheus文本格式，而不是JSON
+        
+        ### ↩️ 撤销工具：
+        - **restore_previous_layout**: 撤销最近的窗口操作
+          - 用途：恢复最近一次（或steps次）最小化、最大化、还原、透明度操作之前的窗口状态
+          - 需要启用窗口状态存储（LAYOUT_DRIVER_STATE_DB），已关闭的窗口无法恢复
+        
         ### 🎯 窗口状态控制类工具：
         - **close_windows_batch**: 批量关闭窗口
           - 用途：永久关闭不需要的窗口，释放系统资源
@@ -1023,12 +2455,14 @@ async def serve() -> None:
         
         ## 输入模式验证：
         每个工具都使用对应的Pydantic模型进行输入验证：
-        - GetWindowList: 无参数模型
-        - CloseWindowRequest: 单窗口操作模型
-        - MinimizeWindowRequest: 单窗口操作模型
-        - MaximizeWindowRequest: 单窗口操作模型
-        - RestoreWindowRequest: 单窗口操作模型
+        - GetWindowList: 仅含可选force_refresh参数的模型
+        - CloseWindowRequest: 多窗口操作模型
+        - MinimizeWindowRequest: 多窗口操作模型
+        - MaximizeWindowRequest: 多窗口操作模型
+        - RestoreWindowRequest: 多窗口操作模型
         - SetWindowOpacityRequest: 多窗口操作模型（支持批量不同透明度）
+        - GetWindowChangesRequest: 增量查询模型（可选since_version）
+        - GetWindowIconsRequest: 图标查询模型（句柄列表）
         
         ## 入参：
             无参数 - 该函数不接受任何参数（由MCP框架自动调用）
@@ -1049,7 +2483,8 @@ async def serve() -> None:
         ```
         
         ## 注意事项：
-        1. 工具列表是静态的，服务器启动后不会改变
+        1. 工具列表是静态的，服务器启动后不会改变，Tool对象只生成一次，
+           inputSchema优先从随包发布的tool_schemas.json加载（见tool_definitions）
         2. 每个工具的inputSchema都是自动生成的JSON Schema
         3. 工具描述支持中英文，便于不同语言的AI模型理解
         4. 工具名称必须与DriverTools枚举保持一致
@@ -1067,46 +2502,12 @@ async def serve() -> None:
         ]
         ```
         """
-        return [
-            # 窗口发现工具：获取桌面窗口列表
-            Tool(
-                name=DriverTools.GET_WINDOW_LIST,
-                description="获取当前桌面已打开窗口列表 - Get list of currently open windows on desktop via API",
-                inputSchema=GetWindowList.model_json_schema(),
-            ),
-            # 窗口关闭工具：永久关闭指定窗口（危险操作）
-            Tool(
-                name=DriverTools.CLOSE_WINDOWS_BATCH,
-                description="批量关闭窗口 - Batch close windows by providing window details",
-                inputSchema=CloseWindowRequest.model_json_schema(),
-            ),
-            # 窗口最小化工具：隐藏窗口但保持进程运行
-            Tool(
-                name=DriverTools.MINIMIZE_WINDOWS_BATCH,
-                description="批量最小化窗口 - Batch minimize windows by providing window details",
-                inputSchema=MinimizeWindowRequest.model_json_schema(),
-            ),
-            # 窗口最大化工具：全屏显示窗口
-            Tool(
-                name=DriverTools.MAXIMIZE_WINDOWS_BATCH,
-                description="批量最大化窗口 - Batch maximize windows by providing window details",
-                inputSchema=MaximizeWindowRequest.model_json_schema(),
-            ),
-            # 窗口还原工具：恢复窗口到正常状态
-            Tool(
-                name=DriverTools.RESTORE_WINDOWS_BATCH,
-                description="批量还原窗口 - Batch restore windows to normal state by providing window details",
-                inputSchema=RestoreWindowRequest.model_json_schema(),
-            ),
-            # 透明度设置工具：调整窗口视觉效果
-            Tool(
-                name=DriverTools.SET_WINDOW_OPACITY_BATCH,
-                description="批量设置窗口透明度 - Batch set window opacity/transparency for multiple windows",
-                inputSchema=SetWindowOpacityRequest.model_json_schema(),
-            ),
-        ]
+        # 工具列表是静态的，Tool对象只在第一次调用时生成
+        return tool_definitions()
 
     @server.call_tool()
+    @tracing.instrument_tool
+    @metrics.instrument_tool
     async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         """工具执行端点 - 处理MCP客户端的工具调用请求
         
@@ -1114,51 +2515,51 @@ async def serve() -> None:
         该函数接收客户端的工具调用请求，进行参数验证，调用后端API，并返回操作结果。
         
         ## 业务逻辑流程：
-        1. **路由分发**：根据工具名称（name）路由到相应的处理分支
-        2. **参数提取**：从arguments字典中提取和验证输入参数
-        3. **类型转换**：将字典参数转换为相应的数据模型（如WindowInfo）
-        4. **API调用**：调用相应的后端函数执行实际的窗口操作
+        1. **路由分发**：按工具名称（name）查工具分发表TOOL_SPECS，O(1)定位到ToolSpec
+        2. **参数转换**：需要兼容旧参数格式的工具先由ToolSpec.prepare转换参数
+        3. **参数校验**：整个参数字典一次交给输入模型的预编译校验器，得到模型实例
+        4. **API调用**：处理函数以模型实例调用相应的后端函数执行实际的窗口操作
         5. **结果封装**：将API返回结果封装为MCP标准的TextContent格式
-        6. **错误处理**：捕获和处理未知工具名称的异常
+        6. **错误处理**：未知工具名称抛出ValueError
         
         ## 参数处理策略：
         
         ### 🔍 简单参数工具（get_window_list）：
-        - 无需参数处理
-        - 直接调用get_window_list()函数
+        - 可选参数force_refresh，为True时跳过快照缓存
+        - 可选参数include_icons，为True时返回图标数据（默认只返回icon_hash）
         
-        ### 🎯 单窗口操作工具（close/minimize/maximize/restore）：
-        - 从arguments中提取窗口基础信息：
+        ### 🎯 多窗口状态操作工具（close/minimize/maximize/restore）：
+        - arguments["windows"]中的每个项目校验为WindowInfo对象：
           - handle (int): 窗口句柄 [必需]
           - title (str): 窗口标题 [必需]
           - width (int): 窗口宽度 [必需]
           - height (int): 窗口高度 [必需]
           - x (int): 窗口X坐标 [必需]
           - y (int): 窗口Y坐标 [必需]
-          - icon (str): 窗口图标 [可选，使用.get()]
-          - alias (str): 窗口别名 [可选，使用.get()]
+          - icon (str): 窗口图标 [可选]
+          - alias (str): 窗口别名 [可选]
+        - 兼容旧版直接传入单个窗口字段的参数格式
+        - 所有窗口在一次后端请求中发送
         
         ### 🎨 多窗口操作工具（set_window_opacity_batch）：
-        - 处理复杂的嵌套数据结构
-        - 将arguments["windows"]中的每个项目转换为WindowOpacityItem对象
-        - 每个项目包含window对象和opacity值
-        - 使用列表推导式进行批量转换
+        - arguments["windows"]中的每个项目校验为WindowOpacityItem对象
+        - 每个项目可以是{"window": {...}, "opacity": 128}，也可以把窗口字段与opacity平铺在一起
         
         ## 错误处理机制：
-        1. **参数缺失**：如果必需参数缺失，会引发KeyError
-        2. **类型错误**：如果参数类型不匹配，会引发TypeError或ValueError
-        3. **未知工具**：如果工具名称不在支持列表中，抛出ValueError
-        4. **API错误**：后端API调用失败的错误会通过JSON响应返回
+        1. **参数缺失或类型错误**：模型校验失败，引发pydantic的ValidationError
+        2. **未知工具**：如果工具名称不在分发表中，抛出ValueError
+        3. **API错误**：后端API调用失败的错误会通过JSON响应返回
         
         ## 返回值格式：
-        所有工具调用都返回统一的JSON格式响应，包装在TextContent中：
+        所有工具调用都返回统一的JSON格式响应，包装在TextContent中。
+        字段由ResponseConfig.MODE决定（见serialization.format_tool_result）：
+        - compact（默认）：不缩进，只保留success、content、error及window_results、version
+        - standard：不缩进，保留除headers外的全部字段
+        - debug：缩进2格，保留完整结果
         ```json
         {
           "success": true/false,
-          "status_code": 200,
           "content": {...},
-          "headers": {...},
-          "url": "http://...",
           "error": "错误信息"  // 仅在失败时存在
         }
         ```
@@ -1171,22 +2572,32 @@ async def serve() -> None:
                 - "maximize_windows_batch": 批量最大化窗口
                 - "restore_windows_batch": 批量还原窗口
                 - "set_window_opacity_batch": 批量设置窗口透明度
+                - "get_window_changes": 获取窗口列表增量变化
+                - "get_window_icons": 获取窗口图标
+                - "apply_layout": 声明式应用窗口布局
+                - "find_windows": 按条件查找窗口
+                - "execute_operations": 批量执行异构窗口操作
+                - "restore_previous_layout": 撤销最近的窗口操作
                 
             arguments (dict): 工具调用参数，格式根据工具类型而异：
                 
                 ## get_window_list参数：
-                {} (空字典，无需参数)
+                {} 或 {"force_refresh": true, "include_icons": false}
                 
-                ## 单窗口操作参数（close/minimize/maximize/restore）：
+                ## 多窗口状态操作参数（close/minimize/maximize/restore）：
                 {
-                    "handle": 12345,              # 窗口句柄（整数）
-                    "title": "窗口标题",           # 窗口标题（字符串）
-                    "width": 1200,               # 窗口宽度（整数）
-                    "height": 800,               # 窗口高度（整数）
-                    "x": 100,                    # 窗口X坐标（整数）
-                    "y": 100,                    # 窗口Y坐标（整数）
-                    "icon": "base64...",         # 窗口图标（可选字符串）
-                    "alias": "别名"              # 窗口别名（可选字符串）
+                    "windows": [                 # 窗口列表
+                        {
+                            "handle": 12345,      # 窗口句柄（整数）
+                            "title": "窗口标题",   # 窗口标题（字符串）
+                            "width": 1200,       # 窗口宽度（整数）
+                            "height": 800,       # 窗口高度（整数）
+                            "x": 100,            # 窗口X坐标（整数）
+                            "y": 100,            # 窗口Y坐标（整数）
+                            "icon": "base64...", # 窗口图标（可选字符串）
+                            "alias": "别名"      # 窗口别名（可选字符串）
+                        }
+                    ]
                 }
                 
                 ## 多窗口透明度设置参数：
@@ -1211,13 +2622,14 @@ async def serve() -> None:
             - type: "text" (固定值)
             - text: JSON格式的操作结果字符串
             
-            JSON内容结构：
+            JSON内容结构（status_code、headers、url等仅在standard/debug模式下返回）：
             - success (bool): 操作是否成功
             - status_code (int): HTTP状态码
             - content (any): API返回的具体内容
-            - headers (dict): HTTP响应头（成功时）
+            - headers (dict): HTTP响应头（成功时，仅debug模式）
             - url (str): 请求的API地址
             - error (str): 错误信息（失败时）
+            - window_results (list): 每个窗口的操作结果（批量操作工具）
         
         ## 工具执行示例：
         
@@ -1233,15 +2645,13 @@ async def serve() -> None:
         ```python
         name = "close_windows_batch"
         arguments = {
-            "handle": 12345,
-            "title": "Chrome",
-            "width": 1200,
-            "height": 800,
-            "x": 100,
-            "y": 100
+            "windows": [
+                {"handle": 12345, "title": "Chrome", "width": 1200, "height": 800, "x": 100, "y": 100},
+                {"handle": 67890, "title": "记事本", "width": 600, "height": 400, "x": 200, "y": 200}
+            ]
         }
         result = await call_tool(name, arguments)
-        # 关闭指定窗口
+        # 在一次请求中关闭两个窗口
         ```
         
         ### 设置透明度：
@@ -1268,149 +2678,254 @@ async def serve() -> None:
         
         ## 注意事项：
         1. 该函数是异步函数，所有操作都是非阻塞的
-        2. 参数验证依赖于Pydantic模型的隐式验证
+        2. 参数由各工具的输入模型校验，新增工具只需在TOOL_SPECS中增加一项
         3. 所有API调用错误都会被捕获并返回给客户端
-        4. 返回的JSON字符串使用ensure_ascii=False支持中文
+        4. 返回的JSON字符串保留中文字符，安装orjson时使用orjson加速序列化
         5. 透明度设置工具的参数结构比其他工具更复杂
         6. 未知工具名称会抛出ValueError异常
         """
-        # 工具路由：根据工具名称分发到相应的处理逻辑
-        if name == DriverTools.GET_WINDOW_LIST:
-            # 🔍 窗口发现工具：获取所有打开窗口的列表
-            # 业务逻辑：调用后端API获取当前桌面所有窗口信息
-            # 参数：无需参数
-            # 返回：窗口信息列表，包含句柄、标题、尺寸、位置等
-            result = await get_window_list()
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-            
-        elif name == DriverTools.CLOSE_WINDOWS_BATCH:
-            # 🎯 窗口关闭工具：永久关闭指定窗口（危险操作）
-            # 业务逻辑：向后端API发送关闭请求，窗口将被永久关闭
-            # 参数：完整的窗口信息（用于精确匹配）
-            # 风险：不可逆操作，窗口关闭后无法恢复
-            result = await close_windows_batch(
-                handle=arguments["handle"],          # 窗口唯一标识符
-                title=arguments["title"],            # 窗口标题（用于验证）
-                width=arguments["width"],            # 窗口宽度（用于验证）
-                height=arguments["height"],          # 窗口高度（用于验证）
-                x=arguments["x"],                    # 窗口X坐标（用于验证）
-                y=arguments["y"],                    # 窗口Y坐标（用于验证）
-                icon=arguments.get("icon"),          # 窗口图标（可选）
-                alias=arguments.get("alias")         # 窗口别名（可选）
-            )
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-            
-        elif name == DriverTools.MINIMIZE_WINDOWS_BATCH:
-            # 🎯 窗口最小化工具：隐藏窗口但保持进程运行（安全操作）
-            # 业务逻辑：将窗口最小化到任务栏，进程继续运行
-            # 参数：完整的窗口信息
-            # 特点：可恢复操作，窗口可以重新显示
-            result = await minimize_windows_batch(
-                handle=arguments["handle"],
-                title=arguments["title"],
-                width=arguments["width"],
-                height=arguments["height"],
-                x=arguments["x"],
-                y=arguments["y"],
-                icon=arguments.get("icon"),
-                alias=arguments.get("alias")
-            )
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-            
-        elif name == DriverTools.MAXIMIZE_WINDOWS_BATCH:
-            # 🎯 窗口最大化工具：全屏显示窗口（安全操作）
-            # 业务逻辑：将窗口扩展到最大尺寸，通常占满整个屏幕
-            # 参数：完整的窗口信息
-            # 用途：提高工作效率，适合需要大屏幕空间的应用
-            result = await maximize_windows_batch(
-                handle=arguments["handle"],
-                title=arguments["title"],
-                width=arguments["width"],
-                height=arguments["height"],
-                x=arguments["x"],
-                y=arguments["y"],
-                icon=arguments.get("icon"),
-                alias=arguments.get("alias")
-            )
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-            
-        elif name == DriverTools.RESTORE_WINDOWS_BATCH:
-            # 🎯 窗口还原工具：恢复窗口到正常状态（恢复操作）
-            # 业务逻辑：将最小化或最大化的窗口恢复到原始状态
-            # 参数：完整的窗口信息
-            # 用途：撤销之前的最小化或最大化操作
-            result = await restore_windows_batch(
-                handle=arguments["handle"],
-                title=arguments["title"],
-                width=arguments["width"],
-                height=arguments["height"],
-                x=arguments["x"],
-                y=arguments["y"],
-                icon=arguments.get("icon"),
-                alias=arguments.get("alias")
-            )
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-            
-        elif name == DriverTools.SET_WINDOW_OPACITY_BATCH:
-            # 🎨 窗口透明度工具：批量设置窗口视觉效果（视觉操作）
-            # 业务逻辑：调整一个或多个窗口的透明度，创建视觉效果
-            # 参数：包含窗口信息和透明度值的复杂数据结构
-            # 特点：支持为不同窗口设置不同的透明度值
-            # 透明度范围：0（完全透明）到255（完全不透明）
-            result = await set_window_opacity_batch(
-                windows=[
-                    # 使用列表推导式将字典参数转换为WindowOpacityItem对象
-                    WindowOpacityItem(
-                        window=WindowInfo(
-                            handle=item["handle"],       # 窗口句柄
-                            title=item["title"],         # 窗口标题
-                            width=item["width"],         # 窗口宽度
-                            height=item["height"],       # 窗口高度
-                            x=item["x"],                 # 窗口X坐标
-                            y=item["y"],                 # 窗口Y坐标
-                            icon=item["icon"],           # 窗口图标
-                            alias=item["alias"]          # 窗口别名
-                        ),
-                        opacity=item["opacity"]          # 透明度值（0-255）
-                    )
-                    for item in arguments["windows"]     # 遍历所有窗口参数
-                ]
-            )
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-            
-        else:
-            # ❌ 错误处理：未知的工具名称
-            # 如果客户端请求了不存在的工具，抛出异常
-            # 这通常表示客户端和服务器版本不匹配或存在编程错误
-            raise ValueError(f"Unknown tool: {name}")
+        # 工具路由：按工具名查分发表，校验参数后调用相应的处理函数
+        return await dispatch_tool(name, arguments)
 
-    # 步骤3: 创建服务器初始化选项
-    # 生成MCP服务器的配置选项，包括协议版本、功能支持等
-    options = server.create_initialization_options()
+    @server.list_resources()
+    async def list_resources() -> list[Resource]:
+        """资源发现端点 - 提供完整窗口列表资源"""
+        return [
+            Resource(
+                uri=AnyUrl(WINDOWS_LIST_URI),
+                name="windows",
+                description="当前桌面已打开窗口列表（不含图标数据） - Currently open windows",
+                mimeType="application/json",
+            ),
+        ]
+
+    @server.list_resource_templates()
+    async def list_resource_templates() -> list[ResourceTemplate]:
+        """资源模板端点 - 按窗口句柄访问单个窗口"""
+        return [
+            ResourceTemplate(
+                uriTemplate=WINDOW_URI_TEMPLATE,
+                name="window",
+                description="按句柄获取单个窗口 - A single window by handle",
+                mimeType="application/json",
+            ),
+        ]
+
+    @server.read_resource()
+    async def read_resource(uri: AnyUrl) -> list[ReadResourceContents]:
+        """资源读取端点 - 基于窗口列表快照缓存返回windows://list或windows://{handle}"""
+        # 使用McpError返回协议错误，避免raise_exceptions模式下异常导致服务器退出
+        result = await _get_window_table()
+        if not result["success"] or not isinstance(result["content"], WindowTable):
+            raise McpError(types.ErrorData(
+                code=types.INTERNAL_ERROR,
+                message=result.get("error") or "获取窗口列表失败",
+            ))
+        content = render_resource(str(uri), result["content"])
+        if content is None:
+            # -32002为MCP约定的资源不存在错误码
+            raise McpError(types.ErrorData(code=-32002, message=f"未知的资源或窗口不存在: {uri}"))
+        return [ReadResourceContents(content=content, mime_type="application/json")]
+
+    @server.subscribe_resource()
+    async def subscribe_resource(uri: AnyUrl) -> None:
+        """资源订阅端点 - 资源内容变化时向当前会话发送notifications/resources/updated"""
+        cached = window_list_cache.peek()
+        resource_notifier.subscribe(
+            server.request_context.session,
+            str(uri),
+            cached["content"] if cached is not None else None,
+        )
+
+    @server.unsubscribe_resource()
+    async def unsubscribe_resource(uri: AnyUrl) -> None:
+        """取消资源订阅端点"""
+        resource_notifier.unsubscribe(server.request_context.session, str(uri))
+
+    return server
+
+
+async def serve(transport: Optional[str] = None, host: Optional[str] = None,
+                port: Optional[int] = None, max_concurrency: Optional[int] = None) -> None:
+    """MCP Layout Driver服务器主函数
+    
+    这是整个MCP Layout Driver系统的入口函数，负责启动和运行MCP服务器。
+    该函数创建了一个完整的MCP服务器实例，注册所有可用的工具，并处理客户端的请求。
+    
+    ## 功能概述：
+    该函数实现了一个基于MCP（Model Context Protocol）的窗口管理服务器，提供以下核心功能：
+    1. 窗口发现：获取当前桌面所有打开的窗口列表
+    2. 窗口操作：批量关闭、最小化、最大化、还原窗口
+    3. 视觉效果：批量设置窗口透明度
+    4. API集成：所有操作都通过后端API实现真实的窗口管理
+    
+    ## 业务逻辑流程：
+    1. **服务器初始化**：
+       - 创建名为"layout_driver"的MCP服务器实例
+       - 配置日志系统
+       - 设置服务器基础参数
+    
+    2. **工具注册阶段**：
+       - 通过@server.list_tools()装饰器注册工具发现端点
+       - 为每个窗口管理功能创建Tool对象
+       - 定义工具的名称、描述和输入模式
+    
+    3. **请求处理阶段**：
+       - 通过@server.call_tool()装饰器注册工具调用端点
+       - 根据工具名称路由到相应的处理函数
+       - 参数验证和类型转换
+       - 调用后端API执行实际操作
+    
+    4. **通信管理**：
+       - 建立stdio通信通道（标准输入/输出），或以Streamable HTTP / SSE方式监听端口
+       - 处理MCP协议消息
+       - 管理客户端连接生命周期
+    
+    ## 服务器架构：
+    ```
+    MCP客户端 <---> MCP协议 <---> Layout Driver Server <---> 后端API <---> 系统窗口管理
+         ^                           ^                       ^                    ^
+         |                           |                       |                    |
+      AI模型                    本函数serve()            HTTP请求             实际窗口操作
+    ```
+    
+    ## 注册的工具列表：
+    1. **get_window_list**: 获取桌面窗口列表
+       - 端点：GET /windows
+       - 返回：所有打开窗口的详细信息
+    
+    2. **close_windows_batch**: 批量关闭窗口
+       - 端点：POST /windows/close
+       - 功能：永久关闭指定窗口
+    
+    3. **minimize_windows_batch**: 批量最小化窗口
+       - 端点：POST /windows/minimize
+       - 功能：隐藏窗口但保持进程运行
+    
+    4. **maximize_windows_batch**: 批量最大化窗口
+       - 端点：POST /windows/maximize
+       - 功能：全屏显示窗口
+    
+    5. **restore_windows_batch**: 批量还原窗口
+       - 端点：POST /windows/restore
+       - 功能：恢复窗口到正常状态
+    
+    6. **set_window_opacity_batch**: 批量设置窗口透明度
+       - 端点：POST /windows/opacity
+       - 功能：调整窗口的透明度效果
+    
+    7. **get_window_changes**: 获取窗口列表增量变化
+       - 端点：GET /windows（条件请求）
+       - 功能：只返回自指定版本以来的窗口变化
+    
+    8. **get_window_icons**: 获取窗口图标
+       - 端点：GET /windows（仅在图标缓存未命中时）
+       - 功能：按需返回图标数据，按内容哈希去重
+    
+    9. **apply_layout**: 声明式应用窗口布局
+       - 端点：GET /windows 以及所需的批量操作端点
+       - 功能：只对未处于目标状态的窗口执行最少的批量操作
+    
+    10. **find_windows**: 按条件查找窗口
+        - 端点：GET /windows（快照缓存未命中时）
+        - 功能：按标题、别名、区域和尺寸查询内存窗口索引，只返回匹配的窗口
+    
+    11. **execute_operations**: 批量执行异构窗口操作
+        - 端点：操作涉及的批量操作端点
+        - 功能：按端点合并为批量请求并发执行，同一窗口的操作保持提交顺序
+    
+    12. **get_metrics**: 获取运行指标
+        - 端点：无（读取进程内指标）
+        - 功能：以Prometheus文本格式返回工具、后端端点和序列化的耗时分布等指标；
+          HTTP / SSE 模式下同样的内容也可通过GET /metrics抓取
+    
+    13. **restore_previous_layout**: 撤销最近的窗口操作
+        - 端点：GET /windows 以及恢复所需的批量操作端点
+        - 功能：按窗口状态存储中的操作历史恢复操作前的窗口状态
+    
+    ## 提供的资源：
+    - **windows://list**: 完整窗口列表（不含图标数据）
+    - **windows://{handle}**: 单个窗口
+    两者都基于窗口列表快照缓存，支持resources/subscribe，
+    内容确实变化时才向订阅者发送notifications/resources/updated
+    
+    ## 错误处理机制：
+    - 所有工具调用都有完整的异常处理
+    - 网络错误和API错误会被优雅处理
+    - 错误信息会以JSON格式返回给客户端
+    - 支持详细的调试日志（如果启用verbose模式）
+    
+    ## 入参：
+        transport (str, optional): 传输方式，stdio / http / sse，默认ServerConfig.TRANSPORT
+        host (str, optional): HTTP / SSE 模式的监听地址，默认ServerConfig.HOST
+        port (int, optional): HTTP / SSE 模式的监听端口，默认ServerConfig.PORT
+        max_concurrency (int, optional): HTTP / SSE 模式下同时处理的最大连接/请求数，
+            默认ServerConfig.MAX_CONCURRENCY，0表示不限制
+    
+    ## 出参：
+        无返回值 (None) - 该函数运行直到服务器关闭
+        
+    ## 异常处理：
+        - 如果服务器启动失败，会抛出相应异常
+        - 如果通信通道建立失败，会抛出异常
+        - 运行时异常会被记录但不会导致服务器崩溃
+    
+    ## 使用示例：
+        >>> # 启动MCP服务器
+        >>> await serve()
+        
+        # 服务器将持续运行，直到收到停止信号
+        # 客户端可以通过MCP协议调用注册的工具
+    
+    ## 配置依赖：
+    - APIConfig: API端点和超时配置
+    - SecurityConfig: SSL和认证配置  
+    - HTTPClientConfig: 共享连接池配置
+    - WireConfig: 传输编码（压缩、MessagePack）配置
+    - ServerConfig: 传输方式、监听地址和并发配置
+    - BatchConfig: 批量请求分片配置
+    - StateStoreConfig: 窗口状态存储（热启动与撤销历史）配置
+    - MetricsConfig: 运行指标开关
+    - TracingConfig: 链路追踪导出方式
+    - LogConfig: 日志级别和格式配置
+    
+    ## 注意事项：
+    1. 该函数是异步函数，需要在异步上下文中运行
+    2. 服务器会持续运行直到进程终止
+    3. 所有的窗口操作都需要后端API服务正常运行
+    4. 建议在生产环境中配置适当的错误监控
+    5. 默认使用stdio通信；http模式在/mcp提供Streamable HTTP端点，
+       sse模式在/sse和/messages/提供SSE端点，多个客户端共享同一进程的连接池和缓存
+    """
+    # 步骤1-2: 创建注册了全部工具和资源处理器的MCP服务器
+    server = create_server()
+    
+    # 步骤3: 确定传输方式
+    # 未指定的参数使用ServerConfig中的配置
+    transport = (transport or ServerConfig.TRANSPORT).lower()
+    if transport not in TRANSPORTS:
+        raise ValueError(f"不支持的传输方式: {transport}")
     
     # 步骤4: 启动MCP服务器并建立通信通道
-    # 使用stdio（标准输入/输出）作为通信方式，这是MCP协议的标准方式
-    # 这种方式允许服务器与任何支持MCP协议的客户端通信
-    async with stdio_server() as (read_stream, write_stream):
-        # 步骤5: 运行服务器主循环
-        # 服务器将持续监听客户端请求，直到连接关闭或收到停止信号
-        # raise_exceptions=True 确保异常会被抛出而不是被静默忽略
-        await server.run(read_stream, write_stream, options, raise_exceptions=True)
\ No newline at end of file
+    # 共享HTTP连接池的生命周期与服务器一致，服务器退出时统一关闭连接
+    # 熔断器的后台健康探测任务也在服务器退出时停止
+    # 窗口事件订阅在后台增量更新窗口列表缓存，后端不支持时自动退回按TTL刷新
+    # 有资源订阅者而事件订阅不在线时，后台按间隔刷新窗口列表以发现变化
+    # 链路追踪在服务器退出时导出剩余的span
+    # 启用窗口状态存储时，先用保存的窗口快照热启动缓存，服务器退出时关闭数据库
+    async with tracing.tracing_lifespan(), http_client_lifespan(), circuit_breaker_lifespan(), \
+            state_store_lifespan(_warm_start), window_event_lifespan(_apply_window_events), \
+            resource_poll_lifespan(_get_window_table):
+        if transport == "stdio":
+            # stdio（标准输入/输出）是MCP协议的标准方式，每个客户端启动一个驱动进程
+            await run_stdio(server)
+        else:
+            # HTTP / SSE：一个长期运行的驱动进程同时服务多个客户端，/metrics提供Prometheus抓取端点
+            await run_http(
+                server,
+                transport,
+                host=host or ServerConfig.HOST,
+                port=port or ServerConfig.PORT,
+                max_concurrency=ServerConfig.MAX_CONCURRENCY if max_concurrency is None else max_concurrency,
+                extra_routes=[metrics_route(get_metrics)],
+            )
@@ -0,0 +1,204 @@
+"""
+MCP Layout Driver 窗口事件订阅
+
+从后端的窗口事件端点（WINDOWS_EVENTS）持续接收窗口打开、关闭和变化事件，
+优先使用SSE，后端不支持时回退到长轮询；事件交给回调增量更新缓存的窗口列表。
+
+事件格式（SSE的data字段，或长轮询响应events数组中的每一项）：
+    {"type": "created" | "changed", "window": {...}}
+    {"type": "removed", "handle": 12345}
+    {"type": "reset"}  后端无法提供连续事件时发送，驱动会丢弃缓存重新获取完整列表
+SSE的event字段可代替data中的type；长轮询响应为{"cursor": "...", "events": [...]}。
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .cache import window_list_cache
+from .config import APIConfig, EventsConfig, SecurityConfig
+from .http_client import create_http_client
+from .resilience import backoff_delay
+
+# 事件类型
+EVENT_CREATED = "created"
+EVENT_CHANGED = "changed"
+EVENT_REMOVED = "removed"
+EVENT_RESET = "reset"
+
+EventHandler = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class EventsUnsupported(Exception):
+    """后端没有提供窗口事件端点，或不支持当前的订阅方式"""
+
+
+class WindowEventStream:
+    """窗口事件订阅
+
+    入参：
+        handler: 收到一批事件时调用的协程函数；连接建立或恢复时会先收到一个reset事件
+        mode: 订阅方式，auto（先SSE后长轮询）、sse或long_poll
+    """
+
+    def __init__(self, handler: EventHandler, mode: str = "auto"):
+        self.handler = handler
+        self.mode = mode
+        self.connected = False
+        self.transport: Optional[str] = None
+        self.events_received = 0
+        self.reconnects = 0
+        self._cursor: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _headers(accept: str) -> Dict[str, str]:
+        headers = APIConfig.get_headers({"Accept": accept})
+        if SecurityConfig.AUTH_TOKEN:
+            headers["Authorization"] = f"Bearer {SecurityConfig.AUTH_TOKEN}"
+        return headers
+
+    async def _deliver(self, events: List[Dict[str, Any]]) -> None:
+        """把事件交给回调；回调出错时丢弃窗口列表缓存（事件已丢失），订阅继续运行"""
+        if not events:
+            return
+        self.events_received += len(events)
+        try:
+            await self.handler(events)
+        except Exception:
+            logging.exception("处理窗口事件失败，丢弃窗口列表缓存")
+            window_list_cache.invalidate()
+
+    async def _on_connected(self, transport: str) -> None:
+        """连接建立后先让缓存失效（断开期间可能错过了事件），之后缓存由事件保持最新"""
+        self.connected = True
+        self.transport = transport
+        await self.handler([{"type": EVENT_RESET}])
+        window_list_cache.live = True
+
+    async def _consume_sse(self, client: httpx.AsyncClient) -> None:
+        from httpx_sse import SSEError, aconnect_sse
+
+        headers = self._headers("text/event-stream")
+        if self._cursor is not None:
+            headers["Last-Event-ID"] = self._cursor
+        url = APIConfig.get_endpoint_url("WINDOWS_EVENTS")
+        timeout = httpx.Timeout(APIConfig.DEFAULT_TIMEOUT, read=EventsConfig.SSE_READ_TIMEOUT)
+        async with aconnect_sse(client, "GET", url, headers=headers, timeout=timeout) as source:
+            if source.response.status_code in (404, 405, 406, 501):
+                raise EventsUnsupported(f"HTTP {source.response.status_code}")
+            source.response.raise_for_status()
+            try:
+                iterator = source.aiter_sse()
+                await self._on_connected("sse")
+                async for sse in iterator:
+                    if sse.id:
+                        self._cursor = sse.id
+                    if not sse.data:
+                        continue
+                    event = json.loads(sse.data)
+                    if isinstance(event, dict) and "type" not in event and sse.event != "message":
+                        event["type"] = sse.event
+                    await self._deliver([event])
+            except SSEError as e:
+                # 响应不是text/event-stream
+                raise EventsUnsupported(str(e)) from e
+
+    async def _consume_long_poll(self, client: httpx.AsyncClient) -> None:
+        url = APIConfig.get_endpoint_url("WINDOWS_EVENTS")
+        timeout = httpx.Timeout(APIConfig.DEFAULT_TIMEOUT + EventsConfig.LONG_POLL_TIMEOUT)
+        first = True
+        while True:
+            # 第一次请求不等待，只用于确认端点可用并取得游标
+            params = {"timeout": 0 if first else EventsConfig.LONG_POLL_TIMEOUT}
+            if self._cursor is not None:
+                params["cursor"] = self._cursor
+            response = await client.get(url, params=params, timeout=timeout,
+                                        headers=self._headers("application/json"))
+            if response.status_code in (404, 405, 501):
+                raise EventsUnsupported(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            body = response.json()
+            if not isinstance(body, dict):
+                raise ValueError(f"长轮询响应格式错误: {body!r}")
+            self._cursor = body.get("cursor", self._cursor)
+            if first:
+                await self._on_connected("long_poll")
+                first = False
+            await self._deliver(body.get("events") or [])
+
+    async def run(self) -> None:
+        """持续订阅窗口事件，断线后按指数退避重连；后端不支持事件端点时退出"""
+        modes = ["sse", "long_poll"] if self.mode == "auto" else [self.mode]
+        attempt = 0
+        async with create_http_client() as client:
+            while modes:
+                consume = self._consume_sse if modes[0] == "sse" else self._consume_long_poll
+                try:
+                    await consume(client)
+                    attempt = 0
+                except EventsUnsupported as e:
+                    logging.info(f"后端不支持 {modes[0]} 窗口事件订阅: {e}")
+                    modes.pop(0)
+                    attempt = 0
+                    continue
+                except (httpx.HTTPError, ValueError) as e:
+                    logging.warning(f"窗口事件订阅中断: {e}")
+                    attempt += 1
+                except Exception:
+                    # 格式错误的事件等意外异常不能结束订阅任务，记录后重连
+                    logging.exception("窗口事件订阅异常")
+                    attempt += 1
+                finally:
+                    if self.connected:
+                        # 连接断开后缓存恢复按TTL过期
+                        self.connected = False
+                        window_list_cache.live = False
+                        self.reconnects += 1
+                await asyncio.sleep(backoff_delay(max(attempt, 1)))
+        logging.warning("后端没有可用的窗口事件端点，回退到按TTL刷新窗口列表")
+
+    def start(self) -> None:
+        """在后台任务中开始订阅"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def aclose(self) -> None:
+        """停止订阅"""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.connected = False
+        window_list_cache.live = False
+
+    def stats(self) -> Dict[str, Any]:
+        """返回订阅状态"""
+        return {
+            "mode": self.mode,
+            "connected": self.connected,
+            "transport": self.transport,
+            "events_received": self.events_received,
+            "reconnects": self.reconnects,
+        }
+
+
+@asynccontextmanager
+async def window_event_lifespan(handler: EventHandler) -> AsyncIterator[Optional[WindowEventStream]]:
+    """窗口事件订阅的生命周期管理；EventsConfig.MODE为off时不订阅"""
+    if EventsConfig.MODE == "off":
+        yield None
+        return
+    stream = WindowEventStream(handler, EventsConfig.MODE)
+    stream.start()
+    try:
+        yield stream
+    finally:
+        await stream.aclose()
@@ -0,0 +1,82 @@
+"""
+MCP Layout Driver 共享HTTP客户端
+
+管理与后端API通信所用的长连接httpx.AsyncClient，
+其生命周期与serve()绑定，所有工具函数共享同一个连接池。
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from .config import HTTPClientConfig, SecurityConfig
+
+# 当前进程共享的HTTP客户端（未启动时为None）
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """检查HTTP/2依赖（h2）是否已安装"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """根据HTTPClientConfig创建一个新的httpx.AsyncClient
+
+    出参：
+        httpx.AsyncClient: 配置了连接池上限、保活过期时间和HTTP/2开关的客户端
+    """
+    http2 = HTTPClientConfig.HTTP2
+    if http2 and not _http2_available():
+        logging.warning("已启用HTTP/2但未安装h2依赖，回退到HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=HTTPClientConfig.MAX_CONNECTIONS,
+        max_keepalive_connections=HTTPClientConfig.MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTPClientConfig.KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        verify=SecurityConfig.VERIFY_SSL,
+        limits=limits,
+        http2=http2,
+    )
+
+
+def get_http_client() -> Optional[httpx.AsyncClient]:
+    """获取当前共享的HTTP客户端
+
+    出参：
+        Optional[httpx.AsyncClient]: 共享客户端；若不在http_client_lifespan()内则为None
+    """
+    return _shared_client
+
+
+@asynccontextmanager
+async def http_client_lifespan() -> AsyncIterator[httpx.AsyncClient]:
+    """共享HTTP客户端的生命周期管理
+
+    进入时创建共享客户端，退出时关闭连接池。通常由serve()包裹整个服务器运行过程。
+
+    Example:
+        >>> async with http_client_lifespan():
+        ...     result = await make_api_request("WINDOWS_LIST")
+    """
+    global _shared_client
+    if _shared_client is not None:
+        # 已经处于共享客户端生命周期内，直接复用
+        yield _shared_client
+        return
+
+    _shared_client = create_http_client()
+    try:
+        yield _shared_client
+    finally:
+        client, _shared_client = _shared_client, None
+        await client.aclose()
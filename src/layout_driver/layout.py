@@ -0,0 +1,166 @@
+"""
+MCP Layout Driver 声明式布局
+
+根据目标布局与当前窗口快照的差异，生成最少的后端操作计划。
+"""
+
+import re
+from typing import Any, Dict, List
+
+# 窗口状态
+STATE_NORMAL = "normal"
+STATE_MINIMIZED = "minimized"
+STATE_MAXIMIZED = "maximized"
+
+# 目标状态对应的后端端点
+STATE_ENDPOINTS = {
+    STATE_NORMAL: "WINDOWS_RESTORE_BATCH",
+    STATE_MINIMIZED: "WINDOWS_MINIMIZE_BATCH",
+    STATE_MAXIMIZED: "WINDOWS_MAXIMIZE_BATCH",
+}
+
+CLOSE_ENDPOINT = "WINDOWS_CLOSE_BATCH"
+OPACITY_ENDPOINT = "WINDOWS_OPACITY_BATCH"
+
+# 操作类型对应的后端端点
+OPERATION_ENDPOINTS = {
+    "close": CLOSE_ENDPOINT,
+    "minimize": STATE_ENDPOINTS[STATE_MINIMIZED],
+    "maximize": STATE_ENDPOINTS[STATE_MAXIMIZED],
+    "restore": STATE_ENDPOINTS[STATE_NORMAL],
+    "opacity": OPACITY_ENDPOINT,
+}
+
+
+class WindowStateTracker:
+    """记录驱动已知的窗口状态（normal/minimized/maximized）和透明度
+
+    后端的窗口列表不一定包含状态和透明度，驱动在操作成功后记录下来，
+    供声明式布局判断窗口是否已处于目标状态。
+    """
+
+    def __init__(self):
+        self._states: Dict[int, Dict[str, Any]] = {}
+
+    def record(self, handle: int, **fields: Any) -> None:
+        """记录窗口的state / opacity"""
+        self._states.setdefault(handle, {}).update(fields)
+
+    def forget(self, handle: int) -> None:
+        """移除窗口记录（例如窗口已关闭）"""
+        self._states.pop(handle, None)
+
+    def get(self, handle: int) -> Dict[str, Any]:
+        """返回窗口已知的状态字段"""
+        return self._states.get(handle, {})
+
+
+def match_windows(target: Dict[str, Any], windows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """返回与目标选择器匹配的窗口
+
+    选择器为handle（精确）、alias（精确）和title_pattern（正则搜索），同时给出时需全部满足；
+    没有任何选择器时不匹配任何窗口。title_pattern不是合法的正则表达式时抛出re.error。
+    """
+    if target.get("handle") is None and target.get("alias") is None and not target.get("title_pattern"):
+        return []
+    pattern = re.compile(target["title_pattern"]) if target.get("title_pattern") else None
+    matched = []
+    for window in windows:
+        if target.get("handle") is not None and window["handle"] != target["handle"]:
+            continue
+        if target.get("alias") is not None and window.get("alias") != target["alias"]:
+            continue
+        if pattern is not None and not pattern.search(window.get("title") or ""):
+            continue
+        matched.append(window)
+    return matched
+
+
+def plan_layout(targets: List[Dict[str, Any]], windows: List[Dict[str, Any]],
+                tracker: WindowStateTracker) -> Dict[str, Any]:
+    """计算从当前窗口快照到目标布局的最少操作
+
+    入参：
+        targets: 目标列表，每项包含选择器（handle / alias / title_pattern）
+            以及期望的state、opacity、closed；多个目标匹配同一窗口时后面的覆盖前面的
+        windows: 当前窗口快照
+        tracker: 已知窗口状态
+
+    出参：
+        Dict[str, Any]: 计划，包含：
+        - operations: 端点键名到操作列表的映射（每项为{"window": ..., "opacity": ...}）
+        - skipped: 已处于目标状态而跳过的窗口句柄
+        - unmatched: 没有匹配到任何窗口的目标下标
+    """
+    desired: Dict[int, Dict[str, Any]] = {}
+    by_handle: Dict[int, Dict[str, Any]] = {}
+    unmatched = []
+    for index, target in enumerate(targets):
+        matched = match_windows(target, windows)
+        if not matched:
+            unmatched.append(index)
+        for window in matched:
+            by_handle[window["handle"]] = window
+            wanted = desired.setdefault(window["handle"], {})
+            for field in ("state", "opacity", "closed"):
+                if target.get(field) is not None:
+                    wanted[field] = target[field]
+
+    operations: Dict[str, List[Dict[str, Any]]] = {}
+    skipped = []
+    for handle, wanted in desired.items():
+        window = by_handle[handle]
+        # 后端返回的state / opacity优先，其次使用驱动记录的状态
+        known = {**tracker.get(handle),
+                 **{key: window[key] for key in ("state", "opacity") if window.get(key) is not None}}
+        changed = False
+
+        if wanted.get("closed"):
+            # 关闭的窗口不需要其他操作
+            operations.setdefault(CLOSE_ENDPOINT, []).append({"window": window})
+            continue
+
+        state = wanted.get("state")
+        if state is not None and known.get("state") != state:
+            operations.setdefault(STATE_ENDPOINTS[state], []).append({"window": window})
+            changed = True
+
+        opacity = wanted.get("opacity")
+        if opacity is not None and known.get("opacity") != opacity:
+            operations.setdefault(OPACITY_ENDPOINT, []).append(
+                {"window": window, "opacity": opacity}
+            )
+            changed = True
+
+        if not changed:
+            skipped.append(handle)
+
+    return {"operations": operations, "skipped": skipped, "unmatched": unmatched}
+
+
+def schedule_operations(operations: List[Dict[str, Any]]) -> List[Dict[str, List[int]]]:
+    """把异构窗口操作按端点分组，并分成保持顺序约束的若干阶段
+
+    同一窗口的多个操作按提交顺序依次放入后续阶段（例如先restore再设置opacity），
+    同一阶段内同一端点的操作合并为一次批量请求，不同端点的批量请求可以并发执行。
+
+    入参：
+        operations: 操作列表，每项包含op（close / minimize / maximize / restore / opacity）
+            和handle
+
+    出参：
+        List[Dict[str, List[int]]]: 按执行顺序排列的阶段，每个阶段是端点键名到操作下标列表的映射
+    """
+    stages: List[Dict[str, List[int]]] = []
+    seen: Dict[int, int] = {}
+    for index, operation in enumerate(operations):
+        stage = seen.get(operation["handle"], 0)
+        seen[operation["handle"]] = stage + 1
+        if stage == len(stages):
+            stages.append({})
+        stages[stage].setdefault(OPERATION_ENDPOINTS[operation["op"]], []).append(index)
+    return stages
+
+
+# 进程内共享的窗口状态记录
+window_state_tracker = WindowStateTracker()
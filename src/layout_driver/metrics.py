@@ -0,0 +1,266 @@
+"""
+MCP Layout Driver 运行指标
+
+进程内的计数器、仪表和直方图，以Prometheus文本格式导出，
+用于定位工具调用、后端请求和序列化的耗时分布（尤其是尾延迟）。
+"""
+
+import functools
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .config import MetricsConfig
+
+# 耗时直方图的桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 数据量直方图的桶（字节）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# 当前正在执行的工具名称，供序列化等不知道工具名的环节打标签
+current_tool: ContextVar[str] = ContextVar("current_tool", default="none")
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """指标基类：按标签值分组保存样本"""
+
+    TYPE = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}"]
+
+
+class Counter(_Metric):
+    """单调递增的计数器"""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: Any, amount: float = 1) -> None:
+        key = tuple(str(value) for value in label_values)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *label_values: Any) -> float:
+        return self._values.get(tuple(str(value) for value in label_values), 0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """可增可减的仪表"""
+
+    TYPE = "gauge"
+
+    def dec(self, *label_values: Any, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values: Any, value: float) -> None:
+        self._values[tuple(str(label) for label in label_values)] = value
+
+    @contextmanager
+    def track(self, *label_values: Any) -> Iterator[None]:
+        """进入时加一、退出时减一（用于在途数量）"""
+        self.inc(*label_values)
+        try:
+            yield
+        finally:
+            self.dec(*label_values)
+
+
+class Histogram(_Metric):
+    """累积桶直方图"""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数..., 总和, 总数]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, *label_values: Any, value: float) -> None:
+        key = tuple(str(label) for label in label_values)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values: Any) -> Iterator[None]:
+        """记录代码块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(*label_values, value=time.perf_counter() - start)
+
+    def count(self, *label_values: Any) -> int:
+        series = self._values.get(tuple(str(label) for label in label_values))
+        return int(series[-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {_format_value(series[-1])}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表
+
+    除直接记录的指标外，还可以注册收集函数，在导出时把缓存、限流器、
+    熔断器等组件已有的统计转换为仪表。
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], List[Gauge]]] = []
+
+    def _register(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def register_collector(self, collector: Callable[[], List[Gauge]]) -> None:
+        """注册导出时调用的收集函数，返回的仪表附加在输出末尾"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """以Prometheus文本格式导出全部指标"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for metric in collector():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 进程内共享的指标注册表
+registry = MetricsRegistry()
+
+TOOL_DURATION = registry.histogram(
+    "layout_driver_tool_duration_seconds", "MCP工具调用处理耗时", ("tool",))
+TOOL_ERRORS = registry.counter(
+    "layout_driver_tool_errors_total", "MCP工具调用失败次数（success为false或抛出异常）", ("tool",))
+TOOL_IN_FLIGHT = registry.gauge(
+    "layout_driver_tool_in_flight", "正在处理的MCP工具调用数", ("tool",))
+TOOL_RESPONSE_BYTES = registry.histogram(
+    "layout_driver_tool_response_bytes", "MCP工具响应文本大小（字节）", ("tool",), SIZE_BUCKETS)
+SERIALIZATION_DURATION = registry.histogram(
+    "layout_driver_serialization_duration_seconds", "工具结果序列化耗时", ("tool",))
+HTTP_DURATION = registry.histogram(
+    "layout_driver_http_request_duration_seconds", "单次后端HTTP请求耗时（每次尝试单独计）", ("endpoint", "method"))
+HTTP_RESPONSES = registry.counter(
+    "layout_driver_http_responses_total", "后端HTTP响应数", ("endpoint", "status"))
+HTTP_ERRORS = registry.counter(
+    "layout_driver_http_errors_total", "后端HTTP请求网络错误和超时次数", ("endpoint",))
+HTTP_IN_FLIGHT = registry.gauge(
+    "layout_driver_http_in_flight", "正在进行的后端HTTP请求数", ("endpoint",))
+HTTP_REQUEST_BYTES = registry.histogram(
+    "layout_driver_http_request_bytes", "后端请求体传输大小（字节，压缩时为压缩后）", ("endpoint",), SIZE_BUCKETS)
+HTTP_RESPONSE_BYTES = registry.histogram(
+    "layout_driver_http_response_bytes", "后端响应体大小（字节，解压后）", ("endpoint",), SIZE_BUCKETS)
+HTTP_RESPONSE_WIRE_BYTES = registry.histogram(
+    "layout_driver_http_response_wire_bytes", "后端响应体传输大小（字节，压缩时为压缩后）", ("endpoint",), SIZE_BUCKETS)
+HTTP_RETRIES = registry.counter(
+    "layout_driver_http_retries_total", "后端请求重试次数", ("endpoint",))
+API_REQUEST_DURATION = registry.histogram(
+    "layout_driver_api_request_duration_seconds", "make_api_request总耗时（含排队、重试和退避）", ("endpoint",))
+
+
+def enabled() -> bool:
+    """是否记录指标"""
+    return MetricsConfig.ENABLED
+
+
+def gauge_from(name: str, help_text: str, labels: Tuple[str, ...],
+               samples: List[Tuple[LabelValues, Optional[float]]]) -> Gauge:
+    """把一组已有统计转换为仪表（供收集函数使用）"""
+    gauge = Gauge(name, help_text, labels)
+    for label_values, value in samples:
+        if value is not None:
+            gauge.set(*label_values, value=value)
+    return gauge
+
+
+def instrument_tool(handler: Callable) -> Callable:
+    """装饰call_tool处理函数：记录每个工具的处理耗时、在途数量和异常次数，
+    并在处理期间设置current_tool，使序列化指标带上工具名"""
+    @functools.wraps(handler)
+    async def wrapper(name: str, arguments: dict) -> Any:
+        if not enabled():
+            return await handler(name, arguments)
+        token = current_tool.set(name)
+        TOOL_IN_FLIGHT.inc(name)
+        start = time.perf_counter()
+        try:
+            return await handler(name, arguments)
+        except Exception:
+            TOOL_ERRORS.inc(name)
+            raise
+        finally:
+            TOOL_DURATION.observe(name, value=time.perf_counter() - start)
+            TOOL_IN_FLIGHT.dec(name)
+            current_tool.reset(token)
+
+    return wrapper
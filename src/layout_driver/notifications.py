@@ -0,0 +1,163 @@
+"""
+MCP Layout Driver 窗口资源与订阅通知
+
+把缓存的窗口列表以MCP资源的形式提供：
+- windows://list: 完整窗口列表
+- windows://{handle}: 单个窗口
+
+记录客户端会话的资源订阅，只在资源内容确实变化时向订阅者发送
+notifications/resources/updated 通知。
+"""
+
+import asyncio
+import hashlib
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from pydantic import AnyUrl
+
+from .cache import window_list_cache
+from .config import ResourceConfig
+from .serialization import dumps
+from .window_table import WindowTable
+
+# 窗口资源URI
+WINDOWS_LIST_URI = "windows://list"
+WINDOW_URI_TEMPLATE = "windows://{handle}"
+_WINDOW_URI_PREFIX = "windows://"
+
+
+def parse_window_uri(uri: str) -> Optional[int]:
+    """解析windows://{handle}，返回窗口句柄；不是单窗口资源时返回None"""
+    if not uri.startswith(_WINDOW_URI_PREFIX) or uri == WINDOWS_LIST_URI:
+        return None
+    try:
+        return int(uri[len(_WINDOW_URI_PREFIX):])
+    except ValueError:
+        return None
+
+
+def render_resource(uri: str, table: WindowTable) -> Optional[str]:
+    """按资源URI把窗口表渲染为JSON文本
+
+    出参：
+        Optional[str]: 资源内容；URI无效或窗口不存在时返回None
+    """
+    if uri == WINDOWS_LIST_URI:
+        return dumps(table.to_dicts())
+    handle = parse_window_uri(uri)
+    if handle is None or handle not in table.rows:
+        return None
+    return dumps(table.row(table.rows[handle]))
+
+
+class ResourceNotifier:
+    """窗口资源订阅与变化通知
+
+    为每个被订阅的URI保存最近一次内容的指纹，每次得到新的窗口表时重新计算，
+    指纹变化时才通知订阅了该URI的会话。会话以弱引用保存，客户端断开后自动移除。
+    """
+
+    def __init__(self):
+        self._subscriptions: "weakref.WeakKeyDictionary[Any, Set[str]]" = weakref.WeakKeyDictionary()
+        self._fingerprints: Dict[str, Optional[str]] = {}
+        self.notifications_sent = 0
+
+    @staticmethod
+    def _fingerprint(uri: str, table: WindowTable) -> Optional[str]:
+        content = render_resource(uri, table)
+        if content is None:
+            return None
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def _subscribed_uris(self) -> Set[str]:
+        uris: Set[str] = set()
+        for session_uris in list(self._subscriptions.values()):
+            uris |= session_uris
+        return uris
+
+    def has_subscribers(self) -> bool:
+        """是否有任何会话订阅了窗口资源"""
+        return bool(self._subscribed_uris())
+
+    def subscribe(self, session: Any, uri: str, table: Optional[WindowTable] = None) -> None:
+        """登记订阅；table为当前窗口表时以其内容作为比较基准"""
+        self._subscriptions.setdefault(session, set()).add(uri)
+        if uri not in self._fingerprints and table is not None:
+            self._fingerprints[uri] = self._fingerprint(uri, table)
+
+    def unsubscribe(self, session: Any, uri: str) -> None:
+        """取消订阅"""
+        uris = self._subscriptions.get(session)
+        if uris is not None:
+            uris.discard(uri)
+        if uri not in self._subscribed_uris():
+            self._fingerprints.pop(uri, None)
+
+    async def publish(self, table: WindowTable) -> None:
+        """得到新的窗口表时调用：向内容发生变化的资源的订阅者发送通知"""
+        for uri in self._subscribed_uris():
+            fingerprint = self._fingerprint(uri, table)
+            if uri not in self._fingerprints:
+                # 订阅时还没有基准内容，本次只记录基准
+                self._fingerprints[uri] = fingerprint
+                continue
+            if self._fingerprints[uri] == fingerprint:
+                continue
+            self._fingerprints[uri] = fingerprint
+            await self._send(uri)
+
+    async def _send(self, uri: str) -> None:
+        """向订阅了uri的会话发送资源更新通知，发送失败的会话被移除"""
+        for session, uris in list(self._subscriptions.items()):
+            if uri not in uris:
+                continue
+            try:
+                await session.send_resource_updated(AnyUrl(uri))
+                self.notifications_sent += 1
+            except Exception as e:
+                logging.debug(f"发送资源更新通知失败，移除会话: {e}")
+                self._subscriptions.pop(session, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回订阅统计"""
+        return {
+            "sessions": len(self._subscriptions),
+            "subscribed_uris": len(self._subscribed_uris()),
+            "notifications_sent": self.notifications_sent,
+        }
+
+
+# 进程内共享的资源通知器
+resource_notifier = ResourceNotifier()
+
+
+@asynccontextmanager
+async def resource_poll_lifespan(refresh: Callable[[], Awaitable[Any]]) -> AsyncIterator[None]:
+    """资源订阅的后台刷新
+
+    有订阅者且窗口事件订阅不在线时，每隔ResourceConfig.POLL_INTERVAL秒调用一次refresh
+    （通常是读取带TTL的窗口列表缓存），使订阅者在没有工具调用时也能收到变化通知。
+    """
+    async def poll() -> None:
+        while True:
+            await asyncio.sleep(ResourceConfig.POLL_INTERVAL)
+            if not resource_notifier.has_subscribers() or window_list_cache.live:
+                continue
+            try:
+                await refresh()
+            except Exception as e:
+                logging.warning(f"刷新订阅的窗口资源失败: {e}")
+
+    task = asyncio.create_task(poll()) if ResourceConfig.POLL_INTERVAL > 0 else None
+    try:
+        yield
+    finally:
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
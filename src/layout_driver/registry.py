@@ -0,0 +1,222 @@
+"""
+MCP Layout Driver 窗口索引
+
+基于get_window_list的结果在内存中建立窗口索引，
+支持按句柄、别名、标题和几何区域快速查找窗口。
+"""
+
+import bisect
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import RegistryConfig
+
+# 单个窗口最多登记的网格单元数，覆盖更多单元的窗口（尺寸异常大）不登记到网格，查询时总是作为候选
+MAX_WINDOW_CELLS = 1024
+
+
+def normalize_title(title: Optional[str]) -> str:
+    """标题归一化：去掉首尾空白、合并连续空白并忽略大小写"""
+    return " ".join((title or "").split()).casefold()
+
+
+def trigrams(text: str) -> Set[str]:
+    """返回字符串的全部三元组（长度不足3时为空集合）"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class WindowRegistry:
+    """带索引的窗口注册表
+
+    - handle: 哈希索引
+    - alias: 哈希索引（别名 -> 句柄集合）
+    - 标题: 归一化标题的三元组倒排索引（子串查询）与有序列表（前缀查询）
+    - 几何: 固定大小网格的空间索引（区域重叠查询）
+
+    入参：
+        cell_size: 空间索引网格的边长（像素）
+    """
+
+    def __init__(self, cell_size: int):
+        self.cell_size = max(1, cell_size)
+        self.version: Optional[str] = None
+        self._windows: Dict[int, Dict[str, Any]] = {}
+        self._order: Dict[int, int] = {}
+        self._by_alias: Dict[str, Set[int]] = {}
+        self._titles: Dict[int, str] = {}
+        self._by_trigram: Dict[str, Set[int]] = {}
+        self._sorted_titles: List[Tuple[str, int]] = []
+        self._by_cell: Dict[Tuple[int, int], Set[int]] = {}
+        self._oversized: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _cell_bounds(self, x: int, y: int, width: int, height: int) -> Tuple[int, int, int, int]:
+        """矩形覆盖的网格单元范围（左、上、右、下，均包含）"""
+        size = self.cell_size
+        return (x // size, y // size,
+                (x + max(width, 1) - 1) // size, (y + max(height, 1) - 1) // size)
+
+    @staticmethod
+    def _cell_count(bounds: Tuple[int, int, int, int]) -> int:
+        left, top, right, bottom = bounds
+        return (right - left + 1) * (bottom - top + 1)
+
+    @staticmethod
+    def _cells(bounds: Tuple[int, int, int, int]) -> Iterable[Tuple[int, int]]:
+        """范围内的全部网格单元"""
+        left, top, right, bottom = bounds
+        for cell_x in range(left, right + 1):
+            for cell_y in range(top, bottom + 1):
+                yield cell_x, cell_y
+
+    def rebuild(self, version: Optional[str], windows: List[Dict[str, Any]]) -> None:
+        """用新的窗口列表重建全部索引；版本号未变化时跳过"""
+        if version is not None and version == self.version:
+            return
+        self.version = version
+        self._windows = {}
+        self._order = {}
+        self._by_alias = {}
+        self._titles = {}
+        self._by_trigram = {}
+        self._by_cell = {}
+        self._oversized = set()
+        for position, window in enumerate(windows):
+            handle = window["handle"]
+            self._windows[handle] = window
+            self._order[handle] = position
+            if window.get("alias") is not None:
+                self._by_alias.setdefault(window["alias"], set()).add(handle)
+            title = normalize_title(window.get("title"))
+            self._titles[handle] = title
+            for gram in trigrams(title):
+                self._by_trigram.setdefault(gram, set()).add(handle)
+            bounds = self._cell_bounds(window["x"], window["y"], window["width"], window["height"])
+            if self._cell_count(bounds) > MAX_WINDOW_CELLS:
+                self._oversized.add(handle)
+                continue
+            for cell in self._cells(bounds):
+                self._by_cell.setdefault(cell, set()).add(handle)
+        self._sorted_titles = sorted((title, handle) for handle, title in self._titles.items())
+
+    def get(self, handle: int) -> Optional[Dict[str, Any]]:
+        """按句柄读取窗口"""
+        return self._windows.get(handle)
+
+    def _title_candidates(self, text: str) -> Optional[Set[int]]:
+        """标题包含text的候选句柄；text不足三个字符时无法用索引缩小范围，返回None"""
+        grams = trigrams(text)
+        if not grams:
+            return None
+        candidates: Optional[Set[int]] = None
+        # 从最小的倒排列表开始求交集
+        for gram in sorted(grams, key=lambda gram: len(self._by_trigram.get(gram, ()))):
+            handles = self._by_trigram.get(gram, set())
+            candidates = set(handles) if candidates is None else candidates & handles
+            if not candidates:
+                break
+        return candidates
+
+    def _prefix_candidates(self, prefix: str) -> Set[int]:
+        """标题以prefix开头的句柄"""
+        start = bisect.bisect_left(self._sorted_titles, (prefix,))
+        handles = set()
+        for title, handle in self._sorted_titles[start:]:
+            if not title.startswith(prefix):
+                break
+            handles.add(handle)
+        return handles
+
+    def _region_candidates(self, x: int, y: int, width: int, height: int) -> Set[int]:
+        """与区域可能重叠的句柄
+
+        区域覆盖的网格单元比已登记的单元还多时（例如很大的查询区域），
+        改为遍历已登记的单元，耗时不超过窗口数量级。
+        """
+        handles: Set[int] = set(self._oversized)
+        bounds = self._cell_bounds(x, y, width, height)
+        if self._cell_count(bounds) > len(self._by_cell):
+            left, top, right, bottom = bounds
+            for (cell_x, cell_y), cell_handles in self._by_cell.items():
+                if left <= cell_x <= right and top <= cell_y <= bottom:
+                    handles |= cell_handles
+            return handles
+        for cell in self._cells(bounds):
+            handles |= self._by_cell.get(cell, set())
+        return handles
+
+    def find(self, title: Optional[str] = None, title_prefix: Optional[str] = None,
+             title_regex: Optional[str] = None, alias: Optional[str] = None,
+             region: Optional[Dict[str, int]] = None,
+             min_width: Optional[int] = None, max_width: Optional[int] = None,
+             min_height: Optional[int] = None, max_height: Optional[int] = None,
+             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按条件查找窗口，所有给出的条件需同时满足
+
+        入参：
+            title: 标题子串（忽略大小写与多余空白）
+            title_prefix: 标题前缀（忽略大小写与多余空白）
+            title_regex: 标题正则表达式（搜索匹配原始标题）
+            alias: 窗口别名（精确匹配）
+            region: 区域{"x", "y", "width", "height"}，返回与之重叠的窗口
+            min_width / max_width / min_height / max_height: 尺寸范围
+            limit: 最多返回的窗口数量
+
+        出参：
+            List[Dict[str, Any]]: 匹配的窗口，保持窗口列表中的原始顺序
+        """
+        candidates: Optional[Set[int]] = None
+
+        def narrow(handles: Optional[Set[int]]) -> None:
+            nonlocal candidates
+            if handles is not None:
+                candidates = handles if candidates is None else candidates & handles
+
+        # 先用索引缩小候选范围
+        if alias is not None:
+            narrow(self._by_alias.get(alias, set()))
+        if title_prefix:
+            narrow(self._prefix_candidates(normalize_title(title_prefix)))
+        if title:
+            narrow(self._title_candidates(normalize_title(title)))
+        if region is not None:
+            narrow(self._region_candidates(region["x"], region["y"],
+                                           region["width"], region["height"]))
+        if candidates is None:
+            candidates = set(self._windows)
+
+        # 再对候选窗口逐一精确校验
+        pattern = re.compile(title_regex) if title_regex else None
+        normalized_title = normalize_title(title) if title else None
+        matched = []
+        for handle in sorted(candidates, key=self._order.__getitem__):
+            if limit is not None and len(matched) >= limit:
+                break
+            window = self._windows[handle]
+            if normalized_title is not None and normalized_title not in self._titles[handle]:
+                continue
+            if pattern is not None and not pattern.search(window.get("title") or ""):
+                continue
+            if region is not None and not (
+                window["x"] < region["x"] + region["width"]
+                and region["x"] < window["x"] + window["width"]
+                and window["y"] < region["y"] + region["height"]
+                and region["y"] < window["y"] + window["height"]
+            ):
+                continue
+            if min_width is not None and window["width"] < min_width:
+                continue
+            if max_width is not None and window["width"] > max_width:
+                continue
+            if min_height is not None and window["height"] < min_height:
+                continue
+            if max_height is not None and window["height"] > max_height:
+                continue
+            matched.append(window)
+        return matched
+
+
+# 进程内共享的窗口索引
+window_registry = WindowRegistry(RegistryConfig.CELL_SIZE)
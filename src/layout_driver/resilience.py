@@ -0,0 +1,232 @@
+"""
+MCP Layout Driver 容错机制
+
+提供后端请求的重试退避策略，以及按端点划分的熔断器。
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .config import APIConfig, CircuitBreakerConfig, RetryConfig, SecurityConfig
+from .http_client import create_http_client, get_http_client
+
+
+def is_idempotent(endpoint_key: str) -> bool:
+    """端点是否可以安全地自动重试"""
+    return endpoint_key in RetryConfig.IDEMPOTENT_ENDPOINTS
+
+
+def backoff_delay(attempt: int) -> float:
+    """计算第attempt次尝试失败后的重试延迟（指数退避 + 全抖动）"""
+    ceiling = min(RetryConfig.BACKOFF_MAX, RetryConfig.BACKOFF_BASE * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+
+def next_retry_delay(attempt: int, max_retries: int, deadline: float) -> Optional[float]:
+    """决定是否重试并返回重试前的等待时间
+
+    入参：
+        attempt: 已完成的尝试次数（从1开始）
+        max_retries: 允许的最大重试次数，0表示不重试
+        deadline: 总时限（time.monotonic()时间点）
+
+    出参：
+        Optional[float]: 等待秒数；不应再重试（次数用尽或将超过总时限）时返回None
+    """
+    if attempt > max_retries:
+        return None
+    delay = backoff_delay(attempt)
+    if time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+class CircuitBreaker:
+    """单个端点的熔断器
+
+    状态转换：
+    - closed（关闭）：正常放行请求，连续失败达到阈值后打开
+    - open（打开）：直接拒绝请求，经过recovery_timeout后进入半开状态
+    - half_open（半开）：放行少量试探请求，成功则关闭，失败则重新打开
+
+    入参：
+        name: 熔断器名称（端点键名）
+        failure_threshold: 连续失败多少次后打开
+        recovery_timeout: 打开后多久进入半开状态（秒）
+        half_open_max_calls: 半开状态下允许同时进行的试探请求数量
+        on_open: 熔断器打开时的回调
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float,
+                 half_open_max_calls: int = 1, on_open=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._on_open = on_open
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> str:
+        """当前状态；打开超过recovery_timeout后自动转为半开"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        """距离进入半开状态的剩余秒数"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def allow_request(self) -> bool:
+        """是否放行本次请求"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """记录一次成功请求，关闭熔断器"""
+        if self._state != self.CLOSED:
+            logging.info(f"熔断器 {self.name} 已关闭，后端恢复")
+        self.reset()
+
+    def record_failure(self) -> None:
+        """记录一次失败请求，达到阈值或半开试探失败时打开熔断器"""
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._open()
+
+    def reset(self) -> None:
+        """重置为关闭状态"""
+        self._state = self.CLOSED
+        self._failures = 0
+        self._half_open_calls = 0
+
+    def _open(self) -> None:
+        was_open = self._state == self.OPEN
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._half_open_calls = 0
+        if not was_open:
+            logging.warning(f"熔断器 {self.name} 已打开，连续失败 {self._failures} 次")
+            if self._on_open is not None:
+                self._on_open(self)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回熔断器状态信息"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_after": round(self.retry_after(), 3),
+        }
+
+
+class CircuitBreakerRegistry:
+    """按端点管理熔断器，并在有熔断器打开时运行后台健康探测
+
+    健康探测定期请求CircuitBreakerConfig.HEALTH_ENDPOINT，
+    后端恢复（返回非5xx状态码）时关闭所有熔断器。
+    """
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def get(self, name: str) -> CircuitBreaker:
+        """获取（必要时创建）指定端点的熔断器"""
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=CircuitBreakerConfig.FAILURE_THRESHOLD,
+                recovery_timeout=CircuitBreakerConfig.RECOVERY_TIMEOUT,
+                half_open_max_calls=CircuitBreakerConfig.HALF_OPEN_MAX_CALLS,
+                on_open=self._on_open,
+            )
+            self._breakers[name] = breaker
+        return breaker
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """返回所有熔断器的状态"""
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+
+    def _any_open(self) -> bool:
+        return any(breaker.state != CircuitBreaker.CLOSED for breaker in self._breakers.values())
+
+    def _on_open(self, breaker: CircuitBreaker) -> None:
+        # 没有运行中的事件循环时（例如同步调用），不启动后台探测
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = loop.create_task(self._probe_loop())
+
+    async def _probe_once(self) -> bool:
+        """请求一次健康端点，后端可用时返回True"""
+        url = APIConfig.get_endpoint_url(CircuitBreakerConfig.HEALTH_ENDPOINT)
+        headers = APIConfig.get_headers()
+        if SecurityConfig.AUTH_TOKEN:
+            headers["Authorization"] = f"Bearer {SecurityConfig.AUTH_TOKEN}"
+        try:
+            client = get_http_client()
+            if client is not None:
+                response = await client.get(url, headers=headers,
+                                            timeout=CircuitBreakerConfig.HEALTH_PROBE_TIMEOUT)
+            else:
+                async with create_http_client() as oneshot_client:
+                    response = await oneshot_client.get(
+                        url, headers=headers, timeout=CircuitBreakerConfig.HEALTH_PROBE_TIMEOUT
+                    )
+        except Exception:
+            return False
+        return response.status_code < 500
+
+    async def _probe_loop(self) -> None:
+        """后台健康探测：直到所有熔断器关闭为止"""
+        while self._any_open():
+            await asyncio.sleep(CircuitBreakerConfig.HEALTH_PROBE_INTERVAL)
+            if await self._probe_once():
+                for breaker in self._breakers.values():
+                    if breaker.state != CircuitBreaker.CLOSED:
+                        breaker.record_success()
+
+    async def aclose(self) -> None:
+        """停止后台健康探测"""
+        task, self._probe_task = self._probe_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+# 进程内共享的熔断器注册表
+circuit_breakers = CircuitBreakerRegistry()
+
+
+@asynccontextmanager
+async def circuit_breaker_lifespan() -> AsyncIterator[CircuitBreakerRegistry]:
+    """熔断器后台健康探测的生命周期管理，退出时停止探测任务"""
+    try:
+        yield circuit_breakers
+    finally:
+        await circuit_breakers.aclose()
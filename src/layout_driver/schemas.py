@@ -0,0 +1,64 @@
+"""
+MCP Layout Driver 预生成的工具输入模式
+
+工具的inputSchema由pydantic模型生成（model_json_schema），全部工具约需20ms，
+而每个stdio客户端会话都会启动新的驱动进程并调用一次list_tools。
+因此把生成结果保存在随包发布的tool_schemas.json中，启动时直接加载。
+
+文件中记录了生成时driver.py内容和pydantic版本的指纹；两者任一变化（例如修改了
+工具模型但没有重新生成）时不使用该文件，回退为运行时生成，结果始终与模型一致。
+
+修改工具模型后重新生成：
+    python -m layout_driver --write-schemas
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pydantic
+
+SCHEMA_FILE = Path(__file__).with_name("tool_schemas.json")
+
+# 工具模型都定义在driver.py中
+_MODELS_FILE = Path(__file__).with_name("driver.py")
+
+
+def fingerprint() -> Optional[str]:
+    """工具模型的指纹：driver.py内容与pydantic版本的sha1（源文件不存在时为None）"""
+    try:
+        source = _MODELS_FILE.read_bytes()
+    except OSError:
+        return None
+    return hashlib.sha1(source + pydantic.VERSION.encode()).hexdigest()
+
+
+def load_tool_schemas() -> Optional[Dict[str, Dict[str, Any]]]:
+    """加载预生成的工具输入模式
+
+    出参：
+        Optional[Dict]: 工具名到inputSchema的映射；文件不存在、损坏或指纹不匹配时为None
+    """
+    try:
+        data = json.loads(SCHEMA_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    current = fingerprint()
+    if current is None or data.get("fingerprint") != current:
+        logging.debug("tool_schemas.json与当前工具模型不一致，运行时生成inputSchema")
+        return None
+    return data.get("schemas")
+
+
+def write_tool_schemas() -> Path:
+    """按当前工具模型重新生成tool_schemas.json"""
+    from .driver import build_tool_definitions
+
+    data = {
+        "fingerprint": fingerprint(),
+        "schemas": {tool.name: tool.inputSchema for tool in build_tool_definitions()},
+    }
+    SCHEMA_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    return SCHEMA_FILE
@@ -0,0 +1,87 @@
+"""
+MCP Layout Driver 响应序列化
+
+把make_api_request风格的结果序列化为返回给MCP客户端的文本。
+安装了orjson时使用orjson，否则回退到标准库json。
+"""
+
+import json
+import time
+from typing import Any, Dict
+
+from . import metrics, tracing
+from .config import ResponseConfig
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson为可选依赖
+    orjson = None
+
+# compact模式下保留的字段
+COMPACT_FIELDS = ("success", "content", "error", "window_results", "version")
+
+# standard模式下去掉的字段
+STANDARD_EXCLUDED_FIELDS = ("headers",)
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """把对象序列化为JSON字符串（保留中文字符）
+
+    入参：
+        obj: 要序列化的对象
+        indent: 是否缩进2格
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def shape_result(result: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    """按响应模式裁剪结果字段"""
+    if mode == "compact":
+        shaped = {key: result[key] for key in COMPACT_FIELDS if key in result}
+        # 发生过重试时保留实际尝试次数
+        if (result.get("attempts") or 0) > 1:
+            shaped["attempts"] = result["attempts"]
+        return shaped
+    if mode == "standard":
+        return {key: value for key, value in result.items()
+                if key not in STANDARD_EXCLUDED_FIELDS}
+    return result
+
+
+def format_tool_result(result: Dict[str, Any], mode: str = None) -> str:
+    """把工具结果格式化为返回给MCP客户端的文本
+
+    入参：
+        result: 工具函数返回的结果
+        mode: 响应模式（compact/standard/debug），默认使用ResponseConfig.MODE
+
+    出参：
+        str: JSON文本，debug模式下缩进2格，其余模式不缩进
+    """
+    mode = mode or ResponseConfig.MODE
+    if tracing.enabled():
+        with tracing.span("serialize_result"):
+            return _format_tool_result(result, mode)
+    return _format_tool_result(result, mode)
+
+
+def _format_tool_result(result: Dict[str, Any], mode: str) -> str:
+    """序列化工具结果，启用指标时记录序列化耗时和响应大小"""
+    if not metrics.enabled():
+        return dumps(shape_result(result, mode), indent=mode == "debug")
+    # 记录序列化耗时和响应大小，按当前工具打标签
+    start = time.perf_counter()
+    text = dumps(shape_result(result, mode), indent=mode == "debug")
+    tool = metrics.current_tool.get()
+    if result.get("success") is False:
+        metrics.TOOL_ERRORS.inc(tool)
+    metrics.SERIALIZATION_DURATION.observe(tool, value=time.perf_counter() - start)
+    metrics.TOOL_RESPONSE_BYTES.observe(tool, value=len(text.encode("utf-8")))
+    return text
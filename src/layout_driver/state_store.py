@@ -0,0 +1,351 @@
+"""
+MCP Layout Driver 窗口状态存储
+
+驱动进程退出后，内存中的窗口快照和已知窗口状态随之丢失：下次启动的第一次调用必须完整获取
+GET /windows，最小化、最大化、透明度等操作也无法撤销。启用状态存储
+（StateStoreConfig.PATH）后，这些数据保存在本地SQLite数据库中：
+
+- 窗口快照：最近一次GET /windows的窗口列表（图标按内容哈希单独保存）、版本号和条件GET验证器，
+  启动时用于热启动窗口列表缓存
+- 窗口状态：驱动已知的每个窗口的state / opacity（见layout.WindowStateTracker）
+- 操作历史：最近StateStoreConfig.HISTORY_SIZE次改变窗口状态的工具调用，每个窗口记录操作前的状态，
+  供restore_previous_layout撤销
+
+SQLite是标准库，单文件、带事务，进程异常退出时不会留下写了一半的记录。
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Union
+
+from .cache import IconCache
+from .config import StateStoreConfig
+
+# 撤销时状态字段的默认值：操作前的状态未知时视为正常状态、完全不透明
+DEFAULT_STATE = "normal"
+DEFAULT_OPACITY = 255
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshot (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    saved_at REAL NOT NULL,
+    version TEXT,
+    conditional_key TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    windows TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS icons (
+    hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS window_states (
+    handle INTEGER PRIMARY KEY,
+    fields TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    applied_at REAL NOT NULL,
+    tool TEXT,
+    entries TEXT NOT NULL,
+    undone INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# 当前工具调用收集的操作记录：list为收集中，None为不收集（每次操作单独记录），False为暂停记录
+_pending: ContextVar[Union[List[Dict[str, Any]], None, bool]] = ContextVar("state_store_pending", default=None)
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+class StateStore:
+    """基于SQLite的窗口状态存储
+
+    数据库在第一次使用时打开（不在serve()中调用的场景同样可用）；读写失败时记录警告并返回空结果，
+    不影响窗口操作本身。
+
+    入参：
+        path: 数据库文件路径，为空或off表示不启用
+        history_size: 保存的操作历史条数
+    """
+
+    def __init__(self, path: str, history_size: int):
+        self.path = path
+        self.history_size = history_size
+        self._conn: Optional[sqlite3.Connection] = None
+        # 最近一次保存的快照标识（版本号和验证器），未变化时跳过写入
+        self._saved_key: Optional[tuple] = None
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用了状态存储"""
+        return bool(self.path) and self.path.lower() != "off"
+
+    @property
+    def persistent(self) -> bool:
+        """数据是否保存在文件中（:memory:只在进程内有效）"""
+        return self.enabled and self.path != ":memory:"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            if self.persistent:
+                # WAL + NORMAL：写入只追加日志，不在每次提交时同步整个数据库文件
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def save_snapshot(self, windows: List[Dict[str, Any]], version: Optional[str],
+                      conditional_key: Optional[str] = None, etag: Optional[str] = None,
+                      last_modified: Optional[str] = None) -> None:
+        """保存窗口快照；版本号和验证器都未变化时不写入
+
+        入参：
+            windows: 后端返回的窗口列表（可含base64图标，图标按内容哈希单独保存）
+            version: 窗口列表版本号
+            conditional_key / etag / last_modified: 条件GET的缓存键和验证器，热启动后
+                第一次GET /windows据此发送条件请求
+        """
+        if not self.persistent:
+            return
+        key = (version, conditional_key, etag, last_modified)
+        if key == self._saved_key:
+            return
+        icons: Dict[str, str] = {}
+        rows = []
+        for window in windows:
+            row = {field: value for field, value in window.items() if field != "icon"}
+            if window.get("icon"):
+                icon_hash = IconCache.compute_hash(window["icon"])
+                icons[icon_hash] = window["icon"]
+                row["icon_hash"] = icon_hash
+            rows.append(row)
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN")
+                conn.execute(
+                    "INSERT OR REPLACE INTO snapshot (id, saved_at, version, conditional_key, etag, "
+                    "last_modified, windows) VALUES (1, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), version, conditional_key, etag, last_modified, _dumps(rows)),
+                )
+                # 只写入新增的图标，删除快照中已不再使用的图标
+                stored = {row[0] for row in conn.execute("SELECT hash FROM icons")}
+                conn.executemany("INSERT INTO icons (hash, data) VALUES (?, ?)",
+                                 [(icon_hash, icon) for icon_hash, icon in icons.items()
+                                  if icon_hash not in stored])
+                conn.executemany("DELETE FROM icons WHERE hash = ?",
+                                 [(icon_hash,) for icon_hash in stored if icon_hash not in icons])
+        except sqlite3.Error as e:
+            logging.warning(f"保存窗口快照失败: {e}")
+            return
+        self._saved_key = key
+
+    def load_snapshot(self, max_age: float) -> Optional[Dict[str, Any]]:
+        """读取不超过max_age秒的窗口快照
+
+        出参：
+            Optional[Dict[str, Any]]: 快照，包含saved_at、version、conditional_key、etag、
+            last_modified、windows（已还原base64图标的窗口列表）和states（句柄到已知状态的映射）；
+            没有快照、快照过旧或只在进程内保存时返回None
+        """
+        if not self.persistent or max_age <= 0:
+            return None
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT saved_at, version, conditional_key, etag, last_modified, windows "
+                "FROM snapshot WHERE id = 1"
+            ).fetchone()
+            if row is None or time.time() - row[0] > max_age:
+                return None
+            icons = dict(conn.execute("SELECT hash, data FROM icons"))
+            states = {handle: json.loads(fields)
+                      for handle, fields in conn.execute("SELECT handle, fields FROM window_states")}
+        except (sqlite3.Error, ValueError) as e:
+            logging.warning(f"读取窗口快照失败: {e}")
+            return None
+        windows = []
+        for window in json.loads(row[5]):
+            icon_hash = window.pop("icon_hash", None)
+            if icon_hash is not None and icon_hash in icons:
+                window["icon"] = icons[icon_hash]
+            windows.append(window)
+        handles = {window["handle"] for window in windows}
+        self._saved_key = (row[1], row[2], row[3], row[4])
+        return {
+            "saved_at": row[0],
+            "version": row[1],
+            "conditional_key": row[2],
+            "etag": row[3],
+            "last_modified": row[4],
+            "windows": windows,
+            # 只保留快照中仍存在的窗口的状态
+            "states": {handle: fields for handle, fields in states.items() if handle in handles},
+        }
+
+    @contextmanager
+    def recording(self, tool: str) -> Iterator[None]:
+        """把一次工具调用中的全部窗口操作合并为一条历史记录（一次撤销的单位）"""
+        if not self.enabled or _pending.get() is not None:
+            yield
+            return
+        entries: List[Dict[str, Any]] = []
+        token = _pending.set(entries)
+        try:
+            yield
+        finally:
+            _pending.reset(token)
+            if entries:
+                self._write_history(tool, entries)
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """暂停记录操作历史（撤销操作本身不再计入历史）"""
+        token = _pending.set(False)
+        try:
+            yield
+        finally:
+            _pending.reset(token)
+
+    def record_operations(self, entries: List[Dict[str, Any]]) -> None:
+        """记录操作成功的窗口
+
+        入参：
+            entries: 每项包含op、window（不含图标的窗口字段）、before（操作前的已知状态）
+                和after（操作后的已知状态，关闭的窗口为None）
+        """
+        if not self.enabled or not entries:
+            return
+        pending = _pending.get()
+        if pending is None:
+            self._write_history(None, entries)
+        elif pending is False:
+            self._write_states(entries)
+        else:
+            pending.extend(entries)
+
+    def _write_states(self, entries: List[Dict[str, Any]], conn: Optional[sqlite3.Connection] = None) -> None:
+        """保存操作后的窗口状态（供下次启动时恢复已知状态）"""
+        try:
+            conn = conn or self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO window_states (handle, fields) VALUES (?, ?)",
+                [(entry["window"]["handle"], _dumps(entry["after"]))
+                 for entry in entries if entry["after"] is not None],
+            )
+            conn.executemany(
+                "DELETE FROM window_states WHERE handle = ?",
+                [(entry["window"]["handle"],) for entry in entries if entry["after"] is None],
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"保存窗口状态失败: {e}")
+
+    def _write_history(self, tool: Optional[str], entries: List[Dict[str, Any]]) -> None:
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN")
+                conn.execute(
+                    "INSERT INTO history (applied_at, tool, entries) VALUES (?, ?, ?)",
+                    (time.time(), tool, _dumps([
+                        {key: entry[key] for key in ("op", "window", "before")} for entry in entries
+                    ])),
+                )
+                conn.execute(
+                    "DELETE FROM history WHERE id NOT IN (SELECT id FROM history ORDER BY id DESC LIMIT ?)",
+                    (max(self.history_size, 1),),
+                )
+                self._write_states(entries, conn)
+        except sqlite3.Error as e:
+            logging.warning(f"保存窗口操作历史失败: {e}")
+
+    def history(self, limit: int) -> List[Dict[str, Any]]:
+        """返回最近limit条未撤销的操作历史（从新到旧），每项包含id、applied_at、tool和entries"""
+        if not self.enabled:
+            return []
+        try:
+            rows = self._connect().execute(
+                "SELECT id, applied_at, tool, entries FROM history WHERE undone = 0 ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logging.warning(f"读取窗口操作历史失败: {e}")
+            return []
+        return [
+            {"id": row[0], "applied_at": row[1], "tool": row[2], "entries": json.loads(row[3])}
+            for row in rows
+        ]
+
+    def mark_undone(self, ids: List[int]) -> None:
+        """把已撤销的历史记录标记为undone，下次撤销从更早的记录开始"""
+        if not self.enabled or not ids:
+            return
+        try:
+            self._connect().executemany("UPDATE history SET undone = 1 WHERE id = ?", [(id_,) for id_ in ids])
+        except sqlite3.Error as e:
+            logging.warning(f"更新窗口操作历史失败: {e}")
+
+
+def undo_targets(changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """根据操作历史计算撤销后每个窗口应恢复到的状态
+
+    同一窗口在多条历史中出现时取最早一条的操作前状态；操作前状态未知时
+    state视为normal、opacity视为255。关闭的窗口无法重新打开，只列在irreversible中。
+
+    入参：
+        changes: history()返回的操作历史（从新到旧）
+
+    出参：
+        Dict[str, Any]: 包含targets（句柄到{"state": ..., "opacity": ...}的映射，
+        只包含需要恢复的字段）和irreversible（已关闭、无法撤销的窗口句柄）
+    """
+    targets: Dict[int, Dict[str, Any]] = {}
+    irreversible: List[int] = []
+    # 从旧到新遍历，每个字段只保留第一次出现（即最早）的操作前状态
+    for change in reversed(changes):
+        for entry in change["entries"]:
+            handle = entry["window"]["handle"]
+            if entry["op"] == "close":
+                if handle not in irreversible:
+                    irreversible.append(handle)
+                continue
+            target = targets.setdefault(handle, {})
+            if entry["op"] == "opacity":
+                target.setdefault("opacity", entry["before"].get("opacity", DEFAULT_OPACITY))
+            else:
+                target.setdefault("state", entry["before"].get("state", DEFAULT_STATE))
+    return {
+        "targets": {handle: target for handle, target in targets.items() if handle not in irreversible},
+        "irreversible": irreversible,
+    }
+
+
+# 进程内共享的窗口状态存储
+state_store = StateStore(StateStoreConfig.PATH, StateStoreConfig.HISTORY_SIZE)
+
+
+@asynccontextmanager
+async def state_store_lifespan(warm_start: Callable[[Dict[str, Any]], None]) -> AsyncIterator[StateStore]:
+    """状态存储的生命周期管理：启动时把保存的窗口快照交给warm_start热启动，退出时关闭数据库"""
+    snapshot = state_store.load_snapshot(StateStoreConfig.WARM_START_MAX_AGE)
+    if snapshot is not None:
+        warm_start(snapshot)
+    try:
+        yield state_store
+    finally:
+        state_store.close()
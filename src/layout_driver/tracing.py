@@ -0,0 +1,179 @@
+"""
+MCP Layout Driver 链路追踪
+
+可选的OpenTelemetry追踪：每次call_tool为一个根span，参数校验、make_api_request
+（含每次HTTP尝试的连接/发送/接收耗时）和结果序列化为子span，
+并通过W3C traceparent请求头把追踪上下文传递给后端。
+
+OpenTelemetry SDK为可选依赖；TracingConfig.EXPORTER为off或未安装SDK时
+不创建任何span，工具处理函数也不会被包装。
+"""
+
+import functools
+import logging
+import sys
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncIterator, Callable, Dict
+
+from .config import TracingConfig
+
+# 已配置的tracer（未启用追踪时为None）
+_tracer: Any = None
+_provider: Any = None
+_propagator: Any = None
+
+# 未启用追踪时span()返回的空上下文（可重复使用）
+_NOOP = nullcontext()
+
+
+def enabled() -> bool:
+    """是否正在追踪"""
+    return _tracer is not None
+
+
+def _create_exporter(name: str) -> Any:
+    """按名称创建span导出器"""
+    if name == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        # stdio传输使用标准输出传递MCP消息，span只能输出到标准错误
+        return ConsoleSpanExporter(out=sys.stderr)
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    raise ValueError(f"不支持的追踪导出方式: {name}")
+
+
+def configure() -> bool:
+    """按TracingConfig初始化追踪（重复调用无副作用）
+
+    出参：
+        bool: 是否启用了追踪
+    """
+    global _tracer, _provider, _propagator
+    if _tracer is not None or TracingConfig.EXPORTER == "off":
+        return _tracer is not None
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+        from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+        exporter = _create_exporter(TracingConfig.EXPORTER)
+    except ImportError as e:
+        logging.warning(f"已启用链路追踪但未安装OpenTelemetry SDK或导出器，追踪不可用: {e}")
+        return False
+    except ValueError as e:
+        logging.warning(str(e))
+        return False
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": TracingConfig.SERVICE_NAME}))
+    # console用于本地调试，逐个同步输出；其余导出器在后台批量导出
+    processor = SimpleSpanProcessor if TracingConfig.EXPORTER == "console" else BatchSpanProcessor
+    _provider.add_span_processor(processor(exporter))
+    _tracer = _provider.get_tracer("layout_driver")
+    _propagator = TraceContextTextMapPropagator()
+    return True
+
+
+@asynccontextmanager
+async def tracing_lifespan() -> AsyncIterator[None]:
+    """追踪的生命周期管理：退出时导出剩余的span"""
+    configure()
+    try:
+        yield
+    finally:
+        if _provider is not None:
+            _provider.shutdown()
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """以当前span为父span开始一个子span；未启用追踪时返回空上下文"""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes or None)
+
+
+def set_attributes(**attributes: Any) -> None:
+    """为当前span设置属性（未启用追踪时不做任何事）"""
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
+
+
+def inject_headers(headers: Dict[str, str]) -> None:
+    """把当前追踪上下文以W3C traceparent / tracestate写入请求头"""
+    if _propagator is not None:
+        _propagator.inject(headers)
+
+
+def instrument_tool(handler: Callable) -> Callable:
+    """装饰call_tool处理函数：每次调用为一个根span
+
+    在注册处理函数时决定是否包装：未启用追踪时原样返回handler，不增加任何开销。
+    """
+    if _tracer is None:
+        return handler
+
+    from opentelemetry import context as otel_context
+
+    @functools.wraps(handler)
+    async def wrapper(name: str, arguments: dict) -> Any:
+        # 使用空上下文，使每次工具调用都成为新的根span
+        with _tracer.start_as_current_span(
+            f"call_tool {name}",
+            context=otel_context.Context(),
+            attributes={"mcp.tool.name": name},
+        ):
+            return await handler(name, arguments)
+
+    return wrapper
+
+
+class HTTPTimings:
+    """通过httpx请求的trace扩展记录连接、发送和接收各阶段的耗时
+
+    httpx的event_hooks只能看到请求发出和响应返回两个时刻，看不到连接建立，
+    因此使用httpcore提供的trace回调（extensions={"trace": ...}），
+    回调事件名形如 connection.connect_tcp.started、http11.send_request_headers.complete。
+    """
+
+    # 阶段名称到span属性名的映射
+    PHASES = {
+        "connect_tcp": "http.connect_ms",
+        "start_tls": "http.tls_ms",
+        "send_request_headers": "http.send_ms",
+        "send_request_body": "http.send_ms",
+        "receive_response_headers": "http.wait_ms",
+        "receive_response_body": "http.receive_ms",
+    }
+
+    def __init__(self):
+        self._started: Dict[str, float] = {}
+        self.durations: Dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        phase, _, state = event_name.rpartition(".")
+        phase = phase.rpartition(".")[2]
+        if phase not in self.PHASES:
+            return
+        if state == "started":
+            self._started[phase] = time.perf_counter()
+        elif state in ("complete", "failed") and phase in self._started:
+            key = self.PHASES[phase]
+            elapsed = (time.perf_counter() - self._started.pop(phase)) * 1000
+            self.durations[key] = self.durations.get(key, 0.0) + elapsed
+
+    def attributes(self) -> Dict[str, float]:
+        """各阶段耗时（毫秒）；复用已有连接时没有connect / tls"""
+        return {key: round(value, 3) for key, value in self.durations.items()}
+
@@ -0,0 +1,116 @@
+"""
+MCP Layout Driver 传输层
+
+提供stdio、Streamable HTTP和SSE三种运行方式。
+HTTP / SSE 模式下由一个长期运行的驱动进程同时服务多个MCP客户端，
+所有客户端共享同一个HTTP连接池、缓存和熔断器。
+"""
+
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
+
+from mcp.server import Server
+from mcp.server.stdio import stdio_server
+
+from .config import ServerConfig
+
+# 支持的传输方式
+TRANSPORTS = ("stdio", "http", "sse")
+
+
+async def run_stdio(server: Server) -> None:
+    """通过标准输入/输出运行服务器（每个客户端一个进程）"""
+    options = server.create_initialization_options()
+    async with stdio_server() as (read_stream, write_stream):
+        # raise_exceptions=True 确保异常会被抛出而不是被静默忽略
+        await server.run(read_stream, write_stream, options, raise_exceptions=True)
+
+
+def metrics_route(render: Callable[[], str]):
+    """构建GET /metrics路由，以Prometheus文本格式返回render()的结果"""
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    async def handle_metrics(request) -> PlainTextResponse:
+        return PlainTextResponse(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return Route("/metrics", endpoint=handle_metrics, methods=["GET"])
+
+
+def build_http_app(server: Server, transport: str, extra_routes: Optional[List] = None):
+    """构建HTTP / SSE 模式的starlette应用
+
+    入参：
+        server: 已注册工具的MCP服务器
+        transport: "http"（Streamable HTTP，挂载在/mcp）或 "sse"（/sse + /messages/）
+        extra_routes: 额外的starlette路由
+
+    出参：
+        Starlette: ASGI应用
+    """
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+
+    routes = list(extra_routes or [])
+
+    if transport == "http":
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+
+        session_manager = StreamableHTTPSessionManager(
+            app=server, json_response=ServerConfig.JSON_RESPONSE
+        )
+
+        async def handle_mcp(scope, receive, send) -> None:
+            await session_manager.handle_request(scope, receive, send)
+
+        @asynccontextmanager
+        async def lifespan(app) -> AsyncIterator[None]:
+            async with session_manager.run():
+                yield
+
+        routes.append(Mount("/mcp", app=handle_mcp))
+        return Starlette(routes=routes, lifespan=lifespan)
+
+    if transport == "sse":
+        from mcp.server.sse import SseServerTransport
+
+        sse = SseServerTransport("/messages/")
+
+        async def handle_sse(request) -> Response:
+            async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
+                await server.run(streams[0], streams[1], server.create_initialization_options())
+            # 返回空响应，避免客户端断开时出现NoneType错误
+            return Response()
+
+        routes.append(Route("/sse", endpoint=handle_sse, methods=["GET"]))
+        routes.append(Mount("/messages/", app=sse.handle_post_message))
+        return Starlette(routes=routes)
+
+    raise ValueError(f"不支持的传输方式: {transport}")
+
+
+async def run_http(server: Server, transport: str, host: str, port: int,
+                   max_concurrency: int, extra_routes: Optional[List] = None) -> None:
+    """通过Streamable HTTP或SSE运行服务器
+
+    入参：
+        server: 已注册工具的MCP服务器
+        transport: "http" 或 "sse"
+        host / port: 监听地址
+        max_concurrency: 同时处理的最大连接/请求数，0表示不限制
+        extra_routes: 额外的starlette路由
+    """
+    import uvicorn
+
+    app = build_http_app(server, transport, extra_routes)
+    config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        limit_concurrency=max_concurrency or None,
+        log_level=logging.getLevelName(logging.getLogger().getEffectiveLevel()).lower(),
+    )
+    logging.info(f"MCP Layout Driver 以 {transport} 模式监听 http://{host}:{port}")
+    await uvicorn.Server(config).serve()
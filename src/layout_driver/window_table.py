@@ -0,0 +1,147 @@
+"""
+MCP Layout Driver 列式窗口表
+
+缓存的窗口快照和版本历史使用列式存储代替逐窗口的字典：
+数值字段存放在array('q')中，标题和别名使用驻留字符串，图标只按哈希引用。
+只有在返回给MCP客户端时才还原为字典。
+"""
+
+import sys
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 列式存储的字段，其余后端字段按窗口保存在extras中
+_COLUMN_FIELDS = frozenset(("handle", "title", "width", "height", "x", "y", "alias", "icon", "icon_hash"))
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """驻留字符串，使多次刷新中相同的标题/别名共享同一个对象"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class WindowTable:
+    """列式窗口表
+
+    每一列按行号对齐：handles / xs / ys / widths / heights为array('q')，
+    titles / aliases / icon_hashes为列表；后端返回的其他字段保存在extras中（没有时为None）。
+    """
+
+    __slots__ = ("handles", "xs", "ys", "widths", "heights",
+                 "titles", "aliases", "icon_hashes", "extras", "_rows")
+
+    def __init__(self):
+        self.handles = array("q")
+        self.xs = array("q")
+        self.ys = array("q")
+        self.widths = array("q")
+        self.heights = array("q")
+        self.titles: List[str] = []
+        self.aliases: List[Optional[str]] = []
+        self.icon_hashes: List[Optional[str]] = []
+        self.extras: List[Optional[Dict[str, Any]]] = []
+        self._rows: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def from_windows(cls, windows: List[Dict[str, Any]],
+                     icon_hash_of: Optional[Callable[[int], Optional[str]]] = None) -> "WindowTable":
+        """由后端返回的窗口列表构建窗口表
+
+        入参：
+            windows: 窗口字典列表
+            icon_hash_of: 句柄到图标哈希的查询函数（如IconCache.lookup）；
+                为None时使用窗口自身的icon_hash字段
+        """
+        table = cls()
+        for window in windows:
+            table._append(
+                window,
+                icon_hash_of(window["handle"]) if icon_hash_of is not None else window.get("icon_hash"),
+            )
+        return table
+
+    def _append(self, window: Dict[str, Any], icon_hash: Optional[str]) -> None:
+        """追加一行"""
+        self.handles.append(window["handle"])
+        self.xs.append(window["x"])
+        self.ys.append(window["y"])
+        self.widths.append(window["width"])
+        self.heights.append(window["height"])
+        self.titles.append(_intern(window["title"]))
+        self.aliases.append(_intern(window.get("alias")))
+        self.icon_hashes.append(icon_hash)
+        extra = {key: value for key, value in window.items() if key not in _COLUMN_FIELDS}
+        self.extras.append(extra or None)
+
+    def _copy_row(self, source: "WindowTable", row: int) -> None:
+        """从另一张表复制一行"""
+        self.handles.append(source.handles[row])
+        self.xs.append(source.xs[row])
+        self.ys.append(source.ys[row])
+        self.widths.append(source.widths[row])
+        self.heights.append(source.heights[row])
+        self.titles.append(source.titles[row])
+        self.aliases.append(source.aliases[row])
+        self.icon_hashes.append(source.icon_hashes[row])
+        self.extras.append(source.extras[row])
+
+    def apply_changes(self, upserts: Dict[int, Dict[str, Any]], removed: Iterable[int],
+                      icon_hash_of: Callable[[int], Optional[str]]) -> "WindowTable":
+        """应用窗口事件，返回新的窗口表（原表不变，历史版本可继续引用）
+
+        入参：
+            upserts: 句柄到窗口字段的映射；已存在的窗口只需给出变化的字段，新窗口需给出完整字段
+            removed: 已关闭窗口的句柄
+            icon_hash_of: 句柄到图标哈希的查询函数
+        """
+        removed = set(removed)
+        rows = self.rows
+        table = WindowTable()
+        for row, handle in enumerate(self.handles):
+            if handle in removed:
+                continue
+            if handle in upserts:
+                table._append({**self.row(row), **upserts[handle]}, icon_hash_of(handle))
+            else:
+                table._copy_row(self, row)
+        for handle, window in upserts.items():
+            if handle not in rows and handle not in removed:
+                table._append(window, icon_hash_of(handle))
+        return table
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    @property
+    def rows(self) -> Dict[int, int]:
+        """句柄到行号的映射（首次访问时建立）"""
+        if self._rows is None:
+            self._rows = {handle: row for row, handle in enumerate(self.handles)}
+        return self._rows
+
+    def signature(self, row: int) -> Tuple[Any, ...]:
+        """参与版本号和变化比较的字段（title、width、height、x、y、alias）"""
+        return (self.titles[row], self.widths[row], self.heights[row],
+                self.xs[row], self.ys[row], self.aliases[row])
+
+    def row(self, row: int) -> Dict[str, Any]:
+        """把一行还原为窗口字典（不含图标数据，携带icon_hash）"""
+        window = {
+            "handle": self.handles[row],
+            "title": self.titles[row],
+            "width": self.widths[row],
+            "height": self.heights[row],
+            "x": self.xs[row],
+            "y": self.ys[row],
+            "alias": self.aliases[row],
+        }
+        if self.extras[row]:
+            window.update(self.extras[row])
+        window["icon_hash"] = self.icon_hashes[row]
+        return window
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """把整张表还原为窗口字典列表"""
+        return [self.row(row) for row in range(len(self.handles))]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.row(row) for row in range(len(self.handles)))
@@ -0,0 +1,201 @@
+"""
+MCP Layout Driver 传输编码协商
+
+- 响应压缩：Accept-Encoding列出本机能解码的算法（gzip、deflate，安装brotli时加br，
+  安装zstandard时加zstd），后端压缩的响应由httpx按Content-Encoding自动解压
+- 请求体压缩：不小于WireConfig.COMPRESS_MIN_BYTES的请求体按WireConfig.REQUEST_COMPRESSION
+  压缩并设置Content-Encoding；后端返回415时关闭请求体压缩，以未压缩的请求体重发
+- MessagePack：WireConfig.FORMAT为msgpack且安装了msgpack时，Accept优先声明application/msgpack；
+  后端以MessagePack响应后，之后的请求体也使用MessagePack；后端对MessagePack请求体返回415时
+  回退为JSON请求体
+
+brotli、zstandard和msgpack都是可选依赖，未安装时对应的编码不可用。
+"""
+
+import gzip
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from pydantic import TypeAdapter
+
+from .config import WireConfig
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack为可选依赖
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli为可选依赖
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard为可选依赖
+    zstandard = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+
+# 后端可能使用的MessagePack媒体类型
+_MSGPACK_TYPES = (MSGPACK_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime固定为0，相同内容的压缩结果相同
+    return gzip.compress(data, compresslevel=5, mtime=0)
+
+
+# 可用的压缩算法：名称 -> 压缩函数
+COMPRESSORS = {"gzip": _gzip}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=4)
+if zstandard is not None:
+    COMPRESSORS["zstd"] = lambda data: zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def accept_encoding() -> str:
+    """按WireConfig.ACCEPT_ENCODING生成Accept-Encoding请求头"""
+    value = WireConfig.ACCEPT_ENCODING
+    if value.lower() == "off":
+        return "identity"
+    if value.lower() != "auto":
+        return value
+    # httpx总能解码gzip和deflate，br和zstd需要安装对应的库
+    encodings = ["gzip", "deflate"]
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    return ", ".join(encodings)
+
+
+class EncodedBody(bytes):
+    """已序列化的请求体，记录其媒体类型（普通bytes视为JSON）"""
+
+    def __new__(cls, data: bytes, content_type: str = JSON_TYPE):
+        body = super().__new__(cls, data)
+        body.content_type = content_type
+        return body
+
+
+def content_type_of(body: bytes) -> str:
+    return getattr(body, "content_type", JSON_TYPE)
+
+
+class WireNegotiator:
+    """与后端协商请求体和响应的编码
+
+    协商结果在进程内共享：后端以MessagePack响应后请求体改用MessagePack，
+    后端拒绝（415）压缩或MessagePack请求体后不再使用。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """清除协商结果"""
+        # 后端是否以MessagePack响应过
+        self._backend_msgpack = False
+        # 后端是否拒绝过MessagePack / 压缩的请求体
+        self._msgpack_rejected = False
+        self._compression_rejected = False
+        self._warned = False
+
+    @property
+    def msgpack_enabled(self) -> bool:
+        """是否向后端声明接受MessagePack"""
+        return WireConfig.FORMAT == "msgpack" and msgpack is not None
+
+    @property
+    def body_type(self) -> str:
+        """当前请求体使用的媒体类型"""
+        if self.msgpack_enabled and self._backend_msgpack and not self._msgpack_rejected:
+            return MSGPACK_TYPE
+        return JSON_TYPE
+
+    def compression(self) -> Optional[str]:
+        """当前请求体使用的压缩算法（None表示不压缩）"""
+        name = WireConfig.REQUEST_COMPRESSION
+        if name == "off" or self._compression_rejected:
+            return None
+        if name not in COMPRESSORS:
+            if not self._warned:
+                logging.warning(f"请求体压缩算法{name}不可用（未安装或不支持），改用gzip")
+                self._warned = True
+            return "gzip"
+        return name
+
+    def request_headers(self) -> Dict[str, str]:
+        """协商用的请求头：Accept-Encoding，以及启用MessagePack时的Accept"""
+        headers = {"Accept-Encoding": accept_encoding()}
+        if self.msgpack_enabled:
+            headers["Accept"] = f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.9"
+        return headers
+
+    def encode(self, data: Any) -> EncodedBody:
+        """把请求数据序列化为当前协商的格式；已序列化的bytes原样使用"""
+        if isinstance(data, EncodedBody):
+            return data
+        if isinstance(data, bytes):
+            return EncodedBody(data, JSON_TYPE)
+        if self.body_type == MSGPACK_TYPE:
+            return EncodedBody(msgpack.packb(data, use_bin_type=True), MSGPACK_TYPE)
+        return EncodedBody(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def encode_models(self, adapter: TypeAdapter, value: Any, exclude: Any = None) -> EncodedBody:
+        """把pydantic对象直接序列化为当前协商格式的请求体"""
+        if self.body_type == MSGPACK_TYPE:
+            data = adapter.dump_python(value, mode="json", exclude=exclude)
+            return EncodedBody(msgpack.packb(data, use_bin_type=True), MSGPACK_TYPE)
+        return EncodedBody(adapter.dump_json(value, exclude=exclude), JSON_TYPE)
+
+    def prepare(self, body: bytes) -> Tuple[bytes, Dict[str, str]]:
+        """确定实际发送的请求体和对应的Content-Type / Content-Encoding请求头"""
+        headers = {"Content-Type": content_type_of(body)}
+        algorithm = self.compression()
+        if algorithm is not None and len(body) >= WireConfig.COMPRESS_MIN_BYTES:
+            headers["Content-Encoding"] = algorithm
+            return COMPRESSORS[algorithm](body), headers
+        return body, headers
+
+    def fallback(self, body: bytes, headers: Dict[str, str]) -> Optional[EncodedBody]:
+        """后端以415拒绝请求体时关闭对应的编码
+
+        出参：
+            Optional[EncodedBody]: 需要重发的请求体；已经是未压缩的JSON时为None
+        """
+        if "Content-Encoding" in headers:
+            logging.warning(f"后端不支持{headers['Content-Encoding']}压缩的请求体，改为不压缩")
+            self._compression_rejected = True
+            return EncodedBody(body, content_type_of(body))
+        if content_type_of(body) == MSGPACK_TYPE:
+            logging.warning("后端不支持MessagePack请求体，改用JSON")
+            self._msgpack_rejected = True
+            data = msgpack.unpackb(body, raw=False)
+            return EncodedBody(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        return None
+
+    def decode(self, response: httpx.Response) -> Any:
+        """按响应的Content-Type解析响应内容（JSON或MessagePack）"""
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in _MSGPACK_TYPES and msgpack is not None:
+            self._backend_msgpack = True
+            return msgpack.unpackb(response.content, raw=False)
+        return response.json()
+
+
+def describe_body(data: Any) -> str:
+    """请求体的日志文本"""
+    if isinstance(data, bytes):
+        if content_type_of(data) == MSGPACK_TYPE:
+            return f"<MessagePack {len(data)} 字节>"
+        return data.decode("utf-8")
+    return json.dumps(data, ensure_ascii=False)
+
+
+# 进程内共享的协商状态
+wire_negotiator = WireNegotiator()
@@ -0,0 +1,100 @@
+"""缓存模块测试"""
+
+import time
+
+from layout_driver.cache import (
+    ConditionalGetCache,
+    IconCache,
+    WindowListCache,
+    WindowSnapshotHistory,
+)
+from layout_driver.window_table import WindowTable
+
+
+def _window(handle, **fields):
+    return {"handle": handle, "title": f"窗口{handle}", "width": 100, "height": 80,
+            "x": 0, "y": 0, **fields}
+
+
+def test_window_list_cache_hit_and_expiry(monkeypatch):
+    cache = WindowListCache(ttl=2)
+    assert cache.get() is None
+    cache.set({"success": True, "content": [1]}, cache.generation)
+    assert cache.get() == {"success": True, "content": [1]}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 3)
+    assert cache.get() is None
+
+
+def test_window_list_cache_drops_results_from_before_invalidate():
+    cache = WindowListCache(ttl=2)
+    generation = cache.generation
+    cache.invalidate()
+    cache.set({"success": True, "content": []}, generation)
+    assert cache.peek() is None
+
+
+def test_window_list_cache_disabled_with_zero_ttl():
+    cache = WindowListCache(ttl=0)
+    cache.set({"success": True}, cache.generation)
+    assert cache.get() is None
+
+
+def test_window_list_cache_apply_updates_fresh_result():
+    cache = WindowListCache(ttl=2)
+    assert cache.apply(lambda result: result) is None
+    cache.set({"success": True, "content": [1]}, cache.generation)
+    updated = cache.apply(lambda result: {**result, "content": [1, 2]})
+    assert updated["content"] == [1, 2]
+    assert cache.peek()["content"] == [1, 2]
+
+
+def test_conditional_get_cache_validators():
+    cache = ConditionalGetCache()
+    assert cache.request_headers("k") == {}
+    cache.store("k", {"etag": '"v1"', "last-modified": None}, ["content"])
+    assert cache.request_headers("k") == {"If-None-Match": '"v1"'}
+    assert cache.validators("k") == {"etag": '"v1"', "last_modified": None}
+    assert cache.get_content("k") == ["content"]
+
+    # 响应不再携带验证器时移除缓存
+    cache.store("k", {}, ["other"])
+    assert cache.get_content("k") is None
+    assert cache.validators("k") == {"etag": None, "last_modified": None}
+
+
+def test_snapshot_history_diff():
+    history = WindowSnapshotHistory(max_versions=2)
+    old = history.record(WindowTable.from_windows([_window(1), _window(2)]))
+    new_table = WindowTable.from_windows([_window(1, x=50), _window(3)])
+    assert history.record(WindowTable.from_windows([_window(2), _window(1)])) == old
+
+    diff = history.diff(old, new_table)
+    assert [window["handle"] for window in diff["added"]] == [3]
+    assert diff["removed"] == [2]
+    assert [window["handle"] for window in diff["changed"]] == [1]
+    assert history.diff("unknown", new_table) is None
+
+
+def test_snapshot_history_evicts_oldest_version():
+    history = WindowSnapshotHistory(max_versions=1)
+    first = history.record(WindowTable.from_windows([_window(1)]))
+    history.record(WindowTable.from_windows([_window(2)]))
+    assert history.diff(first, WindowTable.from_windows([])) is None
+
+
+def test_icon_cache_deduplicates_and_evicts():
+    cache = IconCache(max_icons=1)
+    cache.ingest([_window(1, icon="AAAA"), _window(2, icon="AAAA"), _window(3)])
+    icon_hash = cache.lookup(1)
+    assert icon_hash == cache.lookup(2) == IconCache.compute_hash("AAAA")
+    assert cache.lookup(3) is None and cache.knows(3)
+    assert cache.get(icon_hash) == "AAAA"
+
+    cache.update([_window(4, icon="BBBB")], removed=[3])
+    assert not cache.knows(3)
+    # 容量为1，旧图标被淘汰后引用它的句柄不再视为已知
+    assert not cache.knows(1)
+    assert cache.get(cache.lookup(4)) == "BBBB"
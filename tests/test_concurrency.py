@@ -0,0 +1,108 @@
+"""请求合并与并发限流测试"""
+
+import asyncio
+
+import pytest
+
+from layout_driver.concurrency import ConcurrencyLimiter, SingleFlight
+
+
+def test_single_flight_shares_one_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"success": True}
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [{"success": True}] * 5
+    # 每个等待者拿到各自的副本
+    assert len({id(result) for result in results}) == 5
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_single_flight_propagates_exception_to_all_waiters():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("后端错误")
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelling_leader_does_not_cancel_followers():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return {"success": True}
+
+    async def main():
+        flight = SingleFlight()
+        leader = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+
+    assert asyncio.run(main()) == {"success": True}
+
+
+def test_cancelling_all_waiters_cancels_the_call():
+    state = {}
+
+    async def fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+        return {}
+
+    async def main():
+        flight = SingleFlight()
+        waiter = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return flight.stats()["in_flight"]
+
+    assert asyncio.run(main()) == 0
+    assert state == {"cancelled": True}
+
+
+def test_limiter_queues_beyond_endpoint_limit():
+    async def main():
+        limiter = ConcurrencyLimiter(global_limit=0, endpoint_limit=2)
+        peak = [0]
+        running = [0]
+
+        async def work():
+            async with limiter.acquire("WINDOWS_LIST"):
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+                await asyncio.sleep(0.01)
+                running[0] -= 1
+
+        await asyncio.gather(*(work() for _ in range(6)))
+        return peak[0], limiter.stats()["endpoints"]["WINDOWS_LIST"]
+
+    peak, stats = asyncio.run(main())
+    assert peak == 2
+    assert stats["in_flight"] == 0 and stats["queued"] == 0 and stats["max_queued"] == 4
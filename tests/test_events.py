@@ -0,0 +1,111 @@
+"""窗口事件订阅测试"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from layout_driver import driver, events
+from layout_driver.cache import window_list_cache
+from layout_driver.events import WindowEventStream
+from layout_driver.window_table import WindowTable
+
+
+def _window(handle, **fields):
+    return {"handle": handle, "title": f"窗口{handle}", "width": 100, "height": 80,
+            "x": 0, "y": 0, **fields}
+
+
+@pytest.fixture
+def cached_windows():
+    window_list_cache.invalidate()
+    table = WindowTable.from_windows([_window(1), _window(2)])
+    window_list_cache.set({"success": True, "status_code": 200, "content": table},
+                          window_list_cache.generation)
+    yield
+    window_list_cache.invalidate()
+
+
+def _cached_handles():
+    cached = window_list_cache.peek()
+    return None if cached is None else [row["handle"] for row in cached["content"]]
+
+
+def test_events_update_cached_table(cached_windows):
+    asyncio.run(driver._apply_window_events([
+        {"type": "changed", "window": {"handle": 1, "x": 50}},
+        {"type": "created", "window": _window(3)},
+        {"type": "removed", "handle": 2},
+        {"type": "focus", "handle": 1},
+    ]))
+    assert _cached_handles() == [1, 3]
+    assert window_list_cache.peek()["content"].row(0)["x"] == 50
+
+
+@pytest.mark.parametrize("event", [
+    {"type": "changed", "window": {"x": 50}},
+    {"type": "created", "window": {"handle": 9, "title": "缺少尺寸"}},
+    {"type": "removed"},
+    ["not", "a", "dict"],
+    "reset",
+])
+def test_unusable_events_invalidate_cache(cached_windows, event):
+    asyncio.run(driver._apply_window_events([event]))
+    assert _cached_handles() is None
+
+
+def test_handler_errors_do_not_end_the_subscription(monkeypatch):
+    requests = []
+
+    async def backend(request):
+        await asyncio.sleep(0.001)
+        requests.append(request)
+        return httpx.Response(200, json={"cursor": str(len(requests)),
+                                         "events": [{"type": "changed", "window": {"handle": 1}}]})
+
+    async def failing_handler(batch):
+        if batch[0]["type"] != "reset":
+            raise KeyError("handle")
+
+    monkeypatch.setattr(events, "create_http_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(events, "backoff_delay", lambda attempt: 0)
+
+    async def main():
+        stream = WindowEventStream(failing_handler, mode="long_poll")
+        stream.start()
+        while len(requests) < 3:
+            await asyncio.sleep(0.01)
+        alive = not stream._task.done()
+        await stream.aclose()
+        return alive, stream.events_received
+
+    alive, received = asyncio.run(main())
+    assert alive
+    assert received >= 2
+
+
+def test_malformed_long_poll_body_reconnects(monkeypatch):
+    responses = iter([httpx.Response(200, json=["bad"])])
+
+    async def backend(request):
+        await asyncio.sleep(0.001)
+        return next(responses, httpx.Response(200, json={"cursor": "1", "events": []}))
+
+    monkeypatch.setattr(events, "create_http_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(events, "backoff_delay", lambda attempt: 0)
+    connected = []
+
+    async def handler(batch):
+        connected.append(batch)
+
+    async def main():
+        stream = WindowEventStream(handler, mode="long_poll")
+        stream.start()
+        while not connected:
+            await asyncio.sleep(0.01)
+        await stream.aclose()
+
+    asyncio.run(asyncio.wait_for(main(), timeout=5))
+    assert connected[0] == [{"type": "reset"}]
@@ -0,0 +1,91 @@
+"""声明式布局测试"""
+
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from layout_driver import driver
+from layout_driver.driver import WindowTarget, apply_layout
+from layout_driver.layout import (
+    WindowStateTracker,
+    match_windows,
+    plan_layout,
+    schedule_operations,
+)
+
+
+def _window(handle, title="", **fields):
+    return {"handle": handle, "title": title or f"窗口{handle}", "width": 100, "height": 80,
+            "x": 0, "y": 0, **fields}
+
+
+WINDOWS = [
+    _window(1, "Google Chrome"),
+    _window(2, "记事本", alias="notes"),
+    _window(3, "Chrome DevTools", state="maximized"),
+]
+
+
+def _target(**fields):
+    return {"handle": None, "alias": None, "title_pattern": None, "state": None,
+            "opacity": None, "closed": False, **fields}
+
+
+def test_match_windows_requires_a_selector():
+    assert match_windows(_target(closed=True), WINDOWS) == []
+    assert [w["handle"] for w in match_windows(_target(title_pattern="Chrome"), WINDOWS)] == [1, 3]
+    assert [w["handle"] for w in match_windows(_target(alias="notes"), WINDOWS)] == [2]
+    assert match_windows(_target(handle=1, title_pattern="记事本"), WINDOWS) == []
+
+
+def test_plan_layout_skips_windows_already_in_target_state():
+    tracker = WindowStateTracker()
+    tracker.record(1, opacity=200)
+    plan = plan_layout(
+        [_target(title_pattern="Chrome", state="maximized"), _target(handle=1, opacity=200),
+         _target(alias="missing", closed=True)],
+        WINDOWS,
+        tracker,
+    )
+    assert plan["operations"] == {"WINDOWS_MAXIMIZE_BATCH": [{"window": WINDOWS[0]}]}
+    # 3已经是后端报告的maximized
+    assert plan["skipped"] == [3]
+    assert plan["unmatched"] == [2]
+
+
+def test_plan_layout_close_overrides_other_changes():
+    plan = plan_layout([_target(handle=2, state="minimized", opacity=10, closed=True)],
+                       WINDOWS, WindowStateTracker())
+    assert plan["operations"] == {"WINDOWS_CLOSE_BATCH": [{"window": WINDOWS[1]}]}
+
+
+def test_schedule_operations_keeps_per_window_order():
+    stages = schedule_operations([
+        {"op": "restore", "handle": 1},
+        {"op": "opacity", "handle": 1},
+        {"op": "minimize", "handle": 2},
+        {"op": "opacity", "handle": 2},
+    ])
+    assert stages == [
+        {"WINDOWS_RESTORE_BATCH": [0], "WINDOWS_MINIMIZE_BATCH": [2]},
+        {"WINDOWS_OPACITY_BATCH": [1, 3]},
+    ]
+
+
+def test_window_target_rejects_missing_selector():
+    with pytest.raises(ValidationError):
+        WindowTarget(closed=True)
+    with pytest.raises(ValidationError):
+        WindowTarget(title_pattern="", state="minimized")
+    assert WindowTarget(alias="notes").alias == "notes"
+
+
+def test_apply_layout_reports_invalid_pattern(monkeypatch):
+    async def fake_window_list(force_refresh=False):
+        return {"success": True, "status_code": 200, "content": list(WINDOWS)}
+
+    monkeypatch.setattr(driver, "get_window_list", fake_window_list)
+    result = asyncio.run(apply_layout([WindowTarget(title_pattern="(")], dry_run=True))
+    assert result["success"] is False
+    assert "无效的标题正则表达式" in result["error"]
@@ -0,0 +1,76 @@
+"""窗口索引测试"""
+
+import time
+
+from layout_driver.registry import WindowRegistry, normalize_title
+
+
+def _window(handle, title, x=0, y=0, width=100, height=100, alias=None):
+    return {"handle": handle, "title": title, "x": x, "y": y, "width": width,
+            "height": height, "alias": alias}
+
+
+WINDOWS = [
+    _window(1, "Google  Chrome - 新标签页", x=0, y=0, width=800, height=600, alias="浏览器"),
+    _window(2, "记事本", x=1000, y=0, width=300, height=200),
+    _window(3, "Chrome DevTools", x=2000, y=1200, width=400, height=300),
+]
+
+
+def _registry(windows=WINDOWS):
+    registry = WindowRegistry(cell_size=256)
+    registry.rebuild("v1", windows)
+    return registry
+
+
+def _handles(windows):
+    return [window["handle"] for window in windows]
+
+
+def test_normalize_title():
+    assert normalize_title("  Google   CHROME ") == "google chrome"
+
+
+def test_find_by_title_prefix_alias_and_regex():
+    registry = _registry()
+    assert _handles(registry.find(title="chrome")) == [1, 3]
+    assert _handles(registry.find(title_prefix="google chrome")) == [1]
+    assert _handles(registry.find(alias="浏览器")) == [1]
+    assert _handles(registry.find(title_regex="^Chrome")) == [3]
+    assert _handles(registry.find(title="ch")) == [1, 3]
+
+
+def test_find_by_region_and_size():
+    registry = _registry()
+    assert _handles(registry.find(region={"x": 900, "y": 0, "width": 200, "height": 100})) == [2]
+    assert _handles(registry.find(min_width=350, max_height=400)) == [3]
+
+
+def test_find_limit():
+    registry = _registry()
+    assert _handles(registry.find(title="chrome", limit=1)) == [1]
+    assert registry.find(limit=0) == []
+
+
+def test_huge_region_does_not_scan_every_cell():
+    registry = _registry()
+    start = time.perf_counter()
+    found = registry.find(region={"x": -10**6, "y": -10**6, "width": 10**7, "height": 10**7})
+    assert _handles(found) == [1, 2, 3]
+    assert time.perf_counter() - start < 0.5
+
+
+def test_huge_window_is_indexed_without_enumerating_cells():
+    start = time.perf_counter()
+    registry = _registry(WINDOWS + [_window(4, "巨大窗口", width=10**6, height=10**6)])
+    assert time.perf_counter() - start < 0.5
+    assert _handles(registry.find(region={"x": 5000, "y": 5000, "width": 10, "height": 10})) == [4]
+    assert 4 not in _handles(registry.find(region={"x": -500, "y": -500, "width": 10, "height": 10}))
+
+
+def test_rebuild_skips_same_version():
+    registry = _registry()
+    registry.rebuild("v1", [])
+    assert len(registry) == 3
+    registry.rebuild("v2", [])
+    assert len(registry) == 0
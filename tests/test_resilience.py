@@ -0,0 +1,66 @@
+"""重试退避与熔断器测试"""
+
+import time
+
+from layout_driver import resilience
+from layout_driver.resilience import CircuitBreaker, is_idempotent, next_retry_delay
+from layout_driver.serialization import shape_result
+
+
+def test_close_is_never_retried():
+    assert is_idempotent("WINDOWS_LIST")
+    assert not is_idempotent("WINDOWS_CLOSE_BATCH")
+
+
+def test_next_retry_delay_respects_attempts_and_deadline(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0.5)
+    deadline = time.monotonic() + 10
+    assert next_retry_delay(1, max_retries=2, deadline=deadline) == 0.5
+    assert next_retry_delay(3, max_retries=2, deadline=deadline) is None
+    assert next_retry_delay(1, max_retries=2, deadline=time.monotonic() + 0.1) is None
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(resilience.RetryConfig, "BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(resilience.RetryConfig, "BACKOFF_MAX", 2.0)
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    assert resilience.backoff_delay(1) == 1.0
+    assert resilience.backoff_delay(10) == 2.0
+
+
+def test_circuit_breaker_opens_and_recovers(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    opened = []
+    breaker = CircuitBreaker("WINDOWS_LIST", failure_threshold=2, recovery_timeout=5,
+                             on_open=opened.append)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and opened == [breaker]
+    assert not breaker.allow_request()
+    assert breaker.retry_after() == 5
+
+    now[0] += 5
+    assert breaker.allow_request()
+    # 半开状态只放行一个试探请求
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_failure_reopens(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("WINDOWS_LIST", failure_threshold=1, recovery_timeout=1)
+    breaker.record_failure()
+    now[0] += 1
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_compact_result_reports_retries():
+    result = {"success": True, "content": [], "attempts": 3, "headers": {}, "url": "u"}
+    assert shape_result(result, "compact") == {"success": True, "content": [], "attempts": 3}
+    assert "attempts" not in shape_result({**result, "attempts": 1}, "compact")
@@ -0,0 +1,42 @@
+"""列式窗口表测试"""
+
+from layout_driver.window_table import WindowTable
+
+
+def _window(handle, **fields):
+    return {"handle": handle, "title": f"窗口{handle}", "width": 100, "height": 80,
+            "x": 10, "y": 20, "alias": None, **fields}
+
+
+def test_round_trip_keeps_extra_fields_and_icon_hash():
+    windows = [_window(1, state="maximized"), _window(2, alias="终端")]
+    table = WindowTable.from_windows(windows, {1: "hash1"}.get)
+    assert len(table) == 2
+    assert table.rows == {1: 0, 2: 1}
+    assert table.to_dicts() == [
+        {**windows[0], "icon_hash": "hash1"},
+        {**windows[1], "icon_hash": None},
+    ]
+    assert list(table) == table.to_dicts()
+
+
+def test_icon_data_is_not_stored():
+    table = WindowTable.from_windows([_window(1, icon="AAAA", icon_hash="h")])
+    assert "icon" not in table.row(0)
+    assert table.row(0)["icon_hash"] == "h"
+
+
+def test_apply_changes_returns_new_table():
+    table = WindowTable.from_windows([_window(1), _window(2)])
+    updated = table.apply_changes({1: {"x": 500}, 3: _window(3)}, removed=[2],
+                                  icon_hash_of=lambda handle: None)
+    assert [row["handle"] for row in updated] == [1, 3]
+    assert updated.row(0)["x"] == 500
+    # 原表不变，历史版本仍可引用
+    assert [row["handle"] for row in table] == [1, 2]
+    assert table.row(0)["x"] == 10
+
+
+def test_signature_tracks_geometry_and_title():
+    table = WindowTable.from_windows([_window(1), _window(1, width=200)])
+    assert table.signature(0) != table.signature(1)